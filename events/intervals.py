@@ -0,0 +1,121 @@
+import bisect
+
+from visualist.indexes import SharedIndex
+
+
+class IntervalIndex(SharedIndex):
+    """
+    A process-local index of live event intervals.
+
+    Intervals are kept sorted by start in fixed-size blocks, each block
+    remembering the latest end it contains, so an overlap query skips
+    whole blocks that finish too early and only walks the ones that can
+    match.  Publishing and unpublishing update it in place; other
+    processes see a new version stamp and reload.
+    """
+    version_cache_key = 'events:intervals-version'
+    block_size = 64
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.blocks = []
+        self.block_starts = []
+        self.block_ends = []
+        self.intervals = {}
+
+    def load(self):
+        from .models import EventOccurrence
+
+        self.build(EventOccurrence.objects.filter(live=True)
+            .values_list('event_id', 'start', 'end'))
+
+    def build(self, rows):
+        """Build the index from (id, start, end) rows."""
+        entries = sorted(
+            (start.timestamp(), end.timestamp(), pk) for pk, start, end in rows)
+        with self.lock:
+            self.blocks = [entries[i:i + self.block_size]
+                for i in range(0, len(entries), self.block_size)]
+            self.block_starts = [block[0][0] for block in self.blocks]
+            self.block_ends = [max(e[1] for e in block) for block in self.blocks]
+            self.intervals = {pk: (start, end) for start, end, pk in entries}
+
+    def add(self, pk, start, end):
+        with self.lock:
+            if self.version is not None:
+                self._remove(pk)
+                self._add(pk, start, end)
+            self.changed()
+
+    def remove(self, pk):
+        with self.lock:
+            if self.version is not None:
+                self._remove(pk)
+            self.changed()
+
+    def _add(self, pk, start, end):
+        entry = (start.timestamp(), end.timestamp(), pk)
+        if not self.blocks:
+            self.blocks.append([])
+            self.block_starts.append(entry[0])
+            self.block_ends.append(entry[1])
+        i = max(bisect.bisect_right(self.block_starts, entry[0]) - 1, 0)
+        block = self.blocks[i]
+        bisect.insort(block, entry)
+        self.block_starts[i] = block[0][0]
+        self.block_ends[i] = max(self.block_ends[i], entry[1])
+        self.intervals[pk] = entry[:2]
+
+        if len(block) > 2 * self.block_size:
+            half = len(block) // 2
+            self.blocks[i:i + 1] = [block[:half], block[half:]]
+            self.block_starts[i:i + 1] = [block[0][0], block[half][0]]
+            self.block_ends[i:i + 1] = [
+                max(e[1] for e in block[:half]),
+                max(e[1] for e in block[half:])]
+
+    def _remove(self, pk):
+        if pk not in self.intervals:
+            return
+        start, end = self.intervals.pop(pk)
+        entry = (start, end, pk)
+        i = bisect.bisect_right(self.block_starts, start) - 1
+        # equal starts can straddle a block boundary
+        while entry not in self.blocks[i]:
+            i -= 1
+        block = self.blocks[i]
+        block.remove(entry)
+        if block:
+            self.block_starts[i] = block[0][0]
+            self.block_ends[i] = max(e[1] for e in block)
+        else:
+            del self.blocks[i], self.block_starts[i], self.block_ends[i]
+
+    def overlapping(self, start, end):
+        """Ids of intervals overlapping [start, end], ordered by start."""
+        start, end = start.timestamp(), end.timestamp()
+        with self.lock:
+            last = bisect.bisect_right(self.block_starts, end)
+            return [pk
+                for i in range(last) if self.block_ends[i] >= start
+                for s, e, pk in self.blocks[i] if s <= end and e >= start]
+
+    def starting_after(self, start, limit):
+        """Ids of the first ``limit`` intervals starting at or after ``start``."""
+        start = start.timestamp()
+        ids = []
+        with self.lock:
+            first = max(bisect.bisect_left(self.block_starts, start) - 1, 0)
+            for block in self.blocks[first:]:
+                for s, e, pk in block:
+                    if s >= start:
+                        ids.append(pk)
+                        if len(ids) == limit:
+                            return ids
+        return ids
+
+
+event_intervals = IntervalIndex()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from visualist.renditions import rendition_warmer
+
+from ...models import EventCategory, EventGalleryImage
+
+
+class Command(BaseCommand):
+    help = ("Generate any missing renditions the event pages and calendar "
+        "will ask for, in the rendition warming worker processes")
+
+    def handle(self, **options):
+        rendition_warmer.add(EventGalleryImage.objects
+            .values_list('image_id', flat=True).distinct().iterator(),
+            EventGalleryImage.warm_filters)
+        rendition_warmer.add(EventCategory.objects
+            .values_list('icon_id', flat=True).distinct().iterator(),
+            EventCategory.warm_filters)
+        count = rendition_warmer.flush(wait_for=True)
+        self.stdout.write('{} renditions warmed'.format(count))
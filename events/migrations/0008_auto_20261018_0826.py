@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:26
+from __future__ import unicode_literals
+
+import datetime
+
+from django.db import migrations, models
+from django.utils.timezone import localtime, make_aware
+import django.db.models.deletion
+
+
+def event_interval(start_date, duration, precision):
+    # events.models.event_interval as of this migration, so later changes
+    # to it don't change what this one does
+    start = localtime(start_date).replace(tzinfo=None)
+    if precision == 0:  # minute
+        bucket_end = start
+    else:
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        if precision == 1:  # day
+            bucket_end = start + datetime.timedelta(days=1)
+        elif precision == 2:  # month
+            start = start.replace(day=1)
+            bucket_end = (start + datetime.timedelta(days=32)).replace(day=1)
+        else:  # year
+            start = start.replace(month=1, day=1)
+            bucket_end = start.replace(year=start.year + 1)
+    end = max(bucket_end, localtime(start_date).replace(tzinfo=None) +
+        datetime.timedelta(minutes=duration))
+    return make_aware(start), make_aware(end)
+
+
+def build_occurrences(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    EventOccurrence = apps.get_model('events', 'EventOccurrence')
+    occurrences = []
+    for event in Event.objects.iterator():
+        start, end = event_interval(
+            event.start_date, event.duration, event.precision)
+        occurrences.append(EventOccurrence(
+            event_id=event.pk, start=start, end=end,
+            precision=event.precision, live=event.live))
+    EventOccurrence.objects.bulk_create(occurrences)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_auto_20261018_0825'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventOccurrence',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occurrence', serialize=False, to='events.Event')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('precision', models.PositiveIntegerField(choices=[(0, 'minute'), (1, 'day'), (2, 'month'), (3, 'year')])),
+                ('live', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='duration',
+            field=models.PositiveIntegerField(default=0, help_text='in minutes'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='precision',
+            field=models.PositiveIntegerField(choices=[(0, 'minute'), (1, 'day'), (2, 'month'), (3, 'year')], default=0),
+        ),
+        migrations.AddIndex(
+            model_name='eventoccurrence',
+            index=models.Index(fields=['live', 'end', 'start'], name='events_occurrence_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventoccurrence',
+            index=models.Index(fields=['live', 'start', 'end'], name='events_occurrence_start_idx'),
+        ),
+        migrations.RunPython(build_occurrences, migrations.RunPython.noop),
+    ]
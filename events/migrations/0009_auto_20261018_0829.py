@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:29
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_auto_20261018_0826'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventtag',
+            index=models.Index(fields=['tag', 'content_object'], name='events_eventtag_tag_obj_idx'),
+        ),
+    ]
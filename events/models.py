@@ -1,14 +1,21 @@
+import datetime
+
 from django import forms
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.utils.timezone import now
+from django.core.cache import cache
+from django.db.models import Count, Prefetch
+from django.utils.dateparse import parse_date
+from django.utils.http import urlencode
+from django.utils.timezone import localtime, make_aware, now
 
 from wagtail.api import APIField
 from wagtail.wagtailadmin.edit_handlers import (
     FieldPanel, InlinePanel, MultiFieldPanel, PageChooserPanel, FieldRowPanel)
 from wagtail.wagtailcore.fields import RichTextField
-from wagtail.wagtailcore.models import Page, Orderable
+from wagtail.wagtailcore.models import Page, PageManager, Orderable
+from wagtail.wagtailcore.query import PageQuerySet
 from wagtail.wagtailimages.edit_handlers import ImageChooserPanel
 from wagtail.wagtailsearch import index
 from wagtail.wagtailsnippets.models import register_snippet
@@ -18,7 +25,75 @@ from modelcluster.fields import ParentalKey, ParentalManyToManyField
 from taggit.models import TaggedItemBase
 
 from visualist.models import Record
+from visualist.renditions import get_renditions
 from names.models import Agent
+from places.models import Place
+from places.spatial import place_index
+
+from .intervals import event_intervals
+from .pagination import CursorPage
+
+
+MINUTE, DAY, MONTH, YEAR = range(4)
+PRECISIONS = (
+    (MINUTE, 'minute'),
+    (DAY, 'day'),
+    (MONTH, 'month'),
+    (YEAR, 'year'),
+)
+
+
+def event_interval(start_date, duration, precision):
+    """
+    Return the (start, end) an event covers.  A start date known only to
+    the day, month or year covers that whole bucket; ``duration`` is in
+    minutes and may run the event past the end of its bucket.
+    """
+    start = localtime(start_date).replace(tzinfo=None)
+    if precision == MINUTE:
+        bucket_end = start
+    else:
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        if precision == DAY:
+            bucket_end = start + datetime.timedelta(days=1)
+        elif precision == MONTH:
+            start = start.replace(day=1)
+            bucket_end = (start + datetime.timedelta(days=32)).replace(day=1)
+        else:
+            start = start.replace(month=1, day=1)
+            bucket_end = start.replace(year=start.year + 1)
+    end = max(bucket_end, localtime(start_date).replace(tzinfo=None) +
+        datetime.timedelta(minutes=duration))
+    return make_aware(start), make_aware(end)
+
+
+class EventQuerySet(PageQuerySet):
+
+    def overlapping(self, start, end):
+        # a single range lookup against the events_eventoccurrence indexes
+        return self.filter(
+            occurrence__live=True,
+            occurrence__end__gte=start,
+            occurrence__start__lte=end,
+        )
+
+
+class EventManager(PageManager.from_queryset(EventQuerySet)):
+    # past this many hits the indexed SQL range scan is the better plan
+    # (and SQLite won't take the id list anyway)
+    max_index_results = 500
+
+    def happening(self, start, end):
+        """Live events overlapping [start, end], ordered by start."""
+        ids = event_intervals.current().overlapping(start, end)
+        if len(ids) <= self.max_index_results:
+            return self.filter(pk__in=ids).order_by('occurrence__start', 'pk')
+        return self.overlapping(start, end).order_by('occurrence__start', 'pk')
+
+    def upcoming(self, after, limit):
+        """The next ``limit`` live events starting at or after ``after``."""
+        ids = event_intervals.current().starting_after(after, limit)
+        return self.filter(pk__in=ids).order_by('occurrence__start', 'pk')
 
 
 class Event(Record):
@@ -26,8 +101,10 @@ class Event(Record):
 
     # see: https://goo.gl/vA8HD8
     start_date = models.DateTimeField(default=now)
-    duration = models.PositiveIntegerField(default=0)
-    precision = models.PositiveIntegerField(default=0)
+    duration = models.PositiveIntegerField(default=0,
+        help_text='in minutes')
+    precision = models.PositiveIntegerField(default=MINUTE,
+        choices=PRECISIONS)
     categories = ParentalManyToManyField('EventCategory', blank=True)
     tags = ClusterTaggableManager(through='EventTag', blank=True)
     organizers = ParentalManyToManyField(Agent, blank=True,
@@ -36,6 +113,7 @@ class Event(Record):
     venues = ParentalManyToManyField('names.Organization', blank=True)
     locations = ParentalManyToManyField('places.Place', blank=True)
 
+    template = 'vcalendar/event.html'
 
     # TODO: more ParentalManyToManyFields for these?
     # contributors
@@ -55,15 +133,41 @@ class Event(Record):
         null=True,
         max_length=25)
 
+    objects = EventManager()
+
     def main_image(self):
-        gallery_item = self.gallery_images.first()
+        # listings prefetch the gallery; don't throw that away with .first()
+        if 'gallery_images' in getattr(self, '_prefetched_objects_cache', {}):
+            gallery_item = next(iter(self.gallery_images.all()), None)
+        else:
+            gallery_item = self.gallery_images.first()
         if gallery_item:
             return gallery_item.image
         else:
             return None
 
-    def endDate(self): # TODO
-        return self.startDate
+    def nearby_places(self, k=5):
+        """The ``k`` live places nearest this event's locations, nearest first."""
+        locations = self.locations.all()
+        exclude = {location.pk for location in locations}
+        index = place_index.current()
+
+        distances = {}
+        for location in locations:
+            for distance, pk, latitude, longitude in index.nearest(
+                    float(location.latitude), float(location.longitude),
+                    k, exclude):
+                distances[pk] = min(distance, distances.get(pk, distance))
+
+        nearest = sorted(distances, key=distances.get)[:k]
+        places = Place.objects.in_bulk(nearest)
+        return [places[pk] for pk in nearest if pk in places]
+
+    def get_interval(self):
+        return event_interval(self.start_date, self.duration, self.precision)
+
+    def endDate(self):
+        return self.get_interval()[1]
 
     def citation(self): # TODO
         pass
@@ -95,13 +199,80 @@ class Event(Record):
     class Meta:
         unique_together = (
             ("start_date", "duration", 'precision'),)
+        indexes = [
+            # keyset pagination of the calendar seeks on this pair
+            models.Index(fields=['start_date', 'page_ptr'],
+                name='events_event_start_page_idx'),
+        ]
+
+class EventOccurrence(models.Model):
+    """
+    Denormalized copy of each event's computed interval, kept in sync by
+    events.signals, so date-range questions can be answered in SQL.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE,
+        primary_key=True, related_name='occurrence')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    precision = models.PositiveIntegerField(choices=PRECISIONS)
+    live = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['live', 'end', 'start'],
+                name='events_occurrence_end_idx'),
+            models.Index(fields=['live', 'start', 'end'],
+                name='events_occurrence_start_idx'),
+        ]
+
+    def __str__(self):
+        return '{} ({} - {})'.format(self.event_id, self.start, self.end)
+
+    @classmethod
+    def sync(cls, event):
+        start, end = event.get_interval()
+        cls.objects.update_or_create(event_id=event.pk, defaults={
+            'start': start,
+            'end': end,
+            'precision': event.precision,
+            'live': event.live,
+        })
+
 
 class EventTag(TaggedItemBase):
     content_object = ParentalKey('Event', related_name='tagged_items')
 
+    counts_cache_key = 'events:tag-counts'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tag', 'content_object'],
+                name='events_eventtag_tag_obj_idx'),
+        ]
+
+    @classmethod
+    def get_counts(cls):
+        """Tag name -> number of live events, cached until tags change."""
+        counts = cache.get(cls.counts_cache_key)
+        if counts is None:
+            counts = dict(cls.objects.filter(content_object__live=True)
+                .values_list('tag__name')
+                .annotate(count=Count('content_object'))
+                .order_by())
+            cache.set(cls.counts_cache_key, counts, 60 * 60)
+        return counts
+
+    @classmethod
+    def invalidate_counts(cls):
+        cache.delete(cls.counts_cache_key)
+
 
 class EventIndex(Page):
     schema = 'http://schema.org/ItemList'
+    template = 'vcalendar/event_index.html'
+
+    listing_image_filter = 'fill-160x100'
+    events_per_page = 20
 
     intro = RichTextField(blank=True)
 
@@ -109,10 +280,69 @@ class EventIndex(Page):
         FieldPanel('intro', classname="full")
     ]
 
+    def get_events(self):
+        # specific Event rows with their gallery (and images) in two
+        # extra queries, however many events there are
+        gallery_images = EventGalleryImage.objects.select_related('image')
+        return Event.objects.child_of(self).live() \
+            .prefetch_related(Prefetch('gallery_images', gallery_images))
+
+    def filter_events(self, events, params):
+        # ?from=YYYY-MM-DD&to=YYYY-MM-DD, both inclusive
+        try:
+            start = parse_date(params.get('from', ''))
+            end = parse_date(params.get('to', ''))
+        except ValueError:
+            start = end = None
+        if start:
+            events = events.filter(start_date__gte=make_aware(
+                datetime.datetime.combine(start, datetime.time.min)))
+        if end:
+            events = events.filter(start_date__lt=make_aware(
+                datetime.datetime.combine(
+                    end + datetime.timedelta(days=1), datetime.time.min)))
+        return events
+
+    def get_listing(self, params):
+        """
+        A page of specific events for these query parameters, with their
+        listing renditions, kept on the page so asking again is free.
+        """
+        key = tuple(params.get(k) for k in ('from', 'to', 'after', 'before'))
+        if not hasattr(self, '_listings'):
+            self._listings = {}
+        listings = self._listings
+        if key not in listings:
+            events = CursorPage(
+                self.filter_events(self.get_events(), params),
+                'start_date', self.events_per_page,
+                after=params.get('after'),
+                before=params.get('before'),
+            )
+
+            # resolve every listing image's rendition in one query
+            images = {event.pk: event.main_image() for event in events}
+            renditions = get_renditions(images.values(), self.listing_image_filter)
+            for event in events:
+                image = images[event.pk]
+                event.main_rendition = renditions[image.pk] if image else None
+            listings[key] = events
+        return listings[key]
+
     def get_context(self, request):
-        # Update context to include only published posts, ordered by reverse-chron
+        # Update context to include only published posts, ordered by
+        # reverse start date, a page at a time
         context = super().get_context(request)
-        events = self.get_children().live().order_by('-first_published_at')
+        events = self.get_listing(request.GET)
+
+        params = {k: request.GET[k] for k in ('from', 'to') if k in request.GET}
+        if events.next_cursor:
+            context['next_url'] = '?' + urlencode(
+                dict(params, after=events.next_cursor))
+        if events.previous_cursor:
+            context['previous_url'] = '?' + urlencode(
+                dict(params, before=events.previous_cursor))
+
         context['events'] = events
         return context
 
@@ -125,6 +355,10 @@ class EventGalleryImage(Orderable):
     )
     caption = models.CharField(blank=True, max_length=250)
 
+    # the event page's gallery and the calendar's thumbnail, generated
+    # ahead of time (see signals.py)
+    warm_filters = ('fill-320x240', EventIndex.listing_image_filter)
+
     panels = [
         ImageChooserPanel('image'),
         FieldPanel('caption'),
@@ -133,15 +367,30 @@ class EventGalleryImage(Orderable):
 
 class EventTagIndex(Page):
     schema = 'http://schema.org/ItemList'
+    template = 'vcalendar/event_tag_index.html'
+
+    events_per_page = 20
 
     def get_context(self, request):
-        # Filter by tag
+        # Filter by tag, joining through EventTag's (tag, event) index
         tag = request.GET.get('tag')
-        events = Event.objects.filter(tags__name=tag)
+        events = CursorPage(
+            Event.objects.live().filter(tagged_items__tag__name=tag),
+            'start_date', self.events_per_page,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
 
         # Update template context
         context = super().get_context(request)
+        if events.next_cursor:
+            context['next_url'] = '?' + urlencode(
+                {'tag': tag, 'after': events.next_cursor})
+        if events.previous_cursor:
+            context['previous_url'] = '?' + urlencode(
+                {'tag': tag, 'before': events.previous_cursor})
         context['events'] = events
+        context['tag_counts'] = sorted(EventTag.get_counts().items())
         return context
 
 
@@ -153,6 +402,8 @@ class EventCategory(models.Model):
         on_delete=models.SET_NULL, related_name='+'
     )
 
+    warm_filters = ('fill-32x32',)
+
     panels = [
         FieldPanel('name'),
         ImageChooserPanel('icon'),
@@ -0,0 +1,75 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(obj, field):
+    return '{}_{}'.format(getattr(obj, field).isoformat(), obj.pk)
+
+
+def decode_cursor(cursor):
+    try:
+        value, pk = cursor.rsplit('_', 1)
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (AttributeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPage(object):
+    """
+    One page of a keyset-paginated queryset, ordered newest first by
+    ``field`` and then by primary key.  Seeking to a page is an indexed
+    range lookup, so the last page costs the same as the first.
+    """
+
+    def __init__(self, queryset, field, per_page, after=None, before=None):
+        self.field = field
+        after = decode_cursor(after)
+        before = decode_cursor(before) if after is None else None
+
+        if before is not None:
+            value, pk = before
+            queryset = queryset.filter(
+                Q(**{field + '__gt': value}) |
+                Q(**{field: value, 'pk__gt': pk})
+            ).order_by(field, 'pk')
+        else:
+            if after is not None:
+                value, pk = after
+                queryset = queryset.filter(
+                    Q(**{field + '__lt': value}) |
+                    Q(**{field: value, 'pk__lt': pk})
+                )
+            queryset = queryset.order_by('-' + field, '-pk')
+
+        # one extra row tells us whether there's more in that direction
+        rows = list(queryset[:per_page + 1])
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+
+        if before is not None:
+            rows.reverse()
+            self.has_previous, self.has_next = more, True
+        else:
+            self.has_previous, self.has_next = after is not None, more
+
+        self.object_list = rows
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], self.field)
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], self.field)
@@ -0,0 +1,207 @@
+import re
+
+from visualist.indexes import SharedIndex
+
+
+class PostingLists(object):
+    """
+    Per-tag and per-category posting lists over live events, held as
+    bitmaps (plain Python ints) so boolean tag expressions are a few
+    big-integer operations rather than a chain of SQL joins.
+
+    Bit ``i`` stands for the ``i``th live event, newest start date
+    first, so the set bits of a result are already in listing order.
+    """
+
+    def __init__(self, ids, postings):
+        self.ids = ids
+        self.postings = postings
+        self.universe = (1 << len(ids)) - 1
+
+    @classmethod
+    def load(cls):
+        from .models import Event, EventTag
+
+        ids = list(Event.objects.live()
+            .order_by('-start_date', '-pk').values_list('pk', flat=True))
+        ranks = {pk: rank for rank, pk in enumerate(ids)}
+
+        members = {}
+        tags = EventTag.objects.filter(content_object__live=True) \
+            .values_list('tag__name', 'content_object_id')
+        categories = Event.categories.through.objects.filter(event__live=True) \
+            .values_list('eventcategory__name', 'event_id')
+        for prefix, pairs in (('', tags), ('category:', categories)):
+            for name, pk in pairs.iterator():
+                if pk in ranks:
+                    members.setdefault(prefix + name.lower(), []).append(ranks[pk])
+
+        return cls(ids, {key: to_bitmap(positions)
+            for key, positions in members.items()})
+
+    def get(self, term):
+        return self.postings.get(term.lower(), 0)
+
+    def query(self, expression):
+        """Evaluate ``expression`` to a bitmap of matching events."""
+        return Parser(tokenize(expression), self).parse()
+
+    def select(self, bitmap, offset, limit):
+        """Event ids for set bits ``offset`` to ``offset + limit``."""
+        return [self.ids[rank] for rank in select_bits(bitmap, offset, limit)]
+
+
+class EventPostings(SharedIndex):
+    """
+    Holds this process's PostingLists, rebuilding them when a shared
+    version stamp says tags, categories or events changed.
+    """
+    version_cache_key = 'events:postings-version'
+
+    def __init__(self):
+        super().__init__()
+        self.lists = None
+
+    def load(self):
+        self.lists = PostingLists.load()
+
+    def current(self):
+        with self.lock:
+            return super().current().lists
+
+
+def to_bitmap(positions):
+    if not positions:
+        return 0
+    data = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        data[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bytes(data), 'little')
+
+
+BYTE_BITS = [[bit for bit in range(8) if byte >> bit & 1] for byte in range(256)]
+
+
+def select_bits(bitmap, offset, limit):
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+    selected = []
+    for i, byte in enumerate(data):
+        if not byte:
+            continue
+        bits = BYTE_BITS[byte]
+        if offset >= len(bits):
+            offset -= len(bits)
+            continue
+        for bit in bits[offset:]:
+            selected.append(i * 8 + bit)
+            if len(selected) == limit:
+                return selected
+        offset = 0
+    return selected
+
+
+def count_bits(bitmap):
+    return bin(bitmap).count('1')
+
+
+TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+OPERATORS = {'AND', 'OR', 'NOT'}
+
+
+def tokenize(expression):
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if not match:
+            raise ValueError('Unbalanced quotes in {!r}'.format(expression))
+        position = match.end()
+        opening, closing, quoted, word = match.groups()
+        if opening or closing:
+            tokens.append((opening or closing, None))
+        elif quoted is not None:
+            tokens.append(('TERM', quoted))
+        elif word in OPERATORS:
+            tokens.append((word, None))
+        else:
+            tokens.append(('TERM', word))
+    return tokens
+
+
+class Parser(object):
+    """
+    Recursive descent over::
+
+        expr := and_expr ('OR' and_expr)*
+        and_expr := not_expr (['AND'] not_expr)*
+        not_expr := 'NOT' not_expr | '(' expr ')' | TERM
+
+    Terms are tag names, or ``category:<name>`` for an EventCategory.
+    NOTs and parentheses nest at most ``max_depth`` deep, well inside
+    Python's recursion limit.
+    """
+    max_depth = 50
+
+    def __init__(self, tokens, postings):
+        self.tokens = tokens
+        self.position = 0
+        self.depth = 0
+        self.postings = postings
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+
+    def take(self, kind):
+        if self.peek() != kind:
+            raise ValueError('Expected {} at token {}'.format(
+                kind, self.position + 1))
+        token = self.tokens[self.position]
+        self.position += 1
+        return token[1]
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError('Empty expression')
+        result = self.expr()
+        if self.peek() is not None:
+            raise ValueError('Unexpected {} at token {}'.format(
+                self.peek(), self.position + 1))
+        return result
+
+    def expr(self):
+        result = self.and_expr()
+        while self.peek() == 'OR':
+            self.take('OR')
+            result |= self.and_expr()
+        return result
+
+    def and_expr(self):
+        result = self.not_expr()
+        while self.peek() in ('AND', 'NOT', 'TERM', '('):
+            if self.peek() == 'AND':
+                self.take('AND')
+            result &= self.not_expr()
+        return result
+
+    def not_expr(self):
+        kind = self.peek()
+        if kind in ('NOT', '('):
+            self.depth += 1
+            if self.depth > self.max_depth:
+                raise ValueError('Nested more than {} deep at token {}'.format(
+                    self.max_depth, self.position + 1))
+            try:
+                self.take(kind)
+                if kind == 'NOT':
+                    return self.postings.universe & ~self.not_expr()
+                result = self.expr()
+                self.take(')')
+                return result
+            finally:
+                self.depth -= 1
+        return self.postings.get(self.take('TERM'))
+
+
+event_postings = EventPostings()
@@ -0,0 +1,77 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from wagtail.wagtailcore.signals import page_published, page_unpublished
+
+from visualist.renditions import rendition_warmer
+
+from .intervals import event_intervals
+from .models import (
+    Event, EventCategory, EventGalleryImage, EventOccurrence, EventTag)
+from .postings import event_postings
+
+
+OCCURRENCE_FIELDS = {'start_date', 'duration', 'precision', 'live'}
+
+
+def sync(event):
+    EventOccurrence.sync(event)
+    EventTag.invalidate_counts()
+    event_postings.invalidate()
+    if event.live:
+        event_intervals.add(event.pk, *event.get_interval())
+    else:
+        event_intervals.remove(event.pk)
+
+
+@receiver(post_save, sender=Event)
+def sync_occurrence(sender, instance, update_fields=None, **kwargs):
+    # revision saves only touch bookkeeping fields and carry draft values
+    # we mustn't copy
+    if update_fields is not None and not OCCURRENCE_FIELDS & set(update_fields):
+        return
+    sync(instance)
+
+
+# bulk unpublishing saves plain Page instances, so listen here as well
+@receiver(page_published, sender=Event)
+@receiver(page_unpublished, sender=Event)
+def sync_occurrence_on_publish(sender, instance, **kwargs):
+    sync(instance)
+
+
+@receiver(post_delete, sender=Event)
+def remove_interval(sender, instance, **kwargs):
+    event_intervals.remove(instance.pk)
+    event_postings.invalidate()
+
+
+@receiver(post_save, sender=EventTag)
+@receiver(post_delete, sender=EventTag)
+def invalidate_tag_counts(sender, **kwargs):
+    EventTag.invalidate_counts()
+    event_postings.invalidate()
+
+
+@receiver(post_save, sender=EventCategory)
+@receiver(post_delete, sender=EventCategory)
+def invalidate_category_postings(sender, **kwargs):
+    event_postings.invalidate()
+
+
+@receiver(post_save, sender=EventGalleryImage)
+def warm_gallery_image(sender, instance, **kwargs):
+    rendition_warmer.enqueue([instance.image_id], EventGalleryImage.warm_filters)
+
+
+@receiver(post_save, sender=EventCategory)
+def warm_category_icon(sender, instance, **kwargs):
+    rendition_warmer.enqueue([instance.icon_id], EventCategory.warm_filters)
+
+
+@receiver(page_published, sender=Event)
+def warm_event_renditions(sender, instance, **kwargs):
+    rendition_warmer.enqueue(EventGalleryImage.objects.filter(event=instance)
+        .values_list('image_id', flat=True), EventGalleryImage.warm_filters)
+    rendition_warmer.enqueue(EventCategory.objects.filter(event=instance)
+        .values_list('icon_id', flat=True), EventCategory.warm_filters)
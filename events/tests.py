@@ -1,3 +1,507 @@
-from django.test import TestCase
+import datetime
+import shutil
+import tempfile
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.files.images import ImageFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+from six import BytesIO, StringIO
+
+from wagtail.wagtailcore.models import Site
+from wagtail.wagtailimages.models import Image
+
+from places.models import Place
+from visualist.fragments import fragment_cache
+from visualist.renditions import (
+    RenditionWarmer, generate_renditions, get_renditions, pair_renditions,
+    rendition_warmer)
+
+from .intervals import IntervalIndex, event_intervals
+from .models import (
+    DAY, MINUTE, MONTH, YEAR, Event, EventCategory, EventGalleryImage,
+    EventIndex, EventTag, EventTagIndex, event_interval)
+from .postings import event_postings
+
+
+def make_image(title='test'):
+    f = BytesIO()
+    PILImage.new('RGB', (640, 480), 'white').save(f, 'PNG')
+    return Image.objects.create(
+        title=title, file=ImageFile(f, name='{}.png'.format(title)))
+
+
+# these render pages to test them, which the page cache would short-circuit
+@override_settings(PAGE_CACHE_ALIAS=None)
+class EventTestCase(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        root = Site.objects.get(is_default_site=True).root_page
+        self.index = root.add_child(
+            instance=EventIndex(title='Calendar', slug='calendar'))
+        self.count = 0
+
+    def add_event(self, **kwargs):
+        self.count += 1
+        kwargs.setdefault('title', 'Event {}'.format(self.count))
+        kwargs.setdefault('start_date', timezone.make_aware(
+            datetime.datetime(2017, 1, 1) + datetime.timedelta(days=self.count)))
+        event = self.index.add_child(instance=Event(**kwargs))
+        EventGalleryImage.objects.create(
+            event=event, image=make_image('event{}'.format(self.count)))
+        return event
+
+
+class EventIndexTest(EventTestCase):
+
+    def count_queries(self):
+        # the first hit generates renditions, the second is the steady state
+        self.client.get(self.index.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.index.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_listing_shows_events_with_images(self):
+        self.add_event(title='Opening night')
+        response = self.client.get(self.index.url)
+        self.assertContains(response, 'Opening night')
+        self.assertContains(response, 'fill-160x100')
+
+    def test_query_count_independent_of_event_count(self):
+        for i in range(2):
+            self.add_event()
+        few = self.count_queries()
+
+        for i in range(8):
+            self.add_event()
+        many = self.count_queries()
+
+        self.assertEqual(few, many)
+
+    def test_listing_memoized_on_page(self):
+        self.add_event()
+        request = self.client.get(self.index.url).wsgi_request
+        self.index.get_context(request)
+        with self.assertNumQueries(0):
+            self.index.get_context(request)
+
+    def test_cursor_pagination(self):
+        self.index.events_per_page = 2
+        events = [self.add_event() for i in range(5)]
+        request = self.client.get(self.index.url).wsgi_request
+
+        page = self.index.get_context(request)
+        self.assertEqual(list(page['events']), [events[4], events[3]])
+        self.assertNotIn('previous_url', page)
+
+        request.GET = QueryDict(page['next_url'][1:])
+        page = self.index.get_context(request)
+        self.assertEqual(list(page['events']), [events[2], events[1]])
+
+        request.GET = QueryDict(page['next_url'][1:])
+        page = self.index.get_context(request)
+        self.assertEqual(list(page['events']), [events[0]])
+        self.assertNotIn('next_url', page)
+
+        request.GET = QueryDict(page['previous_url'][1:])
+        page = self.index.get_context(request)
+        self.assertEqual(list(page['events']), [events[2], events[1]])
+
+    def test_date_window(self):
+        events = [self.add_event() for i in range(5)]
+        request = self.client.get(self.index.url).wsgi_request
+        request.GET = QueryDict('from=2017-01-03&to=2017-01-04')
+        page = self.index.get_context(request)
+        self.assertEqual(list(page['events']), [events[2], events[1]])
+
+
+class EventOccurrenceTest(EventTestCase):
+
+    def aware(self, *args):
+        return timezone.make_aware(datetime.datetime(*args))
+
+    def test_interval_covers_precision_bucket(self):
+        start = self.aware(2017, 5, 17, 19, 30)
+        self.assertEqual(event_interval(start, 90, MINUTE),
+            (start, self.aware(2017, 5, 17, 21, 0)))
+        self.assertEqual(event_interval(start, 0, DAY),
+            (self.aware(2017, 5, 17), self.aware(2017, 5, 18)))
+        self.assertEqual(event_interval(start, 0, MONTH),
+            (self.aware(2017, 5, 1), self.aware(2017, 6, 1)))
+        self.assertEqual(event_interval(start, 0, YEAR),
+            (self.aware(2017, 1, 1), self.aware(2018, 1, 1)))
+        # a long run outlasts its bucket
+        self.assertEqual(event_interval(start, 60 * 24 * 3, DAY)[1],
+            self.aware(2017, 5, 20, 19, 30))
+
+    def test_overlapping(self):
+        weekend = self.aware(2017, 1, 7), self.aware(2017, 1, 9)
+        friday = self.add_event(
+            start_date=self.aware(2017, 1, 6, 18), duration=60 * 8)
+        saturday = self.add_event(
+            start_date=self.aware(2017, 1, 7), precision=DAY)
+        self.add_event(start_date=self.aware(2017, 1, 10))
+
+        self.assertEqual(
+            set(Event.objects.overlapping(*weekend)), {friday, saturday})
+
+        saturday.unpublish()
+        self.assertEqual(list(Event.objects.overlapping(*weekend)), [friday])
+
+
+class EventIntervalTest(EventTestCase):
+
+    def aware(self, *args):
+        return timezone.make_aware(datetime.datetime(*args))
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        event_intervals.version = None
+        self.events = [
+            self.add_event(start_date=self.aware(2017, 3, day), precision=DAY)
+            for day in range(1, 30)]
+        self.long_run = self.add_event(
+            start_date=self.aware(2017, 2, 1), duration=60 * 24 * 60)
+
+    def test_index_matches_sql(self):
+        window = self.aware(2017, 3, 10, 12), self.aware(2017, 3, 12)
+        sql = list(Event.objects.overlapping(*window)
+            .order_by('occurrence__start', 'pk'))
+        self.assertEqual(list(Event.objects.happening(*window)), sql)
+        self.assertEqual(sql, [self.long_run] + self.events[9:12])
+
+    def test_upcoming(self):
+        after = self.aware(2017, 3, 27)
+        self.assertEqual(list(Event.objects.upcoming(after, 5)), self.events[26:])
+
+    def test_publishing_updates_index(self):
+        IntervalIndex.block_size, block_size = 4, IntervalIndex.block_size
+        self.addCleanup(setattr, IntervalIndex, 'block_size', block_size)
+        event_intervals.current()
+
+        window = self.aware(2017, 3, 5, 1), self.aware(2017, 3, 5, 2)
+        self.events[4].unpublish()
+        self.assertEqual(list(Event.objects.happening(*window)), [self.long_run])
+
+        self.events[4].save_revision().publish()
+        self.assertEqual(list(Event.objects.happening(*window)),
+            [self.long_run, self.events[4]])
+
+        new = self.add_event(start_date=self.aware(2017, 3, 5, 1, 30))
+        self.assertIn(new, Event.objects.happening(*window))
+        self.assertEqual(len(event_intervals.intervals), 31)
+
+    def test_other_processes_reload(self):
+        window = self.aware(2017, 3, 5, 1), self.aware(2017, 3, 5, 2)
+        other = IntervalIndex()
+        self.assertEqual(other.current().overlapping(*window),
+            [self.long_run.pk, self.events[4].pk])
+
+        self.events[4].unpublish()
+        self.assertEqual(other.current().overlapping(*window), [self.long_run.pk])
+
+    def test_json_endpoints(self):
+        response = self.client.get(reverse('events_happening'),
+            {'from': '2017-03-02T12:00:00', 'to': '2017-03-02T13:00:00'})
+        self.assertEqual(
+            [e['id'] for e in response.json()['events']],
+            [self.long_run.pk, self.events[1].pk])
+
+        response = self.client.get(reverse('events_upcoming'),
+            {'after': '2017-03-28', 'limit': 10})
+        self.assertEqual(
+            [e['title'] for e in response.json()['events']],
+            [self.events[27].title, self.events[28].title])
+
+
+class EventTagIndexTest(EventTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        root = Site.objects.get(is_default_site=True).root_page
+        self.tag_index = root.add_child(
+            instance=EventTagIndex(title='Tags', slug='tags'))
+
+    def tag(self, event, *names):
+        event.tags.add(*names)
+        event.save()
+
+    def test_filters_live_events_by_tag(self):
+        shows = [self.add_event() for i in range(3)]
+        for event in shows:
+            self.tag(event, 'performance')
+        self.tag(self.add_event(), 'reception')
+        shows[0].unpublish()
+
+        response = self.client.get(self.tag_index.url, {'tag': 'performance'})
+        self.assertEqual(list(response.context['events']), shows[:0:-1])
+        self.assertEqual(response.context['tag_counts'],
+            [('performance', 2), ('reception', 1)])
+
+    def test_tag_counts_follow_tag_changes(self):
+        event = self.add_event()
+        self.tag(event, 'performance')
+        self.assertEqual(EventTag.get_counts(), {'performance': 1})
+
+        self.tag(event, 'cancelled')
+        self.assertEqual(EventTag.get_counts(),
+            {'performance': 1, 'cancelled': 1})
+
+        event.tags.remove('performance')
+        event.save()
+        self.assertEqual(EventTag.get_counts(), {'cancelled': 1})
+
+
+class EventPostingsTest(EventTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        workshop = EventCategory.objects.create(name='Workshop')
+        self.events = [self.add_event() for i in range(6)]
+        for event, tags in zip(self.events, [
+                ['performance'], ['performance', 'cancelled'], ['reception'],
+                ['performance', 'live music'], [], ['reception']]):
+            event.tags.add(*tags)
+            event.save()
+        self.events[3].categories.add(workshop)
+        self.events[3].save()
+        self.events[5].unpublish()
+
+    def query(self, expression):
+        postings = event_postings.current()
+        matches = postings.query(expression)
+        return postings.select(matches, 0, 100)
+
+    def ids(self, *indexes):
+        # newest first, like the listings
+        return [self.events[i].pk for i in sorted(indexes, reverse=True)]
+
+    def test_boolean_expressions(self):
+        self.assertEqual(self.query('performance'), self.ids(0, 1, 3))
+        self.assertEqual(self.query('performance AND NOT cancelled'),
+            self.ids(0, 3))
+        self.assertEqual(self.query('performance NOT cancelled'),
+            self.ids(0, 3))
+        self.assertEqual(self.query('cancelled OR reception'), self.ids(1, 2))
+        self.assertEqual(self.query('NOT (performance OR reception)'),
+            self.ids(4))
+        self.assertEqual(self.query('"Live Music" AND category:workshop'),
+            self.ids(3))
+        self.assertEqual(self.query('nonexistent'), [])
+
+    def test_malformed_expressions(self):
+        for expression in ['', 'performance AND', '(performance', '"open']:
+            with self.assertRaises(ValueError):
+                self.query(expression)
+
+    def test_nesting_is_capped(self):
+        self.assertEqual(self.query('(' * 50 + 'performance' + ')' * 50),
+            self.query('performance'))
+        for expression in ['NOT ' * 5000 + 'performance',
+                '(' * 5000 + 'performance' + ')' * 5000]:
+            with self.assertRaisesMessage(ValueError, 'Nested more than 50 deep'):
+                self.query(expression)
+        response = self.client.get(reverse('events_tagged'),
+            {'q': 'NOT ' * 5000 + 'performance'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_postings_follow_tag_changes(self):
+        self.assertEqual(self.query('cancelled'), self.ids(1))
+        self.events[0].tags.add('cancelled')
+        self.events[0].save()
+        self.assertEqual(self.query('cancelled'), self.ids(0, 1))
+
+    def test_json_endpoint(self):
+        url = reverse('events_tagged')
+        response = self.client.get(url,
+            {'q': 'performance OR reception', 'offset': 1, 'limit': 2})
+        data = response.json()
+        self.assertEqual(data['count'], 4)
+        self.assertEqual([e['id'] for e in data['events']], self.ids(1, 2))
+
+        response = self.client.get(url, {'q': 'performance AND'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EventNearbyPlacesTest(EventTestCase):
+
+    def test_nearby_places(self):
+        cache.clear()
+        root = Site.objects.get(is_default_site=True).root_page
+        venue, near, far = [root.add_child(instance=Place(
+            title=title, hours='By appointment',
+            latitude=Decimal(latitude), longitude=Decimal(longitude)))
+            for title, latitude, longitude in [
+                ('Venue', '41.8796', '-87.6237'),
+                ('Near', '41.8971', '-87.6212'),
+                ('Far', '43.0400', '-87.8971')]]
+        event = self.add_event()
+        event.locations.add(venue)
+        event.save()
+        self.assertEqual(event.nearby_places(k=1), [near])
+        self.assertEqual(event.nearby_places(), [near, far])
+
+
+@override_settings(RENDITION_WARM_PROCESSES=0)
+class RenditionWarmingTest(EventTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rendition_warmer.pending = set()
+
+    def renditions(self, image):
+        return set(image.renditions.values_list('filter_spec', flat=True))
+
+    def test_gallery_images_queued(self):
+        event = self.add_event()
+        image = event.gallery_images.get().image
+        self.assertEqual(rendition_warmer.pending,
+            {(image.pk, 'fill-320x240'), (image.pk, 'fill-160x100')})
+
+        # nothing is generated until the transaction commits
+        self.assertEqual(self.renditions(image), set())
+        self.assertEqual(rendition_warmer.flush(), 2)
+        self.assertEqual(self.renditions(image), {'fill-320x240', 'fill-160x100'})
+        self.assertEqual(rendition_warmer.pending, set())
+
+    def test_category_icon_queued(self):
+        icon = make_image('icon')
+        category = EventCategory.objects.create(name='painting')
+        self.assertEqual(rendition_warmer.pending, set())
+        category.icon = icon
+        category.save()
+        self.assertEqual(rendition_warmer.pending, {(icon.pk, 'fill-32x32')})
+
+    def test_publish_queues_event_images(self):
+        icon = make_image('icon')
+        event = self.add_event()
+        event.categories.add(EventCategory.objects.create(name='painting', icon=icon))
+        event.save()
+        image = event.gallery_images.get().image
+        rendition_warmer.pending = set()
+
+        event.save_revision().publish()
+        self.assertEqual(rendition_warmer.pending, {(image.pk, 'fill-320x240'),
+            (image.pk, 'fill-160x100'), (icon.pk, 'fill-32x32')})
+
+    def test_command(self):
+        image = self.add_event().gallery_images.get().image
+        rendition_warmer.pending = set()
+        out = StringIO()
+        call_command('warm_renditions', stdout=out)
+        self.assertEqual(out.getvalue(), '2 renditions warmed\n')
+        self.assertEqual(self.renditions(image), {'fill-320x240', 'fill-160x100'})
+
+
+    def test_image_edits_touch_fragments(self):
+        event = self.add_event()
+        image = event.gallery_images.get().image
+        icon = make_image('icon')
+        category = EventCategory.objects.create(name='painting', icon=icon)
+        caches['fragments'].clear()
+        before = fragment_cache.versions([event, category])
+
+        image.focal_point_x = 10
+        image.save()
+        after = fragment_cache.versions([event, category])
+        self.assertNotEqual(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+
+        icon.delete()
+        self.assertNotEqual(fragment_cache.versions([category]), after[1:])
+
+
+@override_settings(RENDITION_WARM_PROCESSES=1)
+class RenditionPoolTest(TestCase):
+
+    def setUp(self):
+        self.warmer = RenditionWarmer()
+        self.addCleanup(self.warmer.reset_pool)
+
+    def test_pool(self):
+        # spawned workers set Django up for themselves but can't see the
+        # test database, so they're only given nothing to look up
+        pool = self.warmer.get_pool()
+        self.assertEqual(pool.submit(generate_renditions, []).result(timeout=60), 0)
+
+        # a pool that can't take work is logged and replaced, not raised
+        # into the commit that flushed it
+        pool.shutdown()
+        self.warmer.add([1], ['fill-32x32'])
+        with self.assertLogs('visualist.renditions', 'ERROR'):
+            self.assertEqual(self.warmer.flush(wait_for=True), 0)
+        self.assertIsNone(self.warmer.pool)
+        self.assertEqual(self.warmer.pending, set())
+        self.assertIsNot(self.warmer.get_pool(), pool)
+
+
+class RenditionsTest(EventTestCase):
+
+    def test_missing_renditions_created(self):
+        images = [make_image('bulk{}'.format(i)) for i in range(3)]
+        images = list(Image.objects.filter(pk__in=[image.pk for image in images]))
+        renditions = get_renditions(images, 'fill-50x40')
+        self.assertEqual(set(renditions), {image.pk for image in images})
+        for image in images:
+            rendition = renditions[image.pk]
+            self.assertEqual((rendition.width, rendition.height), (50, 40))
+            self.assertEqual(rendition.image, image)
+            self.assertTrue(rendition.file.name.endswith('.fill-50x40.png'))
+
+        with self.assertNumQueries(1):
+            again = get_renditions(images, 'fill-50x40')
+        self.assertEqual({pk: r.pk for pk, r in again.items()},
+            {pk: r.pk for pk, r in renditions.items()})
+
+    def test_unreadable_originals(self):
+        image = Image.objects.get(pk=make_image('gone').pk)
+        image.file.storage.delete(image.file.name)
+        rendition = get_renditions([image], 'fill-50x40')[image.pk]
+        self.assertEqual(rendition.pk, None)
+
+    def test_pair_by_field(self):
+        icon = make_image('icon')
+        EventCategory.objects.create(name='painting', icon=icon)
+        EventCategory.objects.create(name='sculpture')
+        categories = list(EventCategory.objects.order_by('name'))
+        pair_renditions(categories, 'fill-32x32', field='icon')
+
+        categories = list(EventCategory.objects.order_by('name'))
+        with self.assertNumQueries(2):  # the icons, their renditions
+            pairs = pair_renditions(categories, 'fill-32x32', field='icon')
+        self.assertEqual([(category.name, rendition and rendition.width)
+            for category, rendition in pairs], [('painting', 32), ('sculpture', None)])
+
+    @override_settings(FRAGMENT_CACHE_ALIAS=None)
+    def test_event_page_queries_independent_of_gallery_size(self):
+        event = self.add_event()
+
+        def count_queries():
+            self.client.get(event.url)  # generate any new renditions
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(event.url)
+            self.assertContains(response, 'fill-320x240')
+            return len(queries)
+
+        one = count_queries()
+        for i in range(3):
+            EventGalleryImage.objects.create(
+                event=event, image=make_image('more{}'.format(i)))
+        self.assertEqual(count_queries(), one)
@@ -1,3 +1,85 @@
-from django.shortcuts import render
+import datetime
 
-# Create your views here.
+from django.http import JsonResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware, now
+
+from .models import Event
+from .postings import count_bits, event_postings
+
+
+def parse_int(value, default, low, high):
+    try:
+        return min(max(int(value), low), high)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_time(value, default):
+    # accepts an ISO date or datetime; dates mean midnight
+    try:
+        parsed = parse_datetime(value or '')
+        if parsed is None:
+            parsed = parse_date(value or '')
+            if parsed is not None:
+                parsed = datetime.datetime.combine(parsed, datetime.time.min)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        return default
+    return make_aware(parsed) if is_naive(parsed) else parsed
+
+
+def serialize(events):
+    return [{
+        'id': event.pk,
+        'title': event.title,
+        'url': event.url,
+        'start': event.occurrence.start.isoformat(),
+        'end': event.occurrence.end.isoformat(),
+    } for event in events.select_related('occurrence')]
+
+
+def happening(request):
+    # ?from=...&to=... (ISO dates or datetimes), defaulting to right now
+    start = parse_time(request.GET.get('from'), now())
+    end = parse_time(request.GET.get('to'), start)
+    return JsonResponse({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'events': serialize(Event.objects.happening(start, end)),
+    })
+
+
+def upcoming(request):
+    # ?after=...&limit=N, defaulting to the next 10 from now
+    after = parse_time(request.GET.get('after'), now())
+    limit = parse_int(request.GET.get('limit'), 10, 1, 100)
+    return JsonResponse({
+        'after': after.isoformat(),
+        'events': serialize(Event.objects.upcoming(after, limit)),
+    })
+
+
+def tagged(request):
+    # ?q=performance AND NOT (cancelled OR category:Workshop)&offset=0&limit=20
+    offset = parse_int(request.GET.get('offset'), 0, 0, 10 ** 9)
+    limit = parse_int(request.GET.get('limit'), 20, 1, 100)
+    postings = event_postings.current()
+    try:
+        matches = postings.query(request.GET.get('q', ''))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    ids = postings.select(matches, offset, limit)
+    events = Event.objects.filter(pk__in=ids).in_bulk()
+    return JsonResponse({
+        'count': count_bits(matches),
+        'offset': offset,
+        'events': [{
+            'id': event.pk,
+            'title': event.title,
+            'url': event.url,
+            'start_date': event.start_date.isoformat(),
+        } for event in (events[pk] for pk in ids if pk in events)],
+    })
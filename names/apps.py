@@ -1,5 +1,8 @@
 from django.apps import AppConfig
 
 
-class AgentsConfig(AppConfig):
-    name = 'agents'
+class NamesConfig(AppConfig):
+    name = 'names'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,159 @@
+import heapq
+import re
+import unicodedata
+from array import array
+
+from visualist.indexes import SharedIndex
+
+
+NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalise(name):
+    """Lowercase, unaccented words: 'Gertrude  Abercrombie!' ->
+    'gertrude abercrombie'."""
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return ' '.join(NON_WORD_RE.sub(' ', name.lower()).split())
+
+
+def trigrams(name):
+    # pg_trgm style: each word padded with two spaces in front, one behind
+    grams = set()
+    for word in name.split():
+        word = '  ' + word + ' '
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+def levenshtein(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        current = [i]
+        for j, y in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                previous[j - 1] + (x != y)))
+        previous = current
+    return previous[-1]
+
+
+def similarity(a, b):
+    """1 for the same string, falling to 0 with edit distance."""
+    if not a and not b:
+        return 1.0
+    return 1.0 - levenshtein(a, b) / max(len(a), len(b))
+
+
+class NameIndex(SharedIndex):
+    """
+    A process-local trigram index over the titles and ExtraName aliases of
+    live people and organizations.
+
+    Each name gets a slot; ``postings`` maps a trigram to the slots whose
+    name contains it.  A lookup counts shared trigrams per slot, keeps
+    those whose Jaccard similarity clears ``threshold``, and re-ranks the
+    best few by edit distance.  Removed names leave dead slots behind
+    until the next full load.
+    """
+    version_cache_key = 'names:fuzzy-version'
+    threshold = 0.3
+    refine_factor = 5  # candidates re-ranked by edit distance per match wanted
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.names = []  # slot -> (type, id, title, normalised name) or None
+        self.sizes = array('H')  # slot -> trigram count
+        self.postings = {}
+        self.slots = {}  # (type, id) -> [slot]
+
+    def load(self):
+        from .models import Organization, Person
+
+        with self.lock:
+            self.clear()
+            for kind, model in (('person', Person), ('organization', Organization)):
+                titles = dict(model.objects.live().values_list('pk', 'title'))
+                for pk, title in titles.items():
+                    self._add(kind, pk, title, title)
+
+                field = model._meta.get_field('extra_names')
+                source = field.m2m_field_name() + '_id'
+                for pk, alias in field.remote_field.through.objects \
+                        .filter(**{source + '__in': list(titles)}) \
+                        .values_list(source, 'extraname__name').iterator():
+                    self._add(kind, pk, titles[pk], alias)
+
+    def add(self, kind, page):
+        with self.lock:
+            if self.version is not None:
+                self._remove(kind, page.pk)
+                self._add(kind, page.pk, page.title, page.title)
+                for alias in page.extra_names.values_list('name', flat=True):
+                    self._add(kind, page.pk, page.title, alias)
+            self.changed()
+
+    def remove(self, kind, pk):
+        with self.lock:
+            if self.version is not None:
+                self._remove(kind, pk)
+            self.changed()
+
+    def _add(self, kind, pk, title, name):
+        name = normalise(name)
+        grams = trigrams(name)
+        if not grams:
+            return
+        slot = len(self.names)
+        self.names.append((kind, pk, title, name))
+        self.sizes.append(min(len(grams), 65535))
+        for gram in grams:
+            postings = self.postings.get(gram)
+            if postings is None:
+                postings = self.postings[gram] = array('l')
+            postings.append(slot)
+        self.slots.setdefault((kind, pk), []).append(slot)
+
+    def _remove(self, kind, pk):
+        for slot in self.slots.pop((kind, pk), ()):
+            self.names[slot] = None
+
+    def match(self, name, limit=10, kind=None):
+        """
+        [(score, type, id, title, matched name)] for the ``limit`` best
+        matching people and organizations, best first; score is in (0, 1].
+        """
+        name = normalise(name)
+        grams = trigrams(name)
+        if not grams:
+            return []
+        with self.lock:
+            shared = {}
+            for gram in grams:
+                for slot in self.postings.get(gram, ()):
+                    shared[slot] = shared.get(slot, 0) + 1
+
+            size = len(grams)
+            candidates = []
+            for slot, count in shared.items():
+                jaccard = count / (size + self.sizes[slot] - count)
+                if jaccard >= self.threshold:
+                    entry = self.names[slot]
+                    if entry is not None and (kind is None or entry[0] == kind):
+                        candidates.append((jaccard, slot))
+            candidates = heapq.nlargest(limit * self.refine_factor, candidates)
+
+            best = {}
+            for jaccard, slot in candidates:
+                kind_, pk, title, matched = self.names[slot]
+                score = (jaccard + similarity(name, matched)) / 2
+                if score > best.get((kind_, pk), (0,))[0]:
+                    best[(kind_, pk)] = (score, kind_, pk, title, matched)
+        return sorted(best.values(), key=lambda match: (-match[0], match[3]))[:limit]
+
+
+name_index = NameIndex()
@@ -0,0 +1,198 @@
+from array import array
+from collections import deque
+
+from visualist.indexes import SharedIndex
+
+
+class FriendGraph(SharedIndex):
+    """
+    A process-local copy of the Person.friends graph.
+
+    People are numbered by position in ``ids``; node i's friends are
+    ``targets[offsets[i]:offsets[i + 1]]`` (compressed sparse rows), so a
+    breadth-first walk touches flat integer arrays, not the ORM.  Saves
+    patch individual rows in ``patched``; once enough rows are patched
+    the arrays are rebuilt.  Only live people are walked through.
+    Other processes see a new version stamp and reload.
+    """
+    version_cache_key = 'names:friends-version'
+    compact_after = 1024  # patched rows
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.ids = array('l')
+        self.index = {}
+        self.live = bytearray()
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        self.patched = {}
+
+    def load(self):
+        from .models import Person
+
+        with self.lock:
+            self.clear()
+            for pk, live in Person.objects.order_by('pk') \
+                    .values_list('pk', 'live').iterator():
+                self.index[pk] = len(self.ids)
+                self.ids.append(pk)
+                self.live.append(live)
+
+            # the relation is symmetrical, so both directions are stored
+            field = Person._meta.get_field('friends')
+            edges = field.remote_field.through.objects.values_list(
+                field.m2m_field_name() + '_id',
+                field.m2m_reverse_field_name() + '_id')
+            self.build([(self.index[a], self.index[b])
+                for a, b in edges.iterator()
+                if a in self.index and b in self.index])
+
+    def build(self, edges):
+        # counting sort of (source, target) pairs into rows
+        counts = array('l', [0]) * (len(self.ids) + 1)
+        for source, target in edges:
+            counts[source + 1] += 1
+        for i in range(len(self.ids)):
+            counts[i + 1] += counts[i]
+        offsets = array('l', counts)
+        targets = array('l', [0]) * len(edges)
+        for source, target in edges:
+            targets[counts[source]] = target
+            counts[source] += 1
+        self.offsets = offsets
+        self.targets = targets
+        self.patched = {}
+
+    def compact(self):
+        edges = [(i, j) for i in range(len(self.ids)) for j in self.neighbours(i)]
+        self.build(edges)
+
+    def neighbours(self, i):
+        row = self.patched.get(i)
+        if row is not None:
+            return row
+        if i + 1 >= len(self.offsets):  # added since the arrays were built
+            return ()
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def node(self, pk):
+        i = self.index.get(pk)
+        if i is None:
+            i = self.index[pk] = len(self.ids)
+            self.ids.append(pk)
+            self.live.append(False)
+        return i
+
+    def update(self, pk, live=None, add=(), remove=()):
+        """Record a person's publishing state or friendships changing."""
+        with self.lock:
+            if self.version is not None:
+                i = self.node(pk)
+                if live is not None:
+                    self.live[i] = bool(live)
+                for others, connect in ((add, True), (remove, False)):
+                    for other in others:
+                        j = self.node(other)
+                        self._link(i, j, connect)
+                        self._link(j, i, connect)
+                if len(self.patched) > self.compact_after:
+                    self.compact()
+            self.changed()
+
+    def _link(self, i, j, connect):
+        row = set(self.neighbours(i))
+        if connect:
+            row.add(j)
+        else:
+            row.discard(j)
+        self.patched[i] = sorted(row)
+
+    def remove(self, pk):
+        with self.lock:
+            if self.version is not None and pk in self.index:
+                i = self.index[pk]
+                self.live[i] = False
+                for j in list(self.neighbours(i)):
+                    self._link(j, i, False)
+                self.patched[i] = []
+            self.changed()
+
+    def walk(self, pk, max_hops):
+        """{id: hops} for live people within ``max_hops`` of ``pk``."""
+        start = self.index.get(pk)
+        if start is None:
+            return {}
+        hops = {start: 0}
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            if hops[i] == max_hops:
+                continue
+            for j in self.neighbours(i):
+                if j not in hops and self.live[j]:
+                    hops[j] = hops[i] + 1
+                    queue.append(j)
+        del hops[start]
+        return {self.ids[i]: count for i, count in hops.items()}
+
+    def neighbourhood(self, pk, k=2):
+        """
+        Live people within ``k`` friendships of ``pk``, as [(hops, id)],
+        nearest first.
+        """
+        with self.lock:
+            return sorted((hops, other) for other, hops in self.walk(pk, k).items())
+
+    def shortest_path(self, source, target, max_hops=6):
+        """
+        The ids along a shortest chain of friendships from ``source`` to
+        ``target`` (both included), or None if there's none within
+        ``max_hops``.  Searches from both ends at once.
+        """
+        with self.lock:
+            if source not in self.index or target not in self.index:
+                return None
+            a, b = self.index[source], self.index[target]
+            if a == b:
+                return [source]
+            parents = [{a: None}, {b: None}]
+            frontiers = [[a], [b]]
+            for depth in range(max_hops):
+                # grow the smaller side
+                side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+                seen, other = parents[side], parents[1 - side]
+                frontier = []
+                for i in frontiers[side]:
+                    for j in self.neighbours(i):
+                        if j in seen or not (self.live[j] or j in other):
+                            continue
+                        seen[j] = i
+                        if j in other:
+                            return self._join(parents, j)
+                        frontier.append(j)
+                if not frontier:
+                    return None
+                frontiers[side] = frontier
+            return None
+
+    def _join(self, parents, meeting):
+        halves = []
+        for tree in parents:
+            half, i = [], meeting
+            while i is not None:
+                half.append(i)
+                i = tree[i]
+            halves.append(half)
+        # parents[0] leads back to the source, parents[1] to the target
+        path = halves[0][::-1] + halves[1][1:]
+        return [self.ids[i] for i in path]
+
+    def degrees(self, source, target, max_hops=6):
+        path = self.shortest_path(source, target, max_hops)
+        return None if path is None else len(path) - 1
+
+
+friend_graph = FriendGraph()
@@ -1,5 +1,6 @@
 from django import forms
 from django.db import models
+from django.db.models import prefetch_related_objects
 from django.utils.text import slugify
 
 from wagtail.wagtailadmin.edit_handlers import (
@@ -12,7 +13,10 @@ from wagtail.wagtailsnippets.models import register_snippet
 
 from modelcluster.fields import ParentalKey, ParentalManyToManyField
 
-from visualist.models import Record
+from visualist.models import Record, SpecificChildrenMixin
+from visualist.prefetch import prefetch_parental
+
+from .graph import friend_graph
 
 
 class Agent(Record):
@@ -47,6 +51,8 @@ class Person(Agent):
     friends = ParentalManyToManyField('self', blank=True)
     # family_members = ParentalManyToManyField('self', blank=True) # necessary?
 
+    template = 'vdirectory/person.html'
+
     parent_page_types = ['names.PersonIndex', 'names.Organization']
     search_fields = Agent.search_fields + [
         index.SearchField('gender'),
@@ -59,6 +65,18 @@ class Person(Agent):
     def split_title(self):
         pass # TODO
 
+    def connected_people(self, k=2, limit=10):
+        """Live people within ``k`` friendships, nearest first, each with
+        a ``hops`` count."""
+        nearby = friend_graph.current().neighbourhood(self.pk, k)[:limit]
+        people = Person.objects.live().in_bulk([pk for hops, pk in nearby])
+        connected = []
+        for hops, pk in nearby:
+            if pk in people:
+                people[pk].hops = hops
+                connected.append(people[pk])
+        return connected
+
     class Meta:
         verbose_name_plural = 'people'
 
@@ -77,18 +95,40 @@ class Organization(Agent):
 
     locations = ParentalManyToManyField('places.Place', blank=True)
 
+    template = 'vdirectory/organization.html'
+
     parent_page_types = [
         'names.OrganizationIndex', 'names.Organization']
     search_fields = Agent.search_fields + []
+    api_fields = [
+        'nonprofit', 'categories', 'employees', 'members', 'locations',
+        'emails', 'phones', 'social_accounts',
+    ]
     content_panels = Agent.content_panels + [
         FieldPanel('nonprofit'),
         FieldPanel('employees', widget=forms.CheckboxSelectMultiple),
         FieldPanel('members', widget=forms.CheckboxSelectMultiple),
     ]
 
+    @classmethod
+    def prefetch_relations(cls, organizations):
+        """Load every relation the page and the API show, a query each,
+        however many organizations and related records there are."""
+        for name in ('employees', 'members', 'locations'):
+            prefetch_parental(organizations, name)
+        prefetch_parental(organizations, 'categories', select=['icon'])
+        prefetch_related_objects(organizations,
+            'emails', 'phones', 'social_accounts', 'extra_names', 'source')
+
+    def get_context(self, request, *args, **kwargs):
+        context = super().get_context(request, *args, **kwargs)
+        Organization.prefetch_relations([self])
+        return context
+
 
-class PersonIndex(Page):
+class PersonIndex(SpecificChildrenMixin, Page):
     schema = 'http://schema.org/ItemList'
+    template = 'vdirectory/person_index_page.html'
 
     intro = RichTextField(blank=True)
 
@@ -99,13 +139,13 @@ class PersonIndex(Page):
     def get_context(self, request):
         # Update context to include only published posts, ordered by reverse-chron
         context = super().get_context(request)
-        people = self.get_children().live().order_by('-first_published_at')
-        context['people'] = people
+        context['people'] = self.specific_children()
         return context
 
 
-class OrganizationIndex(Page):
+class OrganizationIndex(SpecificChildrenMixin, Page):
     schema = 'http://schema.org/ItemList'
+    template = 'vdirectory/organization_index_page.html'
 
     intro = RichTextField(blank=True)
 
@@ -116,8 +156,7 @@ class OrganizationIndex(Page):
     def get_context(self, request):
         # Update context to include only published posts, ordered by reverse-chron
         context = super().get_context(request)
-        organizations = self.get_children().live().order_by('-first_published_at')
-        context['organizations'] = organizations
+        context['organizations'] = self.specific_children()
         return context
 
 
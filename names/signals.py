@@ -0,0 +1,89 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from wagtail.wagtailcore.signals import page_published, page_unpublished
+
+from visualist.models import ExtraName
+
+from .fuzzy import name_index
+from .graph import friend_graph
+from .models import Organization, Person
+
+
+INDEX_FIELDS = {'title', 'live'}
+KINDS = {Person: 'person', Organization: 'organization'}
+
+
+def sync(kind, page):
+    if page.live:
+        name_index.add(kind, page)
+    else:
+        name_index.remove(kind, page.pk)
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_save, sender=Organization)
+def sync_index(sender, instance, update_fields=None, **kwargs):
+    # revision saves only touch bookkeeping fields and carry draft values
+    if update_fields is not None and not INDEX_FIELDS & set(update_fields):
+        return
+    sync(KINDS[sender], instance)
+
+
+# bulk unpublishing saves plain Page instances, so listen here as well
+@receiver(page_published, sender=Person)
+@receiver(page_published, sender=Organization)
+@receiver(page_unpublished, sender=Person)
+@receiver(page_unpublished, sender=Organization)
+def sync_index_on_publish(sender, instance, **kwargs):
+    sync(KINDS[sender], instance)
+
+
+@receiver(post_delete, sender=Person)
+@receiver(post_delete, sender=Organization)
+def remove_from_index(sender, instance, **kwargs):
+    name_index.remove(KINDS[sender], instance.pk)
+
+
+@receiver(m2m_changed, sender=Person.extra_names.through)
+@receiver(m2m_changed, sender=Organization.extra_names.through)
+def sync_aliases(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if reverse:
+        name_index.invalidate()
+    else:
+        sync(KINDS[type(instance)], instance)
+
+
+@receiver(post_save, sender=ExtraName)
+@receiver(post_delete, sender=ExtraName)
+def invalidate_index(sender, **kwargs):
+    name_index.invalidate()
+
+
+@receiver(post_save, sender=Person)
+def add_to_graph(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or update_fields is None or 'live' in update_fields:
+        friend_graph.update(instance.pk, live=instance.live)
+
+
+@receiver(page_published, sender=Person)
+@receiver(page_unpublished, sender=Person)
+def sync_graph_on_publish(sender, instance, **kwargs):
+    friend_graph.update(instance.pk, live=instance.live)
+
+
+@receiver(post_delete, sender=Person)
+def remove_from_graph(sender, instance, **kwargs):
+    friend_graph.remove(instance.pk)
+
+
+@receiver(m2m_changed, sender=Person.friends.through)
+def sync_friends(sender, instance, action, pk_set, **kwargs):
+    if action == 'post_add':
+        friend_graph.update(instance.pk, add=pk_set)
+    elif action == 'post_remove':
+        friend_graph.update(instance.pk, remove=pk_set)
+    elif action == 'post_clear':
+        friend_graph.invalidate()
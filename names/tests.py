@@ -1,3 +1,289 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from wagtail.wagtailcore.models import Site
+
+from places.models import Place
+from visualist.models import ExtraName
+
+from .fuzzy import levenshtein, name_index, normalise, trigrams
+from .graph import friend_graph
+from .models import (
+    Email, Organization, OrganizationCategory, Person, PersonIndex, Phone,
+    SocialAccount)
+
+
+# these render pages to test them, which the page cache would short-circuit
+@override_settings(PAGE_CACHE_ALIAS=None)
+class NamesTestCase(TestCase):
+
+    def setUp(self):
+        self.root = Site.objects.get(is_default_site=True).root_page
+
+    def add_person(self, title, **kwargs):
+        return self.root.add_child(instance=Person(title=title, **kwargs))
+
+    def add_organization(self, title, **kwargs):
+        return self.root.add_child(instance=Organization(title=title, **kwargs))
+
+
+class FuzzyTest(TestCase):
+
+    def test_normalise(self):
+        self.assertEqual(normalise(' Gertrude  Abercrombie!'),
+            'gertrude abercrombie')
+        self.assertEqual(normalise('Ana Mendieta'), normalise('Aná Mendiéta'))
+
+    def test_trigrams(self):
+        self.assertEqual(trigrams('cat'), {'  c', ' ca', 'cat', 'at '})
+
+    def test_levenshtein(self):
+        self.assertEqual(levenshtein('kitten', 'sitting'), 3)
+        self.assertEqual(levenshtein('', 'abc'), 3)
+
+
+class NameIndexTest(NamesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        # forget what earlier tests' (rolled back) pages put in the index
+        name_index.version = None
+        super().setUp()
+        self.gates = self.add_person('Theaster Gates')
+        self.abercrombie = self.add_person('Gertrude Abercrombie')
+        self.renaissance = self.add_organization('Renaissance Society')
+        self.gates.extra_names.add(ExtraName.objects.create(name='Rebuild Man'))
+
+    def ids(self, name, **kwargs):
+        return [pk for score, kind, pk, title, matched
+            in name_index.current().match(name, **kwargs)]
+
+    def test_misspellings(self):
+        self.assertEqual(self.ids('Theastre Gates')[0], self.gates.pk)
+        self.assertEqual(self.ids('gertrud abercromby')[0], self.abercrombie.pk)
+        self.assertEqual(self.ids('Renaisance Society')[0], self.renaissance.pk)
+        self.assertEqual(self.ids('zzzz'), [])
+
+    def test_aliases(self):
+        score, kind, pk, title, matched = name_index.current().match('Rebild Man')[0]
+        self.assertEqual((kind, pk, title, matched),
+            ('person', self.gates.pk, 'Theaster Gates', 'rebuild man'))
+
+    def test_type_filter(self):
+        self.assertEqual(self.ids('Renaissance', kind='person'), [])
+        self.assertEqual(self.ids('Renaissance', kind='organization'),
+            [self.renaissance.pk])
+
+    def test_publishing_updates_index(self):
+        name_index.current()
+        self.gates.unpublish()
+        self.assertNotIn(self.gates.pk, self.ids('Theaster Gates'))
+
+        self.gates.title = 'Theaster Gates Jr.'
+        self.gates.save_revision().publish()
+        score, kind, pk, title, matched = name_index.current().match('gates jr')[0]
+        self.assertEqual((pk, title), (self.gates.pk, 'Theaster Gates Jr.'))
+
+        self.abercrombie.delete()
+        self.assertEqual(self.ids('Gertrude Abercrombie'), [])
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse('names_match'),
+            {'q': 'Abercromby', 'type': 'person'})
+        match = response.json()['matches'][0]
+        self.assertEqual((match['type'], match['id']),
+            ('person', self.abercrombie.pk))
+
+        response = self.client.get(reverse('names_match'),
+            {'q': 'Abercromby', 'type': 'place'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FriendGraphTest(NamesTestCase):
+
+    def setUp(self):
+        cache.clear()
+        friend_graph.version = None
+        super().setUp()
+        # a - b - c - d, and e on its own
+        self.a, self.b, self.c, self.d, self.e = [
+            self.add_person(title) for title in 'ABCDE']
+        for person, friend in [(self.a, self.b), (self.b, self.c),
+                (self.c, self.d)]:
+            person.friends.add(friend)
+            person.save()
+
+    def neighbourhood(self, person, k):
+        return friend_graph.current().neighbourhood(person.pk, k)
+
+    def test_neighbourhood(self):
+        self.assertEqual(self.neighbourhood(self.b, 1),
+            [(1, self.a.pk), (1, self.c.pk)])
+        self.assertEqual(self.neighbourhood(self.a, 2),
+            [(1, self.b.pk), (2, self.c.pk)])
+        self.assertEqual(self.neighbourhood(self.e, 3), [])
+
+    def test_shortest_path(self):
+        graph = friend_graph.current()
+        self.assertEqual(graph.shortest_path(self.a.pk, self.d.pk),
+            [self.a.pk, self.b.pk, self.c.pk, self.d.pk])
+        self.assertEqual(graph.degrees(self.d.pk, self.a.pk), 3)
+        self.assertIsNone(graph.shortest_path(self.a.pk, self.d.pk, max_hops=2))
+        self.assertIsNone(graph.shortest_path(self.a.pk, self.e.pk))
+
+    def test_updates_follow_saves(self):
+        friend_graph.current()
+        self.a.friends.add(self.e)
+        self.a.save()
+        self.assertEqual(self.neighbourhood(self.e, 1), [(1, self.a.pk)])
+
+        self.b.friends.remove(self.c)
+        self.b.save()
+        self.assertIsNone(friend_graph.current().shortest_path(self.a.pk, self.d.pk))
+
+        # unpublished people aren't walked through
+        self.a.unpublish()
+        self.assertEqual(self.neighbourhood(self.e, 2), [])
+
+    def test_compaction_keeps_edges(self):
+        graph = friend_graph.current()
+        graph.compact_after = 0
+        try:
+            self.d.friends.add(self.e)
+            self.d.save()
+        finally:
+            del graph.compact_after
+        self.assertEqual(graph.patched, {})
+        self.assertEqual(graph.degrees(self.a.pk, self.e.pk), 4)
+
+    def test_other_processes_reload(self):
+        friend_graph.current()
+        Person.friends.through.objects.filter(
+            from_person=self.c, to_person=self.d).delete()
+        Person.friends.through.objects.filter(
+            from_person=self.d, to_person=self.c).delete()
+        friend_graph.changed()
+        friend_graph.version = 'stale'
+        self.assertEqual(self.neighbourhood(self.c, 1), [(1, self.b.pk)])
+
+    def test_connected_people_and_endpoint(self):
+        connected = self.a.connected_people()
+        self.assertEqual([(p.pk, p.hops) for p in connected],
+            [(self.b.pk, 1), (self.c.pk, 2)])
+
+        response = self.client.get(reverse('names_friends'),
+            {'id': self.a.pk, 'to': self.c.pk, 'k': 1})
+        self.assertEqual(response.json(), {
+            'id': self.a.pk,
+            'neighbourhood': [{'id': self.b.pk, 'hops': 1}],
+            'path': [self.a.pk, self.b.pk, self.c.pk],
+        })
+
+
+class OrganizationRelationsTest(NamesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.organization = self.add_organization('Hyde Park Art Center')
+        self.relations = 0
+
+    def add_relations(self, count):
+        # another employee, member, location, category, email, phone,
+        # social account and alias each time round
+        for i in range(self.relations, self.relations + count):
+            person = self.add_person('Person {}'.format(i))
+            place = self.root.add_child(instance=Place(title='Place {}'.format(i),
+                hours='By appointment', latitude=Decimal(i), longitude=Decimal(i)))
+            self.organization.employees.add(person)
+            self.organization.members.add(person)
+            self.organization.locations.add(place)
+            self.organization.categories.add(
+                OrganizationCategory.objects.create(name='Category {}'.format(i)))
+            self.organization.emails.add(
+                Email.objects.create(address='{}@example.com'.format(i)))
+            self.organization.phones.add(Phone.objects.create(
+                area_code=312, exchange_code=555, number=i))
+            self.organization.social_accounts.add(SocialAccount.objects.create(
+                service='twitter', account='account{}'.format(i)))
+            self.organization.extra_names.add(
+                ExtraName.objects.create(name='Alias {}'.format(i)))
+        self.organization.save()
+        self.relations += count
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_page_queries_dont_grow(self):
+        self.add_relations(1)
+        few, response = self.count_queries(self.organization.url)
+        self.assertContains(response, 'Person 0')
+        self.assertContains(response, 'Alias 0')
+
+        self.add_relations(5)
+        many, response = self.count_queries(self.organization.url)
+        self.assertContains(response, 'Place 5')
+        self.assertContains(response, 'account5')
+        self.assertEqual(few, many)
+
+    def test_api_queries_dont_grow(self):
+        detail = reverse('wagtailapi:pages:detail', args=[self.organization.pk])
+        listing = reverse('wagtailapi:pages:listing') + \
+            '?type=names.Organization&fields=employees,locations,emails'
+
+        self.add_relations(1)
+        self.count_queries(detail)  # warm the content type cache
+        few = [self.count_queries(detail)[0], self.count_queries(listing)[0]]
+
+        self.add_relations(5)
+        many_detail, response = self.count_queries(detail)
+        self.assertEqual(len(response.json()['employees']), 6)
+        many_listing, response = self.count_queries(listing)
+        self.assertEqual(len(response.json()['items'][0]['locations']), 6)
+        self.assertEqual(few, [many_detail, many_listing])
+
+
+class IndexPageTest(NamesTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.people = self.root.add_child(
+            instance=PersonIndex(title='People', slug='people'))
+        self.count = 0
+
+    def add_children(self, count):
+        for i in range(self.count, self.count + count):
+            self.people.add_child(instance=Person(
+                title='Person {}'.format(i), body='<p>Bio {}</p>'.format(i)))
+            # indexes can hold other page types, each resolved separately
+            self.people.add_child(instance=Organization(
+                title='Organization {}'.format(i)))
+        self.count += count
+
+    def test_children_resolved_per_content_type(self):
+        self.add_children(3)
+        index = PersonIndex.objects.get(pk=self.people.pk)
+        with self.assertNumQueries(3):
+            children = index.specific_children()
+        self.assertEqual({type(child) for child in children}, {Person, Organization})
+        with self.assertNumQueries(0):
+            index.specific_children()
+
+    def test_page_queries_dont_grow(self):
+        self.add_children(1)
+        self.client.get(self.people.url)  # warm the content type cache
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(self.people.url)
+
+        self.add_children(5)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(self.people.url)
+        self.assertContains(response, 'Bio 5')
+        self.assertEqual(len(few), len(many))
@@ -1,3 +1,46 @@
-from django.shortcuts import render
+from django.http import JsonResponse
 
-# Create your views here.
+from .fuzzy import name_index
+from .graph import friend_graph
+
+
+def parse_int(value, default, low, high):
+    try:
+        return min(max(int(value), low), high)
+    except (TypeError, ValueError):
+        return default
+
+
+def match(request):
+    # ?q=<a possibly misspelled name>&type=person|organization&limit=10
+    limit = parse_int(request.GET.get('limit'), 10, 1, 50)
+    kind = request.GET.get('type') or None
+    if kind not in (None, 'person', 'organization'):
+        return JsonResponse({'error': 'type must be person or organization'},
+            status=400)
+
+    matches = name_index.current().match(request.GET.get('q', ''), limit, kind)
+    return JsonResponse({'matches': [{
+        'score': round(score, 3),
+        'type': match_type,
+        'id': pk,
+        'title': title,
+        'matched': matched,
+    } for score, match_type, pk, title, matched in matches]})
+
+
+def friends(request):
+    # ?id=<person>&k=2 for their neighbourhood, plus &to=<person> for the
+    # shortest chain of friendships between the two
+    person = parse_int(request.GET.get('id'), None, 1, 2 ** 62)
+    if person is None:
+        return JsonResponse({'error': 'id is required'}, status=400)
+    graph = friend_graph.current()
+
+    data = {'id': person, 'neighbourhood': [
+        {'id': pk, 'hops': hops} for hops, pk
+        in graph.neighbourhood(person, parse_int(request.GET.get('k'), 2, 1, 6))]}
+    if 'to' in request.GET:
+        data['path'] = graph.shortest_path(
+            person, parse_int(request.GET.get('to'), None, 1, 2 ** 62))
+    return JsonResponse(data)
@@ -0,0 +1,82 @@
+import math
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=12):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        span, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (span[0] + span[1]) / 2
+        if coordinate >= middle:
+            value = value << 1 | 1
+            span[0] = middle
+        else:
+            value = value << 1
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell of ``precision`` chars."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def covering_geohashes(south, west, north, east, max_cells=16):
+    """
+    The geohash prefixes of the cells covering a bounding box, at the
+    finest precision that needs no more than ``max_cells`` of them.
+    """
+    for precision in range(12, 0, -1):
+        height, width = cell_size(precision)
+        rows = int(north // height - south // height) + 1
+        columns = int(east // width - west // width) + 1
+        if rows * columns <= max_cells:
+            break
+
+    hashes = {encode_geohash(latitude, longitude, precision)
+        for latitude in (south, north) for longitude in (west, east)}
+    for row in range(rows):
+        latitude = min(south + row * height, north)
+        for column in range(columns):
+            longitude = min(west + column * width, east)
+            hashes.add(encode_geohash(latitude, longitude, precision))
+    return sorted(hashes)
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in kilometres."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(south, west, north, east) of a box enclosing a circle."""
+    dlat = radius_km / KM_PER_DEGREE
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+    dlng = dlat / math.cos(math.radians(abs(latitude) + dlat))
+    if dlng >= 180:
+        return south, -180.0, north, 180.0
+    return south, wrap(longitude - dlng), north, wrap(longitude + dlng)
+
+
+def wrap(longitude):
+    return (longitude + 180.0) % 360.0 - 180.0
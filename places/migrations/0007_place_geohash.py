@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:31
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def set_geohashes(apps, schema_editor):
+    from places.geo import encode_geohash
+
+    Place = apps.get_model('places', 'Place')
+    for place in Place.objects.iterator():
+        Place.objects.filter(pk=place.pk).update(geohash=encode_geohash(
+            float(place.latitude), float(place.longitude)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0006_auto_20171118_1324'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(set_geohashes, migrations.RunPython.noop),
+    ]
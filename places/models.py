@@ -1,13 +1,52 @@
 from django.db import models
+from django.db.models import Q
 
 from wagtail.wagtailimages.edit_handlers import ImageChooserPanel
 from wagtail.wagtailsnippets.models import register_snippet
 from wagtail.wagtailadmin.edit_handlers import FieldPanel
+from wagtail.wagtailcore.models import PageManager
+from wagtail.wagtailcore.query import PageQuerySet
 
 from modelcluster.fields import ParentalKey, ParentalManyToManyField
 
 from visualist.models import Record
 
+from .geo import bounding_box, covering_geohashes, encode_geohash, haversine
+
+
+class PlaceQuerySet(PageQuerySet):
+
+    def within_bbox(self, south, west, north, east):
+        # a box across the antimeridian is two boxes
+        if west > east:
+            return self.within_bbox(south, west, north, 180.0) | \
+                self.within_bbox(south, -180.0, north, east)
+
+        # index range scans over the geohash cells covering the box,
+        # then the exact bounds
+        cells = Q()
+        for prefix in covering_geohashes(south, west, north, east):
+            cells |= Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+        return self.filter(cells,
+            latitude__gte=south, latitude__lte=north,
+            longitude__gte=west, longitude__lte=east)
+
+    def near(self, latitude, longitude, radius_km):
+        """
+        Places within ``radius_km`` of a point as a list, nearest first,
+        each with its ``distance`` in kilometres.
+        """
+        places = []
+        candidates = self.within_bbox(
+            *bounding_box(latitude, longitude, radius_km))
+        for place in candidates:
+            place.distance = haversine(latitude, longitude,
+                float(place.latitude), float(place.longitude))
+            if place.distance <= radius_km:
+                places.append(place)
+        places.sort(key=lambda place: place.distance)
+        return places
+
 
 class Place(Record):
     schema = 'http://schema.org/Place'
@@ -28,6 +67,12 @@ class Place(Record):
         decimal_places=7,
         max_digits=10,
     )
+    geohash = models.CharField(
+        max_length=12,
+        db_index=True,
+        editable=False,
+        blank=True,
+    )
     altitude = models.DecimalField(
         decimal_places=7,
         max_digits=10,
@@ -76,6 +121,17 @@ class Place(Record):
         null=True,
     )
 
+    objects = PageManager.from_queryset(PlaceQuerySet)()
+
+    def set_geohash(self):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(
+                float(self.latitude), float(self.longitude))
+
+    def save(self, *args, **kwargs):
+        self.set_geohash()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         street_single_line = self.street.replace('\r\n', ', ')
         return '{}, {} {}'.format(street_single_line, self.locality, self.region)
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from wagtail.wagtailcore.signals import page_published, page_unpublished
+
+from .models import Place
+from .spatial import place_index
+
+
+INDEX_FIELDS = {'latitude', 'longitude', 'live'}
+
+
+def sync(place):
+    if place.live:
+        place_index.add(
+            place.pk, float(place.latitude), float(place.longitude))
+    else:
+        place_index.remove(place.pk)
+
+
+@receiver(post_save, sender=Place)
+def sync_index(sender, instance, update_fields=None, **kwargs):
+    # revision saves only touch bookkeeping fields and carry draft values
+    if update_fields is not None and not INDEX_FIELDS & set(update_fields):
+        return
+    sync(instance)
+
+
+# bulk unpublishing saves plain Page instances, so listen here as well
+@receiver(page_published, sender=Place)
+@receiver(page_unpublished, sender=Place)
+def sync_index_on_publish(sender, instance, **kwargs):
+    sync(instance)
+
+
+@receiver(post_delete, sender=Place)
+def remove_from_index(sender, instance, **kwargs):
+    place_index.remove(instance.pk)
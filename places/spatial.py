@@ -0,0 +1,158 @@
+import heapq
+import math
+from array import array
+
+from visualist.indexes import SharedIndex
+
+from .geo import KM_PER_DEGREE, haversine
+
+
+class PlaceIndex(SharedIndex):
+    """
+    A process-local grid index over live place coordinates.
+
+    Coordinates live in flat float arrays (a slot per place) rather than
+    model instances, and a dict of grid cell -> slots answers k-nearest
+    queries by searching rings of cells outwards from the query point.
+    Publishing and unpublishing patch it in place; other processes see a
+    new version stamp and reload.
+    """
+    cell_size = 0.01  # degrees, a little over a kilometre
+    version_cache_key = 'places:index-version'
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.ids = array('l')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.slots = {}
+        self.free = []
+        self.cells = {}
+        self.bounds = None
+
+    def cell(self, latitude, longitude):
+        return (int(math.floor(latitude / self.cell_size)),
+                int(math.floor(longitude / self.cell_size)))
+
+    def load(self):
+        from .models import Place
+
+        with self.lock:
+            self.clear()
+            for pk, latitude, longitude in Place.objects.live() \
+                    .values_list('pk', 'latitude', 'longitude').iterator():
+                self._add(pk, float(latitude), float(longitude))
+
+    def add(self, pk, latitude, longitude):
+        with self.lock:
+            if self.version is not None:
+                self._remove(pk)
+                self._add(pk, latitude, longitude)
+            self.changed()
+
+    def remove(self, pk):
+        with self.lock:
+            if self.version is not None:
+                self._remove(pk)
+            self.changed()
+
+    def _add(self, pk, latitude, longitude):
+        if self.free:
+            slot = self.free.pop()
+            self.ids[slot] = pk
+            self.latitudes[slot] = latitude
+            self.longitudes[slot] = longitude
+        else:
+            slot = len(self.ids)
+            self.ids.append(pk)
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+        self.slots[pk] = slot
+
+        cell = self.cell(latitude, longitude)
+        self.cells.setdefault(cell, []).append(slot)
+        if self.bounds is None:
+            self.bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            self.bounds = [min(self.bounds[0], cell[0]), min(self.bounds[1], cell[1]),
+                max(self.bounds[2], cell[0]), max(self.bounds[3], cell[1])]
+
+    def _remove(self, pk):
+        slot = self.slots.pop(pk, None)
+        if slot is None:
+            return
+        cell = self.cell(self.latitudes[slot], self.longitudes[slot])
+        self.cells[cell].remove(slot)
+        if not self.cells[cell]:
+            del self.cells[cell]
+        self.ids[slot] = -1
+        self.free.append(slot)
+
+    def nearest(self, latitude, longitude, k, exclude=()):
+        """
+        [(distance in km, place id, latitude, longitude)] of the ``k``
+        nearest places.
+        """
+        exclude = set(exclude)
+        best = []  # a max-heap on distance, by negation
+
+        def consider(slot):
+            pk = self.ids[slot]
+            if pk in exclude:
+                return
+            point = self.latitudes[slot], self.longitudes[slot]
+            distance = haversine(latitude, longitude, *point)
+            if len(best) < k:
+                heapq.heappush(best, (-distance, pk) + point)
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, pk) + point)
+
+        with self.lock:
+            if not self.slots:
+                return []
+            row, column = self.cell(latitude, longitude)
+            # rings past this one can't hold anything
+            last_ring = max(abs(row - self.bounds[0]), abs(row - self.bounds[2]),
+                abs(column - self.bounds[1]), abs(column - self.bounds[3]))
+
+            visited = 0
+            for ring in range(last_ring + 1):
+                visited += max(8 * ring, 1)
+                if visited > 4 * len(self.cells):
+                    # the neighbours are far off; a flat scan is cheaper
+                    # than walking empty cells
+                    del best[:]
+                    for slots in self.cells.values():
+                        for slot in slots:
+                            consider(slot)
+                    break
+
+                for cell in ring_cells(row, column, ring):
+                    for slot in self.cells.get(cell, ()):
+                        consider(slot)
+
+                # anything in the next ring is at least this far away
+                reach = ring * self.cell_size * KM_PER_DEGREE * math.cos(
+                    math.radians(min(abs(latitude) + (ring + 1) * self.cell_size, 89.9)))
+                if len(best) == k and reach >= -best[0][0]:
+                    break
+
+        return sorted((-entry[0],) + entry[1:] for entry in best)
+
+
+def ring_cells(row, column, ring):
+    if ring == 0:
+        yield row, column
+        return
+    for offset in range(-ring, ring + 1):
+        yield row - ring, column + offset
+        yield row + ring, column + offset
+    for offset in range(-ring + 1, ring):
+        yield row + offset, column - ring
+        yield row + offset, column + ring
+
+
+place_index = PlaceIndex()
@@ -1,3 +1,206 @@
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+
+from wagtail.wagtailcore.models import Site
+
+from .geo import covering_geohashes, encode_geohash, haversine
+from .models import Place, PlaceCategory
+from .spatial import place_index
+from .tiles import tile_xy
+
+
+class PlaceTestCase(TestCase):
+
+    def setUp(self):
+        self.root = Site.objects.get(is_default_site=True).root_page
+
+    def add_place(self, title, latitude, longitude, **kwargs):
+        return self.root.add_child(instance=Place(
+            title=title, hours='By appointment',
+            latitude=Decimal(str(latitude)), longitude=Decimal(str(longitude)),
+            **kwargs))
+
+
+class GeoTest(TestCase):
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(41.8781, -87.6298, 7), 'dp3wjzt')
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_covering_geohashes_contain_every_point(self):
+        south, west, north, east = 41.8, -87.8, 42.0, -87.5
+        cells = covering_geohashes(south, west, north, east)
+        self.assertLessEqual(len(cells), 16)
+        for lat in (41.8, 41.85, 41.9, 41.95, 42.0):
+            for lng in (-87.8, -87.7, -87.6, -87.5):
+                self.assertTrue(any(
+                    encode_geohash(lat, lng).startswith(cell) for cell in cells))
+
+    def test_haversine(self):
+        # the Art Institute to the MCA, about 2km
+        self.assertAlmostEqual(
+            haversine(41.8796, -87.6237, 41.8971, -87.6212), 1.96, places=2)
+
+
+class PlaceSearchTest(PlaceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.art_institute = self.add_place('Art Institute', 41.8796, -87.6237)
+        self.mca = self.add_place('MCA', 41.8971, -87.6212)
+        self.hyde_park = self.add_place('Hyde Park Art Center', 41.8027, -87.5920)
+        self.milwaukee = self.add_place('Milwaukee Art Museum', 43.0400, -87.8971)
+
+    def test_geohash_kept_in_sync(self):
+        self.assertEqual(self.mca.geohash, encode_geohash(41.8971, -87.6212))
+        self.mca.latitude = Decimal('41.9')
+        self.mca.save()
+        self.assertTrue(Place.objects.get(pk=self.mca.pk).geohash.startswith(
+            encode_geohash(41.9, -87.6212, 6)))
+
+    def test_near(self):
+        places = Place.objects.live().near(41.8800, -87.6240, 3)
+        self.assertEqual(places, [self.art_institute, self.mca])
+        self.assertLess(places[0].distance, places[1].distance)
+
+        places = Place.objects.live().near(41.8800, -87.6240, 15)
+        self.assertEqual(places, [self.art_institute, self.mca, self.hyde_park])
+
+    def test_within_bbox(self):
+        self.assertEqual(
+            set(Place.objects.within_bbox(41.7, -87.7, 41.95, -87.5)),
+            {self.art_institute, self.mca, self.hyde_park})
+        self.assertEqual(
+            list(Place.objects.within_bbox(42.5, -88.5, 43.5, -87.5)),
+            [self.milwaukee])
+
+    def test_json_endpoints(self):
+        response = self.client.get(reverse('places_near'),
+            {'lat': 41.88, 'lng': -87.624, 'radius': 3})
+        self.assertEqual([place['title'] for place in response.json()['places']],
+            ['Art Institute', 'MCA'])
+
+        response = self.client.get(reverse('places_within'),
+            {'bbox': '42.5,-88.5,43.5,-87.5'})
+        self.assertEqual([place['title'] for place in response.json()['places']],
+            ['Milwaukee Art Museum'])
+
+        response = self.client.get(reverse('places_near'), {'lat': 'north'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_finite_numbers_refused(self):
+        for name, params in [
+                ('places_near', {'lat': 'nan', 'lng': -87.6}),
+                ('places_near', {'lat': 41.8, 'lng': -87.6, 'radius': 'inf'}),
+                ('places_within', {'bbox': '41,-88,nan,-87'}),
+                ('places_within', {'bbox': '-inf,-88,42,inf'}),
+                ('places_nearest', {'lat': 41.8, 'lng': -87.6, 'k': 'inf'}),
+                ('places_clusters', {'bbox': '41,-88,42,-87', 'zoom': 'nan'})]:
+            response = self.client.get(reverse(name), params)
+            self.assertEqual(response.status_code, 400, (name, params))
+
+
+class PlaceIndexTest(PlaceSearchTest):
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def nearest(self, latitude, longitude, k, **kwargs):
+        index = place_index.current()
+        return [pk for distance, pk, lat, lng
+            in index.nearest(latitude, longitude, k, **kwargs)]
+
+    def test_nearest(self):
+        self.assertEqual(self.nearest(41.88, -87.624, 2),
+            [self.art_institute.pk, self.mca.pk])
+        self.assertEqual(self.nearest(41.88, -87.624, 10),
+            [self.art_institute.pk, self.mca.pk, self.hyde_park.pk,
+             self.milwaukee.pk])
+        self.assertEqual(
+            self.nearest(41.88, -87.624, 1, exclude=[self.art_institute.pk]),
+            [self.mca.pk])
+        # from far away the grid walk gives up for a flat scan
+        self.assertEqual(self.nearest(48.85, 2.35, 1), [self.milwaukee.pk])
+
+    def test_publishing_updates_index(self):
+        place_index.current()
+        self.mca.unpublish()
+        self.assertEqual(self.nearest(41.8971, -87.6212, 1),
+            [self.art_institute.pk])
+
+        self.mca.save_revision().publish()
+        self.assertEqual(self.nearest(41.8971, -87.6212, 1), [self.mca.pk])
+
+        gallery = self.add_place('Gallery', 41.8970, -87.6210)
+        self.assertEqual(self.nearest(41.8969, -87.6208, 1), [gallery.pk])
+
+    def test_other_processes_reload(self):
+        place_index.current()
+        # a publish elsewhere only bumps the shared version
+        Place.objects.filter(pk=self.mca.pk).update(live=False)
+        place_index.changed()
+        place_index.version = 'stale'
+        self.assertEqual(self.nearest(41.8971, -87.6212, 1),
+            [self.art_institute.pk])
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse('places_nearest'),
+            {'lat': 41.88, 'lng': -87.624, 'k': 1})
+        self.assertEqual(response.json()['places'][0]['id'],
+            self.art_institute.pk)
+
+
+class PlaceTilesTest(PlaceSearchTest):
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.museum = PlaceCategory.objects.create(name='Museum')
+        for place in (self.art_institute, self.mca, self.milwaukee):
+            place.categories.add(self.museum)
+            place.save()
+
+    def test_tile_xy(self):
+        self.assertEqual(tile_xy(0, 0, 1), (1, 1))
+        self.assertEqual(tile_xy(41.8796, -87.6237, 10), (262, 380))
+
+    def get_clusters(self, **params):
+        response = self.client.get(reverse('places_clusters'), dict(
+            {'bbox': '41.5,-88.5,43.5,-87'}, **params))
+        return response.json()['tiles']
+
+    def test_clusters(self):
+        tiles = self.get_clusters(zoom=4)
+        self.assertEqual(len(tiles), 1)
+        self.assertEqual([c['count'] for c in tiles[0]['clusters']], [4])
+
+        tiles = self.get_clusters(zoom=8)
+        counts = sorted(c['count'] for t in tiles for c in t['clusters'])
+        self.assertEqual(counts, [1, 3])
+
+        tiles = self.get_clusters(zoom=8, category=self.museum.pk)
+        counts = sorted(c['count'] for t in tiles for c in t['clusters'])
+        self.assertEqual(counts, [1, 2])
+
+    def test_clusters_follow_publishing(self):
+        self.get_clusters(zoom=4)
+        self.hyde_park.unpublish()
+        tiles = self.get_clusters(zoom=4)
+        self.assertEqual([c['count'] for c in tiles[0]['clusters']], [3])
 
-# Create your tests here.
+    def test_too_many_tiles(self):
+        response = self.client.get(reverse('places_clusters'),
+            {'bbox': '-60,-170,60,170', 'zoom': 12})
+        self.assertEqual(response.status_code, 400)
+        # the whole world at the deepest zoom is refused without building it
+        response = self.client.get(reverse('places_clusters'),
+            {'bbox': '-85,-180,85,180', 'zoom': 20})
+        self.assertEqual(response.status_code, 400)
+        # as is a box wrapping round the antimeridian
+        response = self.client.get(reverse('places_clusters'),
+            {'bbox': '41,170,42,-170', 'zoom': 12})
+        self.assertEqual(response.status_code, 400)
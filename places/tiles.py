@@ -0,0 +1,129 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from visualist.indexes import expired
+
+from .spatial import place_index
+
+
+MAX_ZOOM = 20
+CLUSTER_DEPTH = 3  # 8x8 clusters per tile
+MAX_LATITUDE = 85.0511287798
+
+
+def tile_xy(latitude, longitude, zoom):
+    """Web Mercator (slippy map) tile containing a point."""
+    latitude = max(min(latitude, MAX_LATITUDE), -MAX_LATITUDE)
+    n = 2 ** zoom
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+class QuadTree(object):
+    """
+    Point counts and coordinate sums for every tile at every zoom level,
+    keyed by tile address, so any tile's clusters are a few dict lookups.
+    """
+
+    def __init__(self, points):
+        self.levels = [{} for zoom in range(MAX_ZOOM + 1)]
+        for latitude, longitude in points:
+            x, y = tile_xy(latitude, longitude, MAX_ZOOM)
+            for zoom in range(MAX_ZOOM, -1, -1):
+                shift = MAX_ZOOM - zoom
+                node = self.levels[zoom].get((x >> shift, y >> shift))
+                if node is None:
+                    self.levels[zoom][(x >> shift, y >> shift)] = \
+                        [1, latitude, longitude]
+                else:
+                    node[0] += 1
+                    node[1] += latitude
+                    node[2] += longitude
+
+    def clusters(self, zoom, x, y):
+        depth = min(CLUSTER_DEPTH, MAX_ZOOM - zoom)
+        level = self.levels[zoom + depth]
+        size = 2 ** depth
+        clusters = []
+        for cx in range(x * size, (x + 1) * size):
+            for cy in range(y * size, (y + 1) * size):
+                node = level.get((cx, cy))
+                if node:
+                    clusters.append({
+                        'latitude': round(node[1] / node[0], 6),
+                        'longitude': round(node[2] / node[0], 6),
+                        'count': node[0],
+                    })
+        return clusters
+
+
+class PlaceTiles(object):
+    """
+    Quadtrees over live places (all of them, and per PlaceCategory),
+    rebuilt when the place index's version stamp moves (or they're past
+    INDEX_MAX_AGE); tiles cut from them are cached under that version.
+    """
+    tile_timeout = 60 * 60
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.loaded_at = None
+        self.points = {}
+        self.trees = {}
+
+    def load(self):
+        from .models import Place
+
+        points = {None: []}
+        coordinates = {}
+        for pk, latitude, longitude in Place.objects.live() \
+                .values_list('pk', 'latitude', 'longitude').iterator():
+            coordinates[pk] = (float(latitude), float(longitude))
+            points[None].append(coordinates[pk])
+        for pk, category in Place.categories.through.objects \
+                .values_list('place_id', 'placecategory_id').iterator():
+            if pk in coordinates:
+                points.setdefault(category, []).append(coordinates[pk])
+        self.points = points
+        self.trees = {}
+
+    def tree(self, version, category=None):
+        with self.lock:
+            if version != self.version or expired(self.loaded_at):
+                self.load()
+                self.version = version
+                self.loaded_at = time.monotonic()
+            if category not in self.trees:
+                self.trees[category] = QuadTree(self.points.get(category, []))
+            return self.trees[category]
+
+    def tiles(self, zoom, tiles, category=None):
+        """Clusters for each (x, y) tile at ``zoom``, cached per tile."""
+        version = place_index.stamp()
+        keys = {tile: 'places:tile:{}:{}:{}/{}/{}'.format(
+            version, category or 'all', zoom, *tile) for tile in tiles}
+        cached = cache.get_many(keys.values())
+
+        results, missing = {}, {}
+        for tile, key in keys.items():
+            if key in cached:
+                results[tile] = cached[key]
+            else:
+                tree = self.tree(version, category)
+                results[tile] = missing[key] = tree.clusters(zoom, *tile)
+        if missing:
+            timeout = self.tile_timeout
+            max_age = getattr(settings, 'INDEX_MAX_AGE', None)
+            if max_age is not None:
+                timeout = min(timeout, max_age)
+            cache.set_many(missing, timeout)
+        return results
+
+
+place_tiles = PlaceTiles()
@@ -1,3 +1,112 @@
-from django.shortcuts import render
+import math
 
-# Create your views here.
+from django.http import JsonResponse
+
+from .models import Place
+from .spatial import place_index
+from .tiles import MAX_ZOOM, place_tiles, tile_xy
+
+
+MAX_TILES = 64
+
+
+def parse_floats(values, count):
+    try:
+        values = [float(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+    # float() takes 'nan' and 'inf', which no coordinate, radius or zoom is
+    if len(values) != count or not all(math.isfinite(value) for value in values):
+        return None
+    return values
+
+
+def serialize(place):
+    data = {
+        'id': place.pk,
+        'title': place.title,
+        'url': place.url,
+        'latitude': float(place.latitude),
+        'longitude': float(place.longitude),
+    }
+    if hasattr(place, 'distance'):
+        data['distance'] = round(place.distance, 4)
+    return data
+
+
+def near(request):
+    # ?lat=41.88&lng=-87.63&radius=2 (kilometres)
+    point = parse_floats(
+        [request.GET.get('lat'), request.GET.get('lng')], 2)
+    radius = parse_floats([request.GET.get('radius', 1)], 1)
+    if point is None or radius is None:
+        return JsonResponse(
+            {'error': 'lat, lng and radius must be numbers'}, status=400)
+    radius = min(max(radius[0], 0), 100)
+
+    places = Place.objects.live().near(point[0], point[1], radius)
+    return JsonResponse({'places': [serialize(place) for place in places]})
+
+
+def nearest(request):
+    # ?lat=41.88&lng=-87.63&k=10
+    point = parse_floats(
+        [request.GET.get('lat'), request.GET.get('lng')], 2)
+    k = parse_floats([request.GET.get('k', 10)], 1)
+    if point is None or k is None:
+        return JsonResponse(
+            {'error': 'lat, lng and k must be numbers'}, status=400)
+    k = min(max(int(k[0]), 1), 100)
+
+    # the index holds everything the map needs; no queries
+    nearest = place_index.current().nearest(point[0], point[1], k)
+    return JsonResponse({'places': [{
+        'id': pk,
+        'latitude': latitude,
+        'longitude': longitude,
+        'distance': round(distance, 4),
+    } for distance, pk, latitude, longitude in nearest]})
+
+
+def within(request):
+    # ?bbox=south,west,north,east
+    bbox = parse_floats(request.GET.get('bbox', '').split(','), 4)
+    if bbox is None or bbox[0] > bbox[2]:
+        return JsonResponse(
+            {'error': 'bbox must be south,west,north,east'}, status=400)
+
+    places = Place.objects.live().within_bbox(*bbox)
+    return JsonResponse({'places': [serialize(place) for place in places]})
+
+
+def clusters(request):
+    # ?bbox=south,west,north,east&zoom=12[&category=3]
+    bbox = parse_floats(request.GET.get('bbox', '').split(','), 4)
+    zoom = parse_floats([request.GET.get('zoom')], 1)
+    if bbox is None or zoom is None or bbox[0] > bbox[2]:
+        return JsonResponse({'error': 'bbox and zoom are required'}, status=400)
+    zoom = min(max(int(zoom[0]), 0), MAX_ZOOM)
+    category = request.GET.get('category')
+    category = int(category) if category and category.isdigit() else None
+
+    south, west, north, east = bbox
+    left, top = tile_xy(north, west, zoom)
+    right, bottom = tile_xy(south, east, zoom)
+    # a box across the antimeridian wraps round
+    width = right - left + 1 if left <= right else 2 ** zoom - left + right + 1
+    # counted before anything is built: a world-sized box at a high zoom
+    # would otherwise be billions of tiles
+    if width * (bottom - top + 1) > MAX_TILES:
+        return JsonResponse({'error': 'Too many tiles; zoom in'}, status=400)
+    columns = range(left, right + 1) if left <= right else \
+        list(range(left, 2 ** zoom)) + list(range(0, right + 1))
+    tiles = [(x, y) for x in columns for y in range(top, bottom + 1)]
+
+    results = place_tiles.tiles(zoom, tiles, category)
+    return JsonResponse({
+        'zoom': zoom,
+        'tiles': [{
+            'key': '{}/{}/{}'.format(zoom, x, y),
+            'clusters': results[(x, y)],
+        } for x, y in tiles],
+    })
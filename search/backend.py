@@ -0,0 +1,296 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models.fields import FieldDoesNotExist
+from django.utils.encoding import force_text
+from django.utils.html import strip_tags
+
+from wagtail.wagtailcore.fields import RichTextField
+from wagtail.wagtailsearch import index
+from wagtail.wagtailsearch.backends.base import (
+    BaseSearchBackend, BaseSearchQuery, BaseSearchResults)
+from wagtail.wagtailsearch.backends.db import DatabaseSearchBackend
+
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# fts5 columns, their bm25 weights, and the search fields that feed them;
+# any other search field goes into the body
+COLUMNS = ['title', 'names', 'source', 'body']
+WEIGHTS = [10.0, 5.0, 2.0, 1.0]
+FIELD_COLUMNS = {
+    'title': 'title',
+    'extra_names': 'names',
+    'source': 'source',
+}
+
+CHUNK_SIZE = 500  # ids per "which of these does the queryset allow?" query
+
+
+def content_type(model):
+    return model.indexed_get_content_type()
+
+
+def base_content_type(model):
+    # the root of the model's indexed inheritance chain, which all its
+    # subclasses share primary keys with
+    while model.indexed_get_parent():
+        model = model.indexed_get_parent()
+    return content_type(model)
+
+
+def pk_to_python(model, value):
+    field = model._meta.pk
+    while field.remote_field is not None:  # a parent_link's page_ptr
+        field = field.target_field
+    return field.to_python(value)
+
+
+def field_text(field, obj):
+    value = field.get_value(obj)
+    if value is None:
+        return ''
+    try:
+        if isinstance(field.get_field(type(obj)), RichTextField):
+            value = strip_tags(value)
+    except FieldDoesNotExist:
+        pass
+    if isinstance(value, (list, tuple)):
+        return ' '.join(force_text(item) for item in value)
+    return force_text(value)
+
+
+def document(obj):
+    """Column name -> text for an object, from its search_fields."""
+    text = {column: [] for column in COLUMNS}
+    for field in type(obj).get_search_fields():
+        column = FIELD_COLUMNS.get(field.field_name, 'body')
+        if isinstance(field, index.SearchField):
+            text[column].append(field_text(field, obj))
+        elif isinstance(field, index.RelatedFields):
+            related = field.get_value(obj)
+            if related is None:
+                continue
+            if hasattr(related, 'all'):
+                related = related.all()
+            else:
+                related = [related]
+            for item in related:
+                for subfield in field.fields:
+                    if isinstance(subfield, index.SearchField):
+                        text[column].append(field_text(subfield, item))
+    return [' '.join(filter(None, text[column])) for column in COLUMNS]
+
+
+class SQLiteFTSIndex(object):
+    """The one index every model shares, for update_index."""
+    name = 'search_index'
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def add_model(self, model):
+        pass
+
+    def add_items(self, model, items):
+        self.backend.add_bulk(model, items)
+
+
+class SQLiteFTSRebuilder(object):
+
+    def __init__(self, index):
+        self.index = index
+
+    def start(self):
+        self.index.backend.reset_index()
+        return self.index
+
+    def finish(self):
+        pass
+
+
+class SQLiteFTSSearchQuery(BaseSearchQuery):
+
+    def match_expression(self):
+        terms = TERM_RE.findall(self.query_string or '')
+        if not terms:
+            return None
+        expression = (' AND ' if self.operator == 'and' else ' OR ').join(
+            '"{}"'.format(term) for term in terms)
+        if self.fields:
+            columns = {FIELD_COLUMNS.get(field, 'body') for field in self.fields}
+            expression = '{%s} : (%s)' % (' '.join(sorted(columns)), expression)
+        return expression
+
+
+class SQLiteFTSSearchResults(BaseSearchResults):
+
+    def ranked_ids(self):
+        """[(object id, score)] for every match, best first."""
+        expression = self.query.match_expression()
+        if expression is None:
+            return []
+        model = self.query.queryset.model
+        ct = content_type(model)
+        rows = self.backend.execute(
+            'SELECT o.object_id, bm25(search_index, {}) AS rank'
+            ' FROM search_index JOIN search_objects o'
+            '  ON o.id = search_index.rowid'
+            ' WHERE search_index MATCH %s'
+            '  AND (o.content_type = %s OR substr(o.content_type, 1, %s) = %s)'
+            ' ORDER BY rank'.format(', '.join(map(str, WEIGHTS))),
+            [expression, ct, len(ct) + 1, ct + '_'])
+        # bm25() is lower for better matches
+        return [(pk_to_python(model, pk), -rank) for pk, rank in rows]
+
+    def allowed(self, ids):
+        """Keep the ids the queryset allows, in order, a chunk at a time."""
+        queryset = self.query.queryset
+        for i in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[i:i + CHUNK_SIZE]
+            found = set(queryset.filter(pk__in=chunk)
+                .values_list('pk', flat=True))
+            for pk in chunk:
+                if pk in found:
+                    yield pk
+
+    def _do_search(self):
+        ranked = self.ranked_ids()
+        if not ranked:
+            return []
+        scores = dict(ranked)
+
+        if self.query.order_by_relevance:
+            ids = []
+            for pk in self.allowed([pk for pk, score in ranked]):
+                ids.append(pk)
+                if self.stop is not None and len(ids) >= self.stop:
+                    break
+            ids = ids[self.start:self.stop]
+        else:
+            # the queryset's own order
+            ids = [pk for pk in self.query.queryset.values_list('pk', flat=True)
+                if pk in scores][self.start:self.stop]
+
+        queryset = self.query.queryset
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        objects = queryset.in_bulk(ids)
+        results = []
+        for pk in ids:
+            obj = objects.get(pk)
+            if obj is not None:
+                if self._score_field:
+                    setattr(obj, self._score_field, scores[pk])
+                results.append(obj)
+        return results
+
+    def _do_count(self):
+        ranked = self.ranked_ids()
+        count = sum(1 for pk in self.allowed([pk for pk, score in ranked]))
+        count -= self.start
+        if self.stop is not None:
+            count = min(count, self.stop - self.start)
+        return max(count, 0)
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """
+    Keeps an SQLite FTS5 inverted index (made by search's migration 0001)
+    in the site's own database and ranks matches with BM25, weighting
+    titles over aliases over sources over body text.  Wagtail's index
+    signal handlers keep it up to date as objects are saved and deleted;
+    ``update_index`` rebuilds it.
+
+    Searches rank the index first, then ask the queryset (in chunks of
+    ids) which matches it allows, so any queryset filter works.
+    """
+    query_class = SQLiteFTSSearchQuery
+    results_class = SQLiteFTSSearchResults
+    rebuilder_class = SQLiteFTSRebuilder
+
+    def __init__(self, params):
+        super(SQLiteFTSSearchBackend, self).__init__(params)
+        self.using = params.get('DATABASE', 'default')
+        if connections[self.using].vendor != 'sqlite':
+            raise ImproperlyConfigured(
+                "The full-text search backend needs an SQLite database")
+
+    def execute(self, sql, params=(), many=False):
+        with connections[self.using].cursor() as cursor:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+
+    def get_index_for_model(self, model):
+        return SQLiteFTSIndex(self)
+
+    def get_rebuilder(self):
+        return SQLiteFTSRebuilder(SQLiteFTSIndex(self))
+
+    def reset_index(self):
+        self.execute('DELETE FROM search_index')
+        self.execute('DELETE FROM search_objects')
+
+    def add_type(self, model):
+        pass  # one schema fits all
+
+    def refresh_index(self):
+        pass  # writes are visible straight away
+
+    def add(self, obj):
+        self.add_bulk(type(obj), [obj])
+
+    def add_bulk(self, model, obj_list):
+        # update_index also offers every page as a plain Page; only the
+        # specific instance should be indexed
+        obj_list = [obj for obj in obj_list
+            if getattr(obj, 'specific_class', type(obj)) in (type(obj), None)]
+        if not obj_list:
+            return
+        self.delete_bulk(obj_list)
+        self.execute(
+            'INSERT INTO search_objects (base, object_id, content_type)'
+            ' VALUES (%s, %s, %s)',
+            [(base_content_type(type(obj)), str(obj.pk), content_type(type(obj)))
+                for obj in obj_list], many=True)
+        ids = self.object_rowids(obj_list)
+        self.execute(
+            'INSERT INTO search_index (rowid, {}) VALUES (%s, {})'.format(
+                ', '.join(COLUMNS), ', '.join(['%s'] * len(COLUMNS))),
+            [[ids[str(obj.pk)]] + document(obj) for obj in obj_list], many=True)
+
+    def delete(self, obj):
+        self.delete_bulk([obj])
+
+    def delete_bulk(self, obj_list):
+        ids = list(self.object_rowids(obj_list).values())
+        if ids:
+            self.execute('DELETE FROM search_index WHERE rowid = %s',
+                [(rowid,) for rowid in ids], many=True)
+            self.execute('DELETE FROM search_objects WHERE id = %s',
+                [(rowid,) for rowid in ids], many=True)
+
+    def object_rowids(self, obj_list):
+        base = base_content_type(type(obj_list[0]))
+        object_ids = [str(obj.pk) for obj in obj_list]
+        rowids = {}
+        for i in range(0, len(object_ids), CHUNK_SIZE):
+            chunk = object_ids[i:i + CHUNK_SIZE]
+            rowids.update(self.execute(
+                'SELECT object_id, id FROM search_objects'
+                ' WHERE base = %s AND object_id IN ({})'.format(
+                    ', '.join(['%s'] * len(chunk))),
+                [base] + chunk))
+        return rowids
+
+
+def SearchBackend(params):
+    """What Wagtail instantiates for 'search.backend': the FTS5 index on
+    SQLite, Wagtail's own database backend anywhere else."""
+    if connections[params.get('DATABASE', 'default')].vendor != 'sqlite':
+        return DatabaseSearchBackend(params)
+    return SQLiteFTSSearchBackend(params)
@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Count
+
+from events.models import Event
+from names.models import Organization, Person
+from places.models import Place
+
+
+# facet name -> specific page model; each has a ``categories`` M2M
+FACET_MODELS = OrderedDict([
+    ('people', Person),
+    ('organizations', Organization),
+    ('events', Event),
+    ('places', Place),
+])
+
+
+def category_counts(model, ids):
+    """Category name -> number of ``ids`` in it, in one query."""
+    field = model._meta.get_field('categories')
+    through = field.remote_field.through
+    source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+    return OrderedDict(through.objects
+        .filter(**{source + '_id__in': ids})
+        .values_list(target + '__name')
+        .annotate(count=Count('pk'))
+        .order_by('-count', target + '__name'))
+
+
+def serialize(page):
+    data = {'id': page.pk, 'title': page.title, 'url': page.url}
+    if isinstance(page, Event):
+        data['start_date'] = page.start_date.isoformat()
+    if isinstance(page, Place):
+        data['latitude'] = float(page.latitude)
+        data['longitude'] = float(page.longitude)
+    return data
+
+
+def faceted_search(query_string, limit=5):
+    """
+    Search each record type with its own search_fields, returning per
+    type the total count, the top ``limit`` (already specific) results
+    and category facets.  Facets are taken over the best
+    SEARCH_FACET_DEPTH matches of each type, not the whole result set.
+    """
+    depth = max(getattr(settings, 'SEARCH_FACET_DEPTH', 200), limit)
+    facets = OrderedDict()
+    for name, model in FACET_MODELS.items():
+        results = model.objects.live().search(query_string)
+        top = list(results[:depth])
+        facets[name] = {
+            'count': len(top) if len(top) < depth else results.count(),
+            'categories': category_counts(model, [page.pk for page in top]),
+            'results': [serialize(page) for page in top[:limit]],
+        }
+    return facets
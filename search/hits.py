@@ -0,0 +1,136 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from wagtail.wagtailsearch.models import Query, QueryDailyHits
+from wagtail.wagtailsearch.utils import normalise_query_string
+
+
+logger = logging.getLogger(__name__)
+
+
+class HitBuffer(object):
+    """
+    Counts search hits in memory and writes them to wagtailsearch's
+    Query/QueryDailyHits tables in batches from a background thread, so
+    a search never waits on (or queues for) a database write.
+
+    SEARCH_HITS_FLUSH_INTERVAL is how often, in seconds, the worker
+    writes, and SEARCH_HITS_BATCH_SIZE how many (query, day) rows go per
+    transaction; the worker also wakes early once that many are waiting.
+    With an interval of 0 there's no worker: the search that takes the
+    buffer past a batch writes it, and stop() writes what's left.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.wakeup = threading.Event()
+        self.worker = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'SEARCH_HITS_FLUSH_INTERVAL', 10)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'SEARCH_HITS_BATCH_SIZE', 500)
+
+    def record(self, query_string):
+        query_string = normalise_query_string(query_string)
+        if not query_string:
+            return
+        with self.lock:
+            self.pending[(query_string, timezone.now().date())] += 1
+            backlog = len(self.pending)
+        if self.flush_interval:
+            self.start()
+            if backlog >= self.batch_size:
+                self.wakeup.set()
+        elif backlog > self.batch_size:
+            self.flush()
+
+    def start(self):
+        if self.worker is None or not self.worker.is_alive():
+            with self.lock:
+                if self.worker is None or not self.worker.is_alive():
+                    self.worker = threading.Thread(
+                        target=self.run, name='search-hits', daemon=True)
+                    self.worker.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+    def stop(self):
+        # write out whatever hadn't been got to yet
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+        items = list(pending.items())
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception('Could not record %d search hits', len(batch))
+                # keep them for next time
+                with self.lock:
+                    self.pending.update(dict(batch))
+
+    def write(self, batch):
+        with transaction.atomic():
+            strings = {query_string for (query_string, date), hits in batch}
+            queries = dict(Query.objects.filter(query_string__in=strings)
+                .values_list('query_string', 'pk'))
+            for query_string in strings - set(queries):
+                queries[query_string] = Query.objects.get_or_create(
+                    query_string=query_string)[0].pk
+
+            hits = {(queries[query_string], date): count
+                for (query_string, date), count in batch}
+            existing = dict(((query, date), pk) for query, date, pk in
+                QueryDailyHits.objects.filter(
+                    query_id__in={query for query, date in hits},
+                    date__in={date for query, date in hits},
+                ).values_list('query_id', 'date', 'pk'))
+
+            # one UPDATE per distinct increment, mostly just "+ 1"
+            increments = {}
+            for key, count in hits.items():
+                if key in existing:
+                    increments.setdefault(count, []).append(existing[key])
+            for count, pks in increments.items():
+                QueryDailyHits.objects.filter(pk__in=pks) \
+                    .update(hits=F('hits') + count)
+
+            new = [QueryDailyHits(query_id=query, date=date, hits=count)
+                for (query, date), count in hits.items()
+                if (query, date) not in existing]
+            try:
+                with transaction.atomic():
+                    QueryDailyHits.objects.bulk_create(new)
+            except IntegrityError:
+                # another process got there first
+                for row in new:
+                    daily_hits = QueryDailyHits.objects.get_or_create(
+                        query_id=row.query_id, date=row.date)[0]
+                    QueryDailyHits.objects.filter(pk=daily_hits.pk) \
+                        .update(hits=F('hits') + row.hits)
+
+
+search_hits = HitBuffer()
+atexit.register(search_hits.stop)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def create_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE TABLE search_objects ('
+        ' id INTEGER PRIMARY KEY,'
+        ' base TEXT NOT NULL,'
+        ' object_id TEXT NOT NULL,'
+        ' content_type TEXT NOT NULL,'
+        ' UNIQUE (base, object_id))')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE search_index USING fts5('
+        " title, names, source, body,"
+        " tokenize = 'porter unicode61 remove_diacritics 2')")
+
+
+def drop_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE search_index')
+    schema_editor.execute('DROP TABLE search_objects')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.RunPython(create_tables, drop_tables),
+    ]
@@ -0,0 +1,89 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def normalise(query_string):
+    # case and spacing don't change the results; punctuation might
+    return ' '.join(query_string.lower().split())
+
+
+class ResultsPage(object):
+    """
+    The Paginator Page interface the search template uses, without a
+    total count: we only know whether there's a next page.
+    """
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class SearchPager(object):
+    """
+    Pages through search results by fetching one row more than a page
+    needs, never calling count().  The ranked ids seen so far are cached
+    per normalised query for SEARCH_RESULTS_CACHE_TIMEOUT seconds, so
+    paging back and forth doesn't re-run the search; rows for cached ids
+    come from ``queryset`` by primary key.
+    """
+
+    def __init__(self, results, query_string, per_page, queryset):
+        self.results = results
+        self.query_string = query_string
+        self.per_page = per_page
+        self.queryset = queryset
+
+    @property
+    def cache_key(self):
+        return 'search:results:' + hashlib.md5(
+            normalise(self.query_string).encode('utf-8')).hexdigest()
+
+    def page(self, number):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        start = (number - 1) * self.per_page
+        stop = start + self.per_page
+
+        ranked = cache.get(self.cache_key) or {'ids': [], 'complete': False}
+        ids = ranked['ids']
+        fetched = {}
+        if len(ids) <= stop and not ranked['complete']:
+            # search for just the rows we haven't seen, plus one
+            wanted = stop + 1 - len(ids)
+            rows = list(self.results[len(ids):stop + 1])
+            fetched = {row.pk: row for row in rows}
+            ids = ids + [row.pk for row in rows]
+            ranked = {'ids': ids, 'complete': len(rows) < wanted}
+            cache.set(self.cache_key, ranked,
+                getattr(settings, 'SEARCH_RESULTS_CACHE_TIMEOUT', 300))
+
+        page_ids = ids[start:stop]
+        missing = [pk for pk in page_ids if pk not in fetched]
+        if missing:
+            fetched.update(self.queryset.in_bulk(missing))
+        return ResultsPage(
+            [fetched[pk] for pk in page_ids if pk in fetched],
+            number, len(ids) > stop)
@@ -0,0 +1,85 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from wagtail.wagtailcore.signals import page_published, page_unpublished
+from wagtail.wagtailsearch import index
+
+from visualist.models import ExtraName, Record, Source
+
+from .suggest import suggestion_models, suggestions
+
+
+SUGGEST_FIELDS = {'title', 'live'}
+
+
+def sync(kind, page):
+    if page.live:
+        suggestions.add(kind, page)
+    else:
+        suggestions.remove(kind, page.pk)
+
+
+def connect(kind, model):
+    def sync_suggestions(sender, instance, update_fields=None, **kwargs):
+        # revision saves only touch bookkeeping fields and carry draft values
+        if update_fields is not None and not SUGGEST_FIELDS & set(update_fields):
+            return
+        sync(kind, instance)
+
+    def sync_suggestions_on_publish(sender, instance, **kwargs):
+        sync(kind, instance)
+
+    def remove_suggestions(sender, instance, **kwargs):
+        suggestions.remove(kind, instance.pk)
+
+    def sync_aliases(sender, instance, action, reverse, **kwargs):
+        if not action.startswith('post_'):
+            return
+        if reverse:
+            suggestions.invalidate()
+            reindex_records(extra_names__in=kwargs['pk_set'] or ())
+        else:
+            sync(kind, instance)
+            index.insert_or_update_object(instance)
+
+    post_save.connect(sync_suggestions, sender=model, weak=False)
+    # bulk unpublishing saves plain Page instances, so listen here as well
+    page_published.connect(sync_suggestions_on_publish, sender=model, weak=False)
+    page_unpublished.connect(sync_suggestions_on_publish, sender=model, weak=False)
+    post_delete.connect(remove_suggestions, sender=model, weak=False)
+    m2m_changed.connect(sync_aliases,
+        sender=model.extra_names.through, weak=False)
+
+
+for kind, model in suggestion_models().items():
+    connect(kind, model)
+
+
+@receiver(post_save, sender=ExtraName)
+@receiver(post_delete, sender=ExtraName)
+def invalidate_suggestions(sender, **kwargs):
+    suggestions.invalidate()
+
+
+def reindex_records(**lookup):
+    # records index their aliases' and source's text, which their own
+    # saves don't see change
+    seen = set()
+    for model in index.get_indexed_models():
+        if issubclass(model, Record):
+            for record in model.objects.filter(**lookup):
+                if record.pk not in seen:
+                    seen.add(record.pk)
+                    index.insert_or_update_object(record)
+
+
+@receiver(post_save, sender=ExtraName)
+def reindex_alias(sender, instance, created=False, **kwargs):
+    if not created:
+        reindex_records(extra_names=instance)
+
+
+@receiver(post_save, sender=Source)
+def reindex_source(sender, instance, created=False, **kwargs):
+    if not created:
+        reindex_records(source=instance)
@@ -0,0 +1,269 @@
+import bisect
+import logging
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max
+
+from visualist.indexes import SharedIndex
+
+
+logger = logging.getLogger(__name__)
+
+WORD_START_RE = re.compile(r'(?<!\w)\w')
+
+
+def normalise(text):
+    return ' '.join(text.lower().split())
+
+
+def suffixes(text):
+    """Every tail of ``text`` that starts a word, so 'gates' finds
+    'Theaster Gates'."""
+    text = normalise(text)
+    return [text[match.start():] for match in WORD_START_RE.finditer(text)]
+
+
+def suggestion_models():
+    from events.models import Event
+    from names.models import Organization, Person
+    from places.models import Place
+
+    return OrderedDict([
+        ('person', Person),
+        ('organization', Organization),
+        ('place', Place),
+        ('event', Event),
+    ])
+
+
+class SuggestIndex(SharedIndex):
+    """
+    A sorted prefix table over live Person, Organization, Place and Event
+    titles and their ExtraName aliases.  ``keys`` is a sorted list of
+    normalised word-initial tails of each name, ``entries`` the
+    (type, id, title, alias) each key belongs to, so a prefix lookup is a
+    bisect and a short scan.
+
+    The table is pickled to SEARCH_SUGGEST_INDEX once changes stop
+    coming for SEARCH_SUGGEST_WRITE_DELAY seconds, so a fresh process
+    reads it back instead of rebuilding from the database.  The version
+    stamp in the cache says whether that file is current; with no stamp
+    to go on, the file is only used if the counts and high-water marks
+    it was written with still match the database's.
+    """
+    version_cache_key = 'search:suggest-version'
+    scan_factor = 10  # keys looked at per suggestion wanted
+
+    def __init__(self):
+        super().__init__()
+        self.timer = None
+        self.clear()
+
+    def clear(self):
+        self.keys = []
+        self.entries = []
+        self.owned = {}
+
+    @property
+    def path(self):
+        return getattr(settings, 'SEARCH_SUGGEST_INDEX', None)
+
+    @property
+    def write_delay(self):
+        return getattr(settings, 'SEARCH_SUGGEST_WRITE_DELAY', 5)
+
+    def current(self):
+        version = cache.get(self.version_cache_key)
+        stored = None
+        if version is None:
+            # the cache was emptied; the file on disk will do if nothing
+            # has changed since it was written
+            stored = self.read()
+            if stored and stored.get('fingerprint') != self.fingerprint():
+                stored = None
+            cache.add(self.version_cache_key,
+                stored['version'] if stored else uuid.uuid4().hex, None)
+            version = cache.get(self.version_cache_key)
+        with self.lock:
+            stale = self.stale()
+            if version != self.version or stale:
+                stored = stored or self.read()
+                # past INDEX_MAX_AGE the file is no better than this copy
+                if stored and stored['version'] == version and not stale:
+                    self.keys = stored['keys']
+                    self.entries = stored['entries']
+                    self.owned = stored['owned']
+                    self.version = version
+                else:
+                    self.load()
+                    self.version = version
+                    self.write()
+                self.loaded_at = time.monotonic()
+        return self
+
+    def load(self):
+        with self.lock:
+            self.clear()
+            rows = []
+            for kind, model in suggestion_models().items():
+                titles = dict(model.objects.live().values_list('pk', 'title'))
+                rows.extend((kind, pk, title, '') for pk, title in titles.items())
+
+                field = model._meta.get_field('extra_names')
+                source = field.m2m_field_name() + '_id'
+                for pk, alias in field.remote_field.through.objects \
+                        .filter(**{source + '__in': list(titles)}) \
+                        .values_list(source, 'extraname__name').iterator():
+                    rows.append((kind, pk, titles[pk], alias))
+
+            pairs = []
+            for entry in rows:
+                owned = self.owned.setdefault(entry[:2], [])
+                for key in suffixes(entry[3] or entry[2]):
+                    pairs.append((key, entry))
+                    owned.append(key)
+            pairs.sort()
+            self.keys = [key for key, entry in pairs]
+            self.entries = [entry for key, entry in pairs]
+
+    def fingerprint(self):
+        from visualist.models import ExtraName
+
+        marks = []
+        for model in list(suggestion_models().values()) + [ExtraName]:
+            queryset = model.objects.all()
+            if hasattr(queryset, 'live'):
+                queryset = queryset.live()
+            fields = {'count': Count('pk'), 'last': Max('pk')}
+            if hasattr(model, 'last_published_at'):
+                fields['published'] = Max('last_published_at')
+            aggregates = queryset.aggregate(**fields)
+            marks.append(tuple(sorted(aggregates.items())))
+        return tuple(marks)
+
+    def read(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            logger.exception('Could not read suggestion index %s', self.path)
+            return None
+
+    def write(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with self.lock:
+                fingerprint = self.fingerprint()
+                # write alongside and swap, so readers never see half a file
+                with tempfile.NamedTemporaryFile(
+                        dir=directory, delete=False, suffix='.tmp') as f:
+                    pickle.dump({
+                        'version': self.version,
+                        'fingerprint': fingerprint,
+                        'keys': self.keys,
+                        'entries': self.entries,
+                        'owned': self.owned,
+                    }, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(f.name, self.path)
+        except Exception:
+            logger.exception('Could not write suggestion index %s', self.path)
+
+    def write_later(self):
+        # a burst of saves ends in one write, not one each
+        if not self.write_delay:
+            self.write()
+            return
+        with self.lock:
+            if self.timer is None:
+                self.timer = threading.Timer(self.write_delay, self.write_pending)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def write_pending(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self.write()
+        finally:
+            connection.close()
+
+    def changed(self):
+        # and leave other processes the new table on disk
+        super().changed()
+        if self.version is not None:
+            self.write_later()
+
+    def add(self, kind, page):
+        with self.lock:
+            if self.version is not None:
+                self._remove(kind, page.pk)
+                entries = [(kind, page.pk, page.title, '')] + [
+                    (kind, page.pk, page.title, alias)
+                    for alias in page.extra_names.values_list('name', flat=True)]
+                owned = self.owned[(kind, page.pk)] = []
+                for entry in entries:
+                    for key in suffixes(entry[3] or entry[2]):
+                        i = bisect.bisect_left(self.keys, key)
+                        self.keys.insert(i, key)
+                        self.entries.insert(i, entry)
+                        owned.append(key)
+            self.changed()
+
+    def remove(self, kind, pk):
+        with self.lock:
+            if self.version is not None:
+                self._remove(kind, pk)
+            self.changed()
+
+    def _remove(self, kind, pk):
+        for key in self.owned.pop((kind, pk), ()):
+            i = bisect.bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key:
+                if self.entries[i][:2] == (kind, pk):
+                    del self.keys[i]
+                    del self.entries[i]
+                    break
+                i += 1
+
+    def suggest(self, prefix, limit=10):
+        """
+        Up to ``limit`` [{'type', 'id', 'title', 'alias'}] whose title or
+        an alias has a word starting with ``prefix``; names that start
+        with it come first.
+        """
+        prefix = normalise(prefix)
+        if not prefix:
+            return []
+        seen, leading, inner = set(), [], []
+        with self.lock:
+            i = bisect.bisect_left(self.keys, prefix)
+            stop = min(i + limit * self.scan_factor, len(self.keys))
+            while i < stop and self.keys[i].startswith(prefix):
+                kind, pk, title, alias = entry = self.entries[i]
+                i += 1
+                if (kind, pk) in seen:
+                    continue
+                seen.add((kind, pk))
+                name = normalise(alias or title)
+                (leading if name.startswith(prefix) else inner).append(entry)
+        return [{'type': kind, 'id': pk, 'title': title, 'alias': alias}
+            for kind, pk, title, alias in (leading + inner)[:limit]]
+
+
+suggestions = SuggestIndex()
@@ -0,0 +1,321 @@
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from wagtail.wagtailcore.models import Page, Site
+from wagtail.wagtailsearch.backends.db import DatabaseSearchBackend
+from wagtail.wagtailsearch.models import Query, QueryDailyHits
+
+from names.models import Organization, Person, PersonCategory
+from places.models import Place
+from visualist.models import ExtraName, Source
+
+from .backend import SQLiteFTSSearchBackend, SearchBackend
+from .facets import faceted_search
+from .hits import HitBuffer, search_hits
+from .pagination import SearchPager
+from .suggest import suggestions
+
+
+@override_settings(SEARCH_HITS_FLUSH_INTERVAL=0, SEARCH_HITS_BATCH_SIZE=2)
+class HitBufferTest(TestCase):
+
+    def test_hits_are_buffered_until_flushed(self):
+        hits = HitBuffer()
+        for query_string in ['Theaster Gates', 'theaster gates!', 'Hull-House']:
+            hits.record(query_string)
+        self.assertFalse(Query.objects.exists())
+
+        hits.flush()
+        self.assertEqual(Query.get('theaster gates').hits, 2)
+        self.assertEqual(Query.get('hullhouse').hits, 1)
+
+        hits.record('Theaster Gates')
+        hits.flush()
+        self.assertEqual(Query.get('theaster gates').hits, 3)
+        self.assertEqual(QueryDailyHits.objects.count(), 2)
+
+    def test_hits_are_counted_per_day(self):
+        hits = HitBuffer()
+        Query.get('sculpture').add_hit(
+            timezone.now().date() - datetime.timedelta(days=1))
+        hits.record('sculpture')
+        hits.flush()
+        self.assertEqual(Query.get('sculpture').hits, 2)
+        self.assertEqual(QueryDailyHits.objects.count(), 2)
+
+    def test_without_a_worker_full_batches_are_written(self):
+        hits = HitBuffer()
+        for query_string in ['sculpture', 'painting']:
+            hits.record(query_string)
+        self.assertFalse(Query.objects.exists())
+        # past a batch's worth, the search that got it there writes them
+        hits.record('drawing')
+        self.assertEqual(Query.objects.count(), 3)
+        self.assertFalse(hits.pending)
+
+        hits.record('sculpture')
+        hits.stop()
+        self.assertEqual(Query.get('sculpture').hits, 2)
+        self.assertFalse(hits.pending)
+
+    def test_search_view_does_not_write(self):
+        self.addCleanup(search_hits.pending.clear)
+        self.client.get('/search/', {'query': 'sculpture'})
+        self.assertFalse(Query.objects.exists())
+        self.assertEqual(sum(search_hits.pending.values()), 1)
+
+
+@override_settings(SEARCH_HITS_FLUSH_INTERVAL=0)
+class SearchPagerTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        root = Site.objects.get(is_default_site=True).root_page
+        self.pages = [
+            root.add_child(instance=Page(
+                title='Sculpture {:02d}'.format(i), slug='sculpture-{}'.format(i)))
+            for i in range(25)]
+        self.pager = SearchPager(Page.objects.live().search('sculpture'),
+            'Sculpture ', 10, Page.objects.live())
+
+    def titles(self, page):
+        return [result.title for result in page]
+
+    def test_pages_without_counting(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.pager.page(1)
+        self.assertFalse(any('COUNT' in q['sql'] for q in queries))
+        self.assertEqual(len(first), 10)
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+
+        third = self.pager.page(3)
+        self.assertEqual(len(third), 5)
+        self.assertFalse(third.has_next())
+        self.assertTrue(third.has_previous())
+        self.assertEqual(len(self.pager.page(4)), 0)
+
+    def test_cached_ids_skip_the_search(self):
+        first = self.titles(self.pager.page(1))
+        second = self.titles(self.pager.page(2))
+
+        pager = SearchPager(Page.objects.none(), 'sculpture', 10,
+            Page.objects.live())
+        self.assertEqual(self.titles(pager.page(1)), first)
+        self.assertEqual(self.titles(pager.page(2)), second)
+        self.assertEqual(len(set(first + second)), 20)
+
+    def test_search_view(self):
+        self.addCleanup(search_hits.pending.clear)
+        response = self.client.get('/search/', {'query': 'sculpture', 'page': 2})
+        self.assertEqual(len(response.context['search_results']), 10)
+        self.assertContains(response, 'page=3')
+        self.assertContains(response, 'page=1')
+
+        response = self.client.get('/search/', {'query': 'sculpture', 'page': 'x'})
+        self.assertEqual(response.context['search_results'].number, 1)
+
+
+@override_settings(SEARCH_HITS_FLUSH_INTERVAL=0)
+class FacetedSearchTest(TestCase):
+
+    def setUp(self):
+        root = Site.objects.get(is_default_site=True).root_page
+        painter = PersonCategory.objects.create(name='Painter')
+        sculptor = PersonCategory.objects.create(name='Sculptor')
+        for title, categories in [('Richard Hunt', [sculptor]),
+                ('Gertrude Abercrombie', [painter]),
+                ('Richard Florsheim', [painter, sculptor])]:
+            person = root.add_child(instance=Person(title=title))
+            person.categories.set(categories)
+            person.save()
+        root.add_child(instance=Organization(title='Richard Gray Gallery'))
+        root.add_child(instance=Place(title='Richard J. Daley Center',
+            hours='Always', latitude=Decimal('41.884'),
+            longitude=Decimal('-87.630')))
+
+    def test_counts_and_categories(self):
+        facets = faceted_search('richard')
+        self.assertEqual(
+            {name: facet['count'] for name, facet in facets.items()},
+            {'people': 2, 'organizations': 1, 'events': 0, 'places': 1})
+        self.assertEqual(facets['people']['categories'],
+            {'Sculptor': 2, 'Painter': 1})
+        self.assertIn('latitude', facets['places']['results'][0])
+
+    def test_count_past_facet_depth(self):
+        with self.settings(SEARCH_FACET_DEPTH=1):
+            facets = faceted_search('richard', limit=1)
+        self.assertEqual(facets['people']['count'], 2)
+        self.assertEqual(len(facets['people']['results']), 1)
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse('search_facets'), {'query': 'gray'})
+        self.assertEqual(response.json()['facets']['organizations']['count'], 1)
+        self.assertEqual(search_hits.pending[('gray', timezone.now().date())], 1)
+        search_hits.pending.clear()
+
+        response = self.client.get(reverse('search_facets'))
+        self.assertEqual(response.status_code, 400)
+
+
+class SuggestIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # forget what earlier tests' (rolled back) pages put in the table
+        suggestions.version = None
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = self.settings(
+            SEARCH_SUGGEST_INDEX=os.path.join(directory, 'suggest.pickle'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.root = Site.objects.get(is_default_site=True).root_page
+        self.gates = self.root.add_child(instance=Person(title='Theaster Gates'))
+        self.gallery = self.root.add_child(
+            instance=Organization(title='Gallery 400'))
+        self.gates.extra_names.add(ExtraName.objects.create(name='Rebuild Man'))
+
+    def titles(self, prefix, **kwargs):
+        return [s['title'] for s in suggestions.current().suggest(prefix, **kwargs)]
+
+    def test_prefixes(self):
+        self.assertEqual(self.titles('thea'), ['Theaster Gates'])
+        self.assertEqual(self.titles('GA'), ['Gallery 400', 'Theaster Gates'])
+        self.assertEqual(self.titles('ga', limit=1), ['Gallery 400'])
+        self.assertEqual(self.titles('rebuild'), ['Theaster Gates'])
+        self.assertEqual(self.titles('x'), [])
+
+    def test_publishing_updates_index(self):
+        suggestions.current()
+        self.gates.unpublish()
+        self.assertEqual(self.titles('ga'), ['Gallery 400'])
+
+        self.gates.title = 'Theaster Gates Jr.'
+        self.gates.save_revision().publish()
+        self.assertEqual(self.titles('jr'), ['Theaster Gates Jr.'])
+        self.assertEqual(self.titles('rebuild'), ['Theaster Gates Jr.'])
+
+        self.gallery.delete()
+        self.assertEqual(self.titles('ga'), ['Theaster Gates Jr.'])
+
+    def test_read_back_from_disk(self):
+        suggestions.current()
+        self.root.add_child(instance=Person(title='Gertrude Abercrombie'))
+        # a fresh process with an empty cache reads the file, checking it
+        # against a query per model rather than rebuilding
+        cache.clear()
+        suggestions.version = None
+        with self.assertNumQueries(5):
+            self.assertEqual(self.titles('ger'), ['Gertrude Abercrombie'])
+
+    def test_stale_file_rebuilt(self):
+        suggestions.current()
+        # changes the file never heard of, like another database's
+        Person.objects.filter(pk=self.gates.pk).update(live=False)
+        cache.clear()
+        suggestions.version = None
+        self.assertEqual(self.titles('ga'), ['Gallery 400'])
+
+    def test_writes_debounced(self):
+        suggestions.current()
+        with self.settings(SEARCH_SUGGEST_WRITE_DELAY=60):
+            for title in ('Gertrude Abercrombie', 'Charles Sebree'):
+                self.root.add_child(instance=Person(title=title))
+            timer = suggestions.timer
+            self.assertIsNotNone(timer)
+            self.assertNotIn('charles sebree', suggestions.read()['keys'])
+            timer.cancel()
+            suggestions.timer = None
+            suggestions.write()
+        self.assertIn('charles sebree', suggestions.read()['keys'])
+
+        cache.delete(suggestions.version_cache_key)
+        suggestions.version = None
+        self.assertEqual(self.titles('char'), ['Charles Sebree'])
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse('search_suggest'), {'q': 'gal'})
+        self.assertEqual(response.json()['suggestions'], [{
+            'type': 'organization', 'id': self.gallery.pk,
+            'title': 'Gallery 400', 'alias': ''}])
+
+
+class FullTextBackendTest(TestCase):
+
+    def setUp(self):
+        root = Site.objects.get(is_default_site=True).root_page
+        self.hunt = root.add_child(instance=Person(title='Richard Hunt',
+            body='<p>A sculptor of welded steel.</p>'))
+        self.gallery = root.add_child(instance=Organization(title='Gallery 400',
+            body='<p>Showed <b>welded</b> sculpture by Richard Hunt and others.</p>'))
+        self.catalogue = Source.objects.create(
+            title='Forty Years of Chicago Sculpture', authors='Ada Gallagher')
+
+    def search(self, query_string, model=Page, **kwargs):
+        return [page.pk for page in
+            model.objects.live().search(query_string, **kwargs)]
+
+    def test_titles_rank_above_body(self):
+        self.assertEqual(self.search('richard hunt'),
+            [self.hunt.pk, self.gallery.pk])
+        # stemmed
+        self.assertCountEqual(self.search('welding'), [self.gallery.pk, self.hunt.pk])
+        self.assertEqual(self.search('gallery', model=Person), [])
+        self.assertEqual(self.search('hunt', fields=['title']), [self.hunt.pk])
+
+    def test_other_databases_fall_back(self):
+        self.assertIsInstance(SearchBackend({}), SQLiteFTSSearchBackend)
+        with mock.patch.object(connections['default'], 'vendor', 'postgresql'):
+            self.assertIsInstance(SearchBackend({}), DatabaseSearchBackend)
+
+    def test_results_are_specific_and_countable(self):
+        results = Page.objects.live().search('hunt')
+        self.assertEqual(results.count(), 2)
+        self.assertEqual(results[1:].count(), 1)
+        self.assertIsInstance(results[0].specific, Person)
+        scored = Page.objects.live().search('hunt').annotate_score('score')
+        self.assertGreater(scored[0].score, scored[1].score)
+
+    def test_aliases_and_sources_are_indexed(self):
+        self.hunt.extra_names.add(ExtraName.objects.create(name='Dick Hunt'))
+        self.assertEqual(self.search('dick'), [self.hunt.pk])
+
+        self.hunt.source = self.catalogue
+        self.hunt.save()
+        self.assertEqual(self.search('gallagher'), [self.hunt.pk])
+
+        # editing the source reindexes the records citing it
+        self.catalogue.authors = 'Ada Montgomery'
+        self.catalogue.save()
+        self.assertEqual(self.search('gallagher'), [])
+        self.assertEqual(self.search('montgomery'), [self.hunt.pk])
+
+    def test_index_follows_unpublish_and_delete(self):
+        self.hunt.unpublish()
+        self.assertEqual(self.search('hunt'), [self.gallery.pk])
+        self.gallery.delete()
+        self.assertEqual([page.pk for page in Page.objects.search('gallery')], [])
+
+    def test_update_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM search_index')
+        self.assertEqual(self.search('hunt'), [])
+        call_command('update_index', stdout=StringIO())
+        self.assertEqual(self.search('hunt'), [self.hunt.pk, self.gallery.pk])
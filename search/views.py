@@ -1,36 +1,59 @@
 from __future__ import absolute_import, unicode_literals
 
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.http import JsonResponse
 from django.shortcuts import render
 
 from wagtail.wagtailcore.models import Page
-from wagtail.wagtailsearch.models import Query
+
+from .facets import faceted_search
+from .hits import search_hits
+from .pagination import ResultsPage, SearchPager
+from .suggest import suggestions
 
 
 def search(request):
     search_query = request.GET.get('query', None)
     page = request.GET.get('page', 1)
 
-    # Search
+    # Search, a page at a time and without counting the results
     if search_query:
-        search_results = Page.objects.live().search(search_query)
-        query = Query.get(search_query)
+        pages = Page.objects.live()
+        search_results = SearchPager(
+            pages.search(search_query), search_query, 10, pages).page(page)
 
-        # Record hit
-        query.add_hit()
+        # Record hit; written in batches off the request path
+        search_hits.record(search_query)
     else:
-        search_results = Page.objects.none()
-
-    # Pagination
-    paginator = Paginator(search_results, 10)
-    try:
-        search_results = paginator.page(page)
-    except PageNotAnInteger:
-        search_results = paginator.page(1)
-    except EmptyPage:
-        search_results = paginator.page(paginator.num_pages)
+        search_results = ResultsPage([], 1, False)
 
     return render(request, 'search/search.html', {
         'search_query': search_query,
         'search_results': search_results,
     })
+
+
+def facets(request):
+    search_query = request.GET.get('query', '')
+    if not search_query.strip():
+        return JsonResponse({'error': 'query is required'}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 5)), 1), 50)
+    except ValueError:
+        limit = 5
+
+    search_hits.record(search_query)
+    return JsonResponse({
+        'query': search_query,
+        'facets': faceted_search(search_query, limit),
+    })
+
+
+def suggest(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return JsonResponse({
+        'suggestions': suggestions.current().suggest(
+            request.GET.get('q', ''), limit),
+    })
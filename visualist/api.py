@@ -5,6 +5,34 @@ from wagtail.api.v2.router import WagtailAPIRouter
 from wagtail.wagtailimages.api.v2.endpoints import ImagesAPIEndpoint
 from wagtail.wagtaildocs.api.v2.endpoints import DocumentsAPIEndpoint
 
+
+class PagesEndpoint(PagesAPIEndpoint):
+    """
+    The stock pages endpoint, but page types that can load their relations
+    in bulk (a ``prefetch_relations`` classmethod) get to before they're
+    serialized, so a listing or detail costs the same few queries however
+    many related records there are.
+    """
+
+    def get_object(self):
+        # asked for more than once per request (to pick the serializer too)
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+            prefetch(type(self._object), [self._object])
+        return self._object
+
+    def paginate_queryset(self, queryset):
+        page = list(super().paginate_queryset(queryset))
+        if page:
+            prefetch(type(page[0]), page)
+        return page
+
+
+def prefetch(model, instances):
+    if hasattr(model, 'prefetch_relations'):
+        model.prefetch_relations(instances)
+
+
 # Create the router. "wagtailapi" is the URL namespace
 api_router = WagtailAPIRouter('wagtailapi')
 
@@ -12,6 +40,6 @@ api_router = WagtailAPIRouter('wagtailapi')
 # The first parameter is the name of the endpoint (eg. pages, images). This
 # is used in the URL of the endpoint
 # The second parameter is the endpoint class that handles the requests
-api_router.register_endpoint('pages', PagesAPIEndpoint)
+api_router.register_endpoint('pages', PagesEndpoint)
 api_router.register_endpoint('images', ImagesAPIEndpoint)
 api_router.register_endpoint('documents', DocumentsAPIEndpoint)
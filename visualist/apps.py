@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class VisualistConfig(AppConfig):
+    name = 'visualist'
+
+    def ready(self):
+        from . import signals  # noqa
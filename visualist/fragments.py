@@ -0,0 +1,94 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Model
+
+from wagtail.wagtailcore.models import Page
+
+
+def label(instance):
+    # pages are stamped by page id whatever class they're loaded as
+    return 'wagtailcore.page' if isinstance(instance, Page) else instance._meta.label_lower
+
+
+def flatten(objects):
+    for obj in objects:
+        if obj is None:
+            continue
+        if isinstance(obj, Model):
+            yield obj
+        else:
+            # querysets, lists, related managers
+            for item in flatten(obj.all() if hasattr(obj, 'all') else obj):
+                yield item
+
+
+class FragmentCache(object):
+    """
+    Rendered template fragments keyed by the objects they were rendered
+    from: each object contributes its id and a revision stamp kept in the
+    cache, and saving an object replaces its stamp.  A fragment is only
+    stale once something it was rendered from has changed, and nothing
+    else is disturbed when that happens.
+    """
+    fragment_key = 'fragments:%s:%s'
+    version_key = 'fragments:version:%s:%s'
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'FRAGMENT_CACHE_ALIAS', None) is not None
+
+    @property
+    def cache(self):
+        return caches[settings.FRAGMENT_CACHE_ALIAS]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+    def versions(self, instances):
+        keys = [self.version_key % (label(instance), instance.pk)
+            for instance in instances]
+        versions = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            for key in missing:
+                self.cache.add(key, uuid.uuid4().hex, None)
+            versions.update(self.cache.get_many(missing))
+        return [versions.get(key) for key in keys]
+
+    def key(self, name, objects):
+        instances = list(flatten(objects))
+        revisions = zip(instances, self.versions(instances))
+        digest = hashlib.md5('|'.join('{}:{}:{}'.format(
+            label(instance), instance.pk, version)
+            for instance, version in revisions).encode('utf-8')).hexdigest()
+        return self.fragment_key % (name, digest)
+
+    def render(self, name, objects, render):
+        """The cached fragment ``name`` for ``objects``, rendering and
+        storing it with ``render()`` if there isn't one."""
+        if not self.enabled:
+            return render()
+        # stamps are read before rendering, so a save landing mid-render
+        # leaves the fragment stale on arrival rather than cached as current
+        key = self.key(name, objects)
+        content = self.cache.get(key)
+        if content is None:
+            content = render()
+            self.cache.set(key, content, self.timeout)
+        return content
+
+    def touch(self, instance):
+        if self.enabled:
+            self.cache.delete(self.version_key % (label(instance), instance.pk))
+
+    def touch_many(self, model_label, pks):
+        # for changes made without saving instances, like bulk writes
+        if self.enabled:
+            self.cache.delete_many([self.version_key % (model_label, pk) for pk in pks])
+
+
+fragment_cache = FragmentCache()
@@ -0,0 +1,231 @@
+import json
+from array import array
+from collections import OrderedDict
+
+from django.db.models import F
+
+from .indexes import SharedIndex
+
+
+# node types
+PERSON, ORGANIZATION, EVENT, PLACE = range(1, 5)
+NODE_TYPES = OrderedDict([
+    (PERSON, 'person'),
+    (ORGANIZATION, 'organization'),
+    (EVENT, 'event'),
+    (PLACE, 'place'),
+])
+
+# edge type code -> (label from the owning side, label from the other side,
+# 'app.Model.field' holding it); edges are stored in both directions, the
+# reverse one with a negated code
+EDGE_TYPES = OrderedDict([
+    (1, ('friends', 'friends', 'names.Person.friends')),
+    (2, ('employees', 'employers', 'names.Organization.employees')),
+    (3, ('members', 'member_of', 'names.Organization.members')),
+    (4, ('locations', 'organizations', 'names.Organization.locations')),
+    (5, ('organizers', 'organizer_of', 'events.Event.organizers')),
+    (6, ('venues', 'venue_of', 'events.Event.venues')),
+    (7, ('locations', 'events', 'events.Event.locations')),
+    (8, ('parent', 'children', None)),  # events nested in events
+])
+
+
+def edge_codes(labels):
+    """The signed edge codes a set of labels covers."""
+    codes = set()
+    for code, (forward, reverse, source) in EDGE_TYPES.items():
+        if forward in labels:
+            codes.add(code)
+        if reverse in labels:
+            codes.add(-code)
+    unknown = set(labels) - {label for forward, reverse, source
+        in EDGE_TYPES.values() for label in (forward, reverse)}
+    if unknown:
+        raise ValueError('Unknown edge labels: ' + ', '.join(sorted(unknown)))
+    return codes
+
+
+def edge_label(code):
+    forward, reverse, source = EDGE_TYPES[abs(code)]
+    return forward if code > 0 else reverse
+
+
+class RelationGraph(SharedIndex):
+    """
+    A typed graph over people, organizations, events and places, built
+    from their many-to-many relations and the nesting of events, held in
+    compressed sparse rows: node i's edges are ``targets[offsets[i]:
+    offsets[i + 1]]`` with their type codes alongside in ``codes``.
+
+    Any relevant change just bumps a version stamp in the cache; the
+    graph is rebuilt, a query per relation, the next time it's asked for.
+    Walks skip pages that aren't live.
+    """
+    version_cache_key = 'visualist:graph-version'
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.ids = array('l')
+        self.index = {}
+        self.types = bytearray()
+        self.live = bytearray()
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        self.codes = array('b')
+
+    def node_models(self):
+        from events.models import Event
+        from names.models import Organization, Person
+        from places.models import Place
+
+        return OrderedDict([
+            (PERSON, Person),
+            (ORGANIZATION, Organization),
+            (EVENT, Event),
+            (PLACE, Place),
+        ])
+
+    def load(self):
+        from django.apps import apps
+
+        models = self.node_models()
+        with self.lock:
+            self.clear()
+            event_paths = {}
+            for node_type, model in models.items():
+                values = ['pk', 'live'] + (['path'] if node_type == EVENT else [])
+                for row in model.objects.order_by('pk') \
+                        .values_list(*values).iterator():
+                    self.index[row[0]] = len(self.ids)
+                    self.ids.append(row[0])
+                    self.types.append(node_type)
+                    self.live.append(row[1])
+                    if node_type == EVENT:
+                        event_paths[row[2]] = row[0]
+
+            edges = []
+            for code, (forward, reverse, source) in EDGE_TYPES.items():
+                if source is None:
+                    continue
+                app_label, model_name, field_name = source.split('.')
+                field = apps.get_model(app_label, model_name)._meta \
+                    .get_field(field_name)
+                rows = field.remote_field.through.objects.values_list(
+                    field.m2m_field_name() + '_id',
+                    field.m2m_reverse_field_name() + '_id')
+                if code == 1:
+                    # symmetrical: the through table has both directions
+                    rows = rows.filter(**{
+                        field.m2m_field_name() + '_id__lt':
+                            F(field.m2m_reverse_field_name() + '_id')})
+                edges.extend((a, b, code) for a, b in rows.iterator())
+
+            steplen = models[EVENT].steplen
+            for path, pk in event_paths.items():
+                parent = event_paths.get(path[:-steplen])
+                if parent is not None:
+                    edges.append((pk, parent, 8))
+
+            self.build([(self.index[a], self.index[b], code)
+                for a, b, code in edges
+                if a in self.index and b in self.index])
+
+    def build(self, edges):
+        counts = array('l', [0]) * (len(self.ids) + 1)
+        for a, b, code in edges:
+            counts[a + 1] += 1
+            counts[b + 1] += 1
+        for i in range(len(self.ids)):
+            counts[i + 1] += counts[i]
+        self.offsets = array('l', counts)
+        self.targets = array('l', [0]) * (2 * len(edges))
+        self.codes = array('b', [0]) * (2 * len(edges))
+        for a, b, code in edges:
+            for source, target, signed in ((a, b, code), (b, a, -code)):
+                self.targets[counts[source]] = target
+                self.codes[counts[source]] = signed
+                counts[source] += 1
+
+    def edges(self, i, codes=None):
+        for k in range(self.offsets[i], self.offsets[i + 1]):
+            if codes is None or self.codes[k] in codes:
+                yield self.targets[k], self.codes[k]
+
+    def follow(self, ids, *steps, **kwargs):
+        """
+        The live pages reached from ``ids`` by taking each step in turn,
+        a step being an edge label or a set of them:
+
+            follow([x], 'organizer_of', 'organizers', 'organizer_of',
+                'locations', node_type='place')
+
+        is every place where someone who organized an event with x held
+        an event.  ``node_type`` ('person', 'place', ...) filters the
+        final set, which never includes the starting pages.  Returns a set
+        of ids.
+        """
+        node_type = kwargs.pop('node_type', None)
+        type_code = {name: code for code, name in NODE_TYPES.items()}.get(node_type)
+        with self.lock:
+            frontier = {self.index[pk] for pk in ids if pk in self.index}
+            start = set(frontier)
+            for step in steps:
+                codes = edge_codes({step} if isinstance(step, str) else step)
+                frontier = {j for i in frontier for j, code in self.edges(i, codes)
+                    if self.live[j]}
+            return {self.ids[i] for i in frontier - (start if steps else set())
+                if type_code is None or self.types[i] == type_code}
+
+    def neighbourhood(self, pk, k=2, labels=None):
+        """
+        {id: hops} for the live pages within ``k`` edges of ``pk``,
+        walking only edges with the given ``labels`` (all by default).
+        """
+        codes = edge_codes(labels) if labels is not None else None
+        with self.lock:
+            start = self.index.get(pk)
+            if start is None:
+                return {}
+            hops = {start: 0}
+            frontier = [start]
+            for depth in range(1, k + 1):
+                reached = []
+                for i in frontier:
+                    for j, code in self.edges(i, codes):
+                        if j not in hops and self.live[j]:
+                            hops[j] = depth
+                            reached.append(j)
+                frontier = reached
+            del hops[start]
+            return {self.ids[i]: count for i, count in hops.items()}
+
+    def export(self, out):
+        """
+        Write the graph as JSON, {"nodes": [...], "edges": [...]}, a node
+        or edge at a time so large graphs don't need building in memory.
+        Each edge is listed once, from its owning side.
+        """
+        with self.lock:
+            out.write('{"version": %s,\n"nodes": [' % json.dumps(self.version))
+            for i, pk in enumerate(self.ids):
+                out.write(('\n' if i == 0 else ',\n') + json.dumps({
+                    'id': pk,
+                    'type': NODE_TYPES[self.types[i]],
+                    'live': bool(self.live[i]),
+                }))
+            out.write('\n],\n"edges": [')
+            first = True
+            for i, pk in enumerate(self.ids):
+                for j, code in self.edges(i):
+                    if code > 0:
+                        out.write(('\n' if first else ',\n') + json.dumps(
+                            [pk, edge_label(code), self.ids[j]]))
+                        first = False
+            out.write('\n]}\n')
+
+
+relation_graph = RelationGraph()
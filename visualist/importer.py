@@ -0,0 +1,367 @@
+import csv
+import datetime
+import json
+from collections import OrderedDict, defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
+from wagtail.wagtailcore.models import Page, Site
+from wagtail.wagtailsearch.backends import get_search_backends
+
+
+# type -> (model, default parent's model or None for the site root,
+# {link field: types its slugs are looked up in, in order})
+IMPORT_TYPES = OrderedDict([
+    ('person', ('names.Person', 'names.PersonIndex', {
+        'friends': ('person',),
+    })),
+    ('organization', ('names.Organization', 'names.OrganizationIndex', {
+        'employees': ('person',),
+        'members': ('person',),
+        'locations': ('place',),
+    })),
+    ('place', ('places.Place', None, {})),
+    ('event', ('events.Event', 'events.EventIndex', {
+        'organizers': ('person', 'organization'),
+        'venues': ('organization',),
+        'locations': ('place',),
+    })),
+])
+
+# set by the importer, not the data
+RESERVED_FIELDS = {
+    'id', 'path', 'depth', 'numchild', 'draft_title', 'content_type',
+    'live', 'has_unpublished_changes', 'url_path', 'owner', 'locked',
+    'expired', 'first_published_at', 'last_published_at',
+    'latest_revision_created_at', 'live_revision', 'geohash',
+}
+
+LIST_SEPARATOR = '|'  # between slugs in a CSV link column
+
+
+class RecordImportError(Exception):
+    pass
+
+
+def read_rows(path):
+    """(line number, row dict) for each record in a .csv or JSON lines file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            reader = csv.DictReader(f)
+            for row in reader:
+                # cells beyond the header row end up under None
+                yield reader.line_num, {key: value for key, value in row.items()
+                    if key is not None}
+        else:
+            for line, text in enumerate(f, 1):
+                if text.strip():
+                    try:
+                        yield line, json.loads(text)
+                    except ValueError as e:
+                        raise RecordImportError('{}:{}: {}'.format(path, line, e))
+
+
+def split_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    return list(value)
+
+
+def insert(model, objs, fields, using):
+    # QuerySet._insert is what bulk_create is built on; bulk_create itself
+    # refuses multi-table inheritance, so each table is filled in turn
+    connection = connections[using]
+    size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    for i in range(0, len(objs), size):
+        model._base_manager._insert(objs[i:i + size], fields=fields, using=using)
+
+
+class RecordImporter(object):
+    """
+    Streams records into pages in two passes.
+
+    The first creates pages a batch at a time: their tree paths are
+    worked out here and each table of the page's model is filled with a
+    few multi-row INSERTs, instead of a treebeard ``add_child`` (and its
+    queries) per row.  The second resolves link fields by slug once
+    every page exists, writing the through tables in bulk.
+
+    A record's slug, given or taken from its title, is its key: records
+    whose slug is already taken under their parent are skipped, and links
+    that already exist aren't written again, so an interrupted import is
+    finished by running it again.
+    """
+
+    def __init__(self, parents=None, batch_size=500, index=True, log=None):
+        self.batch_size = batch_size
+        self.index = index
+        self.log = log or (lambda message: None)
+        self.using = router.db_for_write(Page)
+        self.models = {kind: apps.get_model(model)
+            for kind, (model, parent, links) in IMPORT_TYPES.items()}
+        self.parents = {kind: self.default_parent(kind) for kind in IMPORT_TYPES}
+        self.parents.update(parents or {})
+        self.slugs = {}
+        self.siblings = {}
+        self.stats = defaultdict(int)
+        self.linked = set()  # pages on either end of a link written
+        self.ignored = set()
+
+    def default_parent(self, kind):
+        model, parent, links = IMPORT_TYPES[kind]
+        if parent is None:
+            return Site.objects.get(is_default_site=True).root_page
+        return apps.get_model(parent).objects.order_by('path').first()
+
+    def parent(self, kind):
+        parent = self.parents.get(kind)
+        if parent is None:
+            raise RecordImportError('No page to import {} records under'.format(kind))
+        return parent
+
+    def existing_slugs(self, kind):
+        # slug -> page id for this type's pages under its parent
+        if kind not in self.slugs:
+            self.slugs[kind] = dict(self.models[kind].objects
+                .child_of(self.parent(kind)).values_list('slug', 'pk'))
+        return self.slugs[kind]
+
+    def sibling_slugs(self, kind):
+        # every slug under the parent, whatever the page's type; types
+        # sharing a parent share the set
+        parent = self.parent(kind)
+        if parent.pk not in self.siblings:
+            self.siblings[parent.pk] = set(Page.objects.child_of(parent)
+                .values_list('slug', flat=True))
+        return self.siblings[parent.pk]
+
+    def run(self, paths, kind=None):
+        try:
+            for path in paths:
+                self.create_pages(path, kind)
+            for path in paths:
+                self.create_links(path, kind)
+        finally:
+            # even a failed run may have created some pages
+            self.refresh()
+        return self.stats
+
+    def record_kind(self, row, kind):
+        kind = kind or row.get('type')
+        if kind not in IMPORT_TYPES:
+            raise RecordImportError('Unknown record type: {!r}'.format(kind))
+        return kind
+
+    def create_pages(self, path, kind=None):
+        batches = defaultdict(list)
+        for line, row in read_rows(path):
+            row_kind = self.record_kind(row, kind)
+            batch = batches[row_kind]
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self.create_batch(path, row_kind, batch)
+                batches[row_kind] = []
+        for row_kind, batch in batches.items():
+            if batch:
+                self.create_batch(path, row_kind, batch)
+
+    def build(self, kind, row):
+        model = self.models[kind]
+        values = {}
+        for key, value in row.items():
+            if key in ('type', 'slug') or key in IMPORT_TYPES[kind][2]:
+                continue
+            try:
+                field = model._meta.get_field(key)
+            except FieldDoesNotExist:
+                self.ignored.add(key)
+                continue
+            if key in RESERVED_FIELDS or not field.concrete or field.many_to_many:
+                self.ignored.add(key)
+                continue
+            values[field.attname] = self.convert(field, value)
+        if not values.get('title'):
+            raise RecordImportError('A title is needed')
+        page = model(**values)
+        page.slug = row.get('slug') or slugify(page.title)[:255]
+        if not page.slug:
+            raise RecordImportError("Can't make a slug from {!r}".format(page.title))
+        return page
+
+    def convert(self, field, value):
+        if value == '' and field.null:
+            return None
+        value = field.to_python(value)
+        if (isinstance(value, datetime.datetime) and settings.USE_TZ
+                and timezone.is_naive(value)):
+            value = timezone.make_aware(value)
+        return value
+
+    def create_batch(self, path, kind, rows):
+        model = self.models[kind]
+        slugs = self.existing_slugs(kind)
+        siblings = self.sibling_slugs(kind)
+        pages = []
+        for line, row in rows:
+            try:
+                page = self.build(kind, row)
+            except (RecordImportError, ValidationError, ValueError) as e:
+                raise RecordImportError('{}:{}: {}'.format(path, line, e))
+            if page.slug in slugs:
+                self.stats[kind + ' skipped'] += 1
+                continue
+            if page.slug in siblings:
+                # a page of another type has the URL this one would get
+                raise RecordImportError('{}:{}: slug {!r} is taken by another '
+                    'page under {}'.format(path, line, page.slug, self.parent(kind)))
+            slugs[page.slug] = None  # taken, even if by a later duplicate
+            siblings.add(page.slug)
+            pages.append(page)
+        if not pages:
+            return
+
+        try:
+            with transaction.atomic(using=self.using):
+                self.insert_pages(model, self.parent(kind), pages)
+        except Exception as e:
+            for page in pages:
+                del slugs[page.slug]
+                siblings.discard(page.slug)
+            raise RecordImportError('{}: batch from line {}: {}'.format(path, rows[0][0], e))
+
+        for page in pages:
+            slugs[page.slug] = page.pk
+        self.stats[kind + ' created'] += len(pages)
+        self.log('{}: {} {} pages created'.format(
+            path, self.stats[kind + ' created'], kind))
+
+    def insert_pages(self, model, parent, pages):
+        parent = Page.objects.get(pk=parent.pk)
+        depth = parent.depth + 1
+        last = Page.objects.filter(path__startswith=parent.path, depth=depth) \
+            .order_by('-path').values_list('path', flat=True).first()
+        step = Page._str2int(last[-Page.steplen:]) if last else 0
+        now = timezone.now()
+        for page in pages:
+            step += 1
+            page.path = Page._get_path(parent.path, depth, step)
+            page.depth = depth
+            page.numchild = 0
+            page.url_path = parent.url_path + page.slug + '/'
+            page.draft_title = page.title
+            page.live = True
+            page.has_unpublished_changes = False
+            page.first_published_at = page.last_published_at = now
+            if hasattr(page, 'set_geohash'):
+                page.set_geohash()
+
+        # the page table first, for the ids every other table points at
+        insert(Page, pages, [field for field in Page._meta.local_concrete_fields
+            if not field.primary_key], self.using)
+        ids = dict(Page.objects.filter(path__in=[page.path for page in pages])
+            .values_list('path', 'pk'))
+        for page in pages:
+            for cls in [model] + model._meta.get_parent_list():
+                setattr(page, cls._meta.pk.attname, ids[page.path])
+        for cls in reversed(model._meta.get_parent_list()[:-1]):
+            insert(cls, pages, cls._meta.local_concrete_fields, self.using)
+        insert(model, pages, model._meta.local_concrete_fields, self.using)
+        Page.objects.filter(pk=parent.pk).update(numchild=F('numchild') + len(pages))
+
+        self.after_insert(model, pages)
+
+    def after_insert(self, model, pages):
+        # what signals would have done for pages saved one at a time
+        from events.models import Event, EventOccurrence
+
+        if issubclass(model, Event):
+            occurrences = []
+            for event in pages:
+                start, end = event.get_interval()
+                occurrences.append(EventOccurrence(event_id=event.pk,
+                    start=start, end=end, precision=event.precision, live=True))
+            EventOccurrence.objects.bulk_create(occurrences)
+        if self.index:
+            for backend in get_search_backends(with_auto_update=True):
+                backend.add_bulk(model, pages)
+
+    def resolve(self, kinds, slug):
+        for kind in kinds:
+            pk = self.existing_slugs(kind).get(slug)
+            if pk is not None:
+                return pk
+        return None
+
+    def create_links(self, path, kind=None):
+        pending = defaultdict(set)  # (kind, field name) -> {(source, target)}
+        count = 0
+        for line, row in read_rows(path):
+            row_kind = self.record_kind(row, kind)
+            links = IMPORT_TYPES[row_kind][2]
+            if not any(row.get(name) for name in links):
+                continue
+            slug = row.get('slug') or slugify(row.get('title', ''))
+            source = self.existing_slugs(row_kind).get(slug)
+            if source is None:
+                continue
+            for name, kinds in links.items():
+                for target_slug in split_list(row.get(name)):
+                    target = self.resolve(kinds, target_slug)
+                    if target is None:
+                        self.stats['links unresolved'] += 1
+                    else:
+                        pending[(row_kind, name)].add((source, target))
+                        count += 1
+            if count >= self.batch_size:
+                self.write_links(pending)
+                pending, count = defaultdict(set), 0
+        self.write_links(pending)
+
+    def write_links(self, pending):
+        with transaction.atomic(using=self.using):
+            for (kind, name), pairs in pending.items():
+                field = self.models[kind]._meta.get_field(name)
+                if field.remote_field.symmetrical:  # friends
+                    pairs = pairs | {(b, a) for a, b in pairs}
+                through = field.remote_field.through
+                source = field.m2m_field_name() + '_id'
+                target = field.m2m_reverse_field_name() + '_id'
+                existing = set(through.objects
+                    .filter(**{source + '__in': {a for a, b in pairs}})
+                    .values_list(source, target))
+                new = sorted(pairs - existing)
+                through.objects.bulk_create(
+                    [through(**{source: a, target: b}) for a, b in new])
+                self.stats['links created'] += len(new)
+                for a, b in new:
+                    self.linked.update((a, b))
+
+    def refresh(self):
+        """Tell every process-local index and cache the pages changed."""
+        from events.intervals import event_intervals
+        from events.models import EventTag
+        from events.postings import event_postings
+        from names.fuzzy import name_index
+        from names.graph import friend_graph
+        from places.spatial import place_index
+        from search.suggest import suggestions
+        from visualist.fragments import fragment_cache
+        from visualist.graph import relation_graph
+        from visualist.pagecache import page_cache
+
+        for index in (friend_graph, name_index, place_index, relation_graph,
+                event_postings, event_intervals, suggestions):
+            index.invalidate()
+        EventTag.invalidate_counts()
+        # pages that were already there and gained links show them too
+        page_cache.invalidate(self.linked | {parent.pk
+            for parent in self.parents.values() if parent is not None})
+        fragment_cache.touch_many('wagtailcore.page', self.linked)
@@ -0,0 +1,70 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def expired(loaded_at):
+    """Whether something loaded at ``loaded_at`` (time.monotonic()) is past
+    INDEX_MAX_AGE."""
+    max_age = getattr(settings, 'INDEX_MAX_AGE', None)
+    return (max_age is not None and loaded_at is not None
+        and time.monotonic() - loaded_at > max_age)
+
+
+class SharedIndex(object):
+    """
+    A process-local index built from the database, kept in step with the
+    other processes by a version stamp in the default cache.  Changes
+    replace the stamp, and each process reloads once it sees a stamp
+    other than the one it loaded at.
+
+    That only reaches other processes if the default cache is one they
+    share (see production.py); INDEX_MAX_AGE caps how long a copy is
+    trusted whatever the stamp says, for when it isn't.
+
+    Subclasses set ``version_cache_key`` and implement ``load()``.
+    """
+    version_cache_key = None
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.loaded_at = None
+
+    def stamp(self):
+        version = cache.get(self.version_cache_key)
+        if version is None:
+            cache.add(self.version_cache_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_cache_key)
+        return version
+
+    def stale(self):
+        return expired(self.loaded_at)
+
+    def current(self):
+        version = self.stamp()
+        with self.lock:
+            if version != self.version or self.stale():
+                self.load()
+                self.version = version
+                self.loaded_at = time.monotonic()
+        return self
+
+    def load(self):
+        raise NotImplementedError
+
+    def changed(self):
+        # tell other processes; we're up to date ourselves, having patched
+        # the change in, but only if we were before it
+        version = uuid.uuid4().hex
+        previous = cache.get(self.version_cache_key)
+        cache.set(self.version_cache_key, version, None)
+        if self.version is not None:
+            self.version = version if previous == self.version else None
+
+    def invalidate(self):
+        # reload everywhere, this process included
+        cache.set(self.version_cache_key, uuid.uuid4().hex, None)
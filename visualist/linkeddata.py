@@ -0,0 +1,225 @@
+import datetime
+import decimal
+import json
+from collections import OrderedDict
+from html import unescape
+from itertools import islice
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import prefetch_related_objects
+from django.urls import reverse
+from django.utils.html import strip_tags
+
+from modelcluster.fields import ParentalManyToManyField
+
+from wagtail.wagtailcore.models import Page, Site
+
+from .prefetch import prefetch_parental
+
+
+SCHEMA = 'http://schema.org/'
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+# type -> (model, [(schema.org property, field or method)]); every record
+# also gets name, description and sameAs
+EXPORT_TYPES = OrderedDict([
+    ('person', ('names.Person', [
+        ('gender', 'gender'),
+        ('knows', 'friends'),
+        ('email', 'emails'),
+        ('telephone', 'phones'),
+    ])),
+    ('organization', ('names.Organization', [
+        ('employee', 'employees'),
+        ('member', 'members'),
+        ('location', 'locations'),
+        ('email', 'emails'),
+        ('telephone', 'phones'),
+    ])),
+    ('place', ('places.Place', [
+        ('latitude', 'latitude'),
+        ('longitude', 'longitude'),
+        ('openingHours', 'hours'),
+    ])),
+    ('event', ('events.Event', [
+        ('startDate', 'start_date'),
+        ('endDate', 'endDate'),
+        ('organizer', 'organizers'),
+        ('location', 'venues'),
+        ('location', 'locations'),
+    ])),
+])
+
+RECORD_PROPERTIES = [
+    ('name', 'title'),
+    ('description', 'body'),
+    ('sameAs', 'same_as'),
+]
+
+
+class IRI(str):
+    pass
+
+
+class Literal(object):
+
+    def __init__(self, value, datatype=None):
+        self.value = value
+        self.datatype = datatype
+
+
+def schema_types(model):
+    """Every ``schema`` URI the model declares or inherits, most specific
+    first."""
+    types = []
+    for cls in model.__mro__:
+        schema = cls.__dict__.get('schema')
+        if schema and schema not in types:
+            types.append(schema)
+    return types
+
+
+class PageIRIs(object):
+    # Page.full_url without a cache lookup per page
+    def __init__(self):
+        self.roots = Site.get_site_root_paths()
+
+    def __call__(self, page):
+        for site_id, root_path, root_url in self.roots:
+            if page.url_path.startswith(root_path):
+                return IRI(root_url + reverse('wagtail_serve',
+                    args=(page.url_path[len(root_path):],)))
+        return IRI('_:page{}'.format(page.pk))
+
+
+class Exporter(object):
+    """
+    Walks the live records of each type a chunk at a time: rows come off
+    a single streamed query (a server-side cursor where the database has
+    them), and each chunk's relations are prefetched before it's
+    written, so memory use depends on the chunk size, not the dataset.
+    """
+
+    def __init__(self, types=None, chunk_size=500):
+        self.types = types or list(EXPORT_TYPES)
+        self.chunk_size = chunk_size
+        self.iri = PageIRIs()
+
+    def nodes(self):
+        """(subject IRI, [type IRI], [(property IRI, IRI or Literal)])."""
+        for kind in self.types:
+            model_name, properties = EXPORT_TYPES[kind]
+            model = apps.get_model(model_name)
+            properties = RECORD_PROPERTIES + properties
+            types = [IRI(schema) for schema in schema_types(model)]
+
+            rows = model.objects.live().order_by('pk').iterator()
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.prefetch(model, chunk, properties)
+                for page in chunk:
+                    yield self.iri(page), types, list(self.values(page, properties))
+
+    def prefetch(self, model, chunk, properties):
+        for prop, name in properties:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:  # a method
+                continue
+            if isinstance(field, ParentalManyToManyField):
+                prefetch_parental(chunk, name)
+            elif field.many_to_many:
+                prefetch_related_objects(chunk, name)
+
+    def values(self, page, properties):
+        for prop, name in properties:
+            prop = IRI(SCHEMA + prop)
+            value = getattr(page, name)
+            if callable(value) and not isinstance(value, models.Manager):
+                value = value()
+            if isinstance(value, models.Manager):
+                for obj in value.all():
+                    if isinstance(obj, Page):
+                        if obj.live:
+                            yield prop, self.iri(obj)
+                    elif hasattr(obj, 'address'):
+                        yield prop, IRI('mailto:' + obj.address)
+                    else:
+                        yield prop, Literal(str(obj))
+            elif value not in (None, ''):
+                yield prop, self.literal(page, name, value)
+
+    def literal(self, page, name, value):
+        if name == 'same_as':
+            return IRI(value)
+        if name == 'body':
+            return Literal(unescape(strip_tags(value)).strip())
+        try:
+            field = page._meta.get_field(name)
+        except FieldDoesNotExist:
+            field = None
+        if field is not None and field.choices:
+            return Literal(getattr(page, 'get_{}_display'.format(name))())
+        if isinstance(value, bool):
+            return Literal('true' if value else 'false', XSD + 'boolean')
+        if isinstance(value, datetime.datetime):
+            return Literal(value.isoformat(), XSD + 'dateTime')
+        if isinstance(value, decimal.Decimal):
+            return Literal(str(value), XSD + 'decimal')
+        if isinstance(value, int):
+            return Literal(str(value), XSD + 'integer')
+        return Literal(str(value))
+
+
+def ntriples_term(term):
+    if isinstance(term, IRI):
+        return term if term.startswith('_:') else '<{}>'.format(term)
+    escaped = term.value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+    if term.datatype:
+        return '"{}"^^<{}>'.format(escaped, term.datatype)
+    return '"{}"'.format(escaped)
+
+
+def ntriples(nodes):
+    """N-Triples, a line at a time."""
+    for subject, types, values in nodes:
+        subject = ntriples_term(subject)
+        for type_ in types:
+            yield '{} <{}> <{}> .\n'.format(subject, RDF_TYPE, type_)
+        for prop, value in values:
+            yield '{} <{}> {} .\n'.format(subject, prop, ntriples_term(value))
+
+
+def jsonld_value(term):
+    if isinstance(term, IRI):
+        return {'@id': str(term)}
+    if term.datatype:
+        return {'@value': term.value, '@type': term.datatype}
+    return term.value
+
+
+def jsonld(nodes):
+    """A JSON-LD document whose @graph is written a node at a time."""
+    yield '{"@context": {"@vocab": "%s"},\n"@graph": [' % SCHEMA
+    first = True
+    for subject, types, values in nodes:
+        node = OrderedDict([('@id', str(subject)), ('@type', types)])
+        for prop, value in values:
+            # schema.org properties by name, through @vocab
+            key = prop[len(SCHEMA):] if prop.startswith(SCHEMA) else str(prop)
+            node.setdefault(key, []).append(jsonld_value(value))
+        yield ('\n' if first else ',\n') + json.dumps(node)
+        first = False
+    yield '\n]}\n'
+
+
+FORMATS = OrderedDict([
+    ('jsonld', (jsonld, 'application/ld+json')),
+    ('nt', (ntriples, 'application/n-triples')),
+])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from visualist.graph import relation_graph
+
+
+class Command(BaseCommand):
+    help = ("Write a JSON snapshot of the relationship graph between people, "
+        "organizations, events and places")
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?',
+            help="File to write to (default: standard output)")
+
+    def handle(self, **options):
+        graph = relation_graph.current()
+        self.stdout.ending = ''
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                graph.export(out)
+        else:
+            graph.export(self.stdout)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from visualist.linkeddata import EXPORT_TYPES, FORMATS, Exporter
+
+
+class Command(BaseCommand):
+    help = ("Write every live person, organization, place and event as "
+        "JSON-LD or N-Triples, typed with their schema URIs")
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?',
+            help="File to write to (default: standard output)")
+        parser.add_argument('--format', choices=list(FORMATS), default='jsonld')
+        parser.add_argument('--type', action='append', choices=list(EXPORT_TYPES),
+            dest='types', help="Only this type (repeatable)")
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, **options):
+        write, content_type = FORMATS[options['format']]
+        nodes = Exporter(options['types'], options['chunk_size']).nodes()
+        self.stdout.ending = ''
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                for text in write(nodes):
+                    out.write(text)
+        else:
+            for text in write(nodes):
+                self.stdout.write(text)
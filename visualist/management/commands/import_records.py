@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wagtail.wagtailcore.models import Page
+
+from visualist.importer import IMPORT_TYPES, RecordImportError, RecordImporter
+
+
+class Command(BaseCommand):
+    help = ("Import people, organizations, places and events from JSON lines "
+        "or CSV files. Each record names its type (or use --type), a title, "
+        "any of the model's fields and, for links, the slugs of the pages "
+        "it links to ('|'-separated in CSV). Re-running an interrupted "
+        "import finishes it.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', metavar='path')
+        parser.add_argument('--type', choices=list(IMPORT_TYPES),
+            help="Type of every record, instead of each record's 'type'")
+        parser.add_argument('--parent', action='append', default=[],
+            metavar='TYPE=PAGE_ID',
+            help="Page to put a type's records under (default: the first "
+                "index page for it; places go under the site root)")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--no-index', action='store_false', dest='index',
+            help="Leave the search index for update_index to fill")
+
+    def handle(self, **options):
+        parents = {}
+        for parent in options['parent']:
+            kind, sep, pk = parent.partition('=')
+            if kind not in IMPORT_TYPES or not pk.isdigit():
+                raise CommandError('--parent takes TYPE=PAGE_ID, not ' + parent)
+            try:
+                parents[kind] = Page.objects.get(pk=pk)
+            except Page.DoesNotExist:
+                raise CommandError('No page with id ' + pk)
+
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        importer = RecordImporter(parents, options['batch_size'],
+            options['index'], log)
+        try:
+            stats = importer.run(options['paths'], options['type'])
+        except (RecordImportError, IOError) as e:
+            raise CommandError(e)
+
+        for key in sorted(stats):
+            self.stdout.write('{}: {}'.format(key, stats[key]))
+        if importer.ignored:
+            self.stdout.write('ignored columns: ' + ', '.join(sorted(importer.ignored)))
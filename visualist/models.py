@@ -6,10 +6,26 @@ from wagtail.wagtailadmin.edit_handlers import FieldPanel, FieldRowPanel
 from wagtail.wagtailcore.fields import RichTextField
 from wagtail.wagtailcore.models import Page
 from wagtail.wagtailimages.models import Image, AbstractImage, AbstractRendition
+from wagtail.wagtailsearch import index
 from wagtail.wagtailsnippets.models import register_snippet
 from wagtail.wagtailsnippets.edit_handlers import SnippetChooserPanel
 
 
+class SpecificChildrenMixin(object):
+    """
+    For index pages listing their children: the live children as their
+    specific classes, a query per content type rather than one per child,
+    kept on the page so a template asking again costs nothing.
+    """
+    children_order = ['-first_published_at']
+
+    def specific_children(self):
+        if not hasattr(self, '_specific_children'):
+            self._specific_children = list(self.get_children().live()
+                .order_by(*self.children_order).specific())
+        return self._specific_children
+
+
 class Record(Page):
     schema = 'http://schema.org/Thing'
 
@@ -26,6 +42,17 @@ class Record(Page):
 
     extra_names = models.ManyToManyField('visualist.ExtraName', blank=True)
 
+    search_fields = Page.search_fields + [
+        index.SearchField('body'),
+        index.RelatedFields('extra_names', [
+            index.SearchField('name'),
+        ]),
+        index.RelatedFields('source', [
+            index.SearchField('title'),
+            index.SearchField('authors'),
+        ]),
+    ]
+
     content_panels = Page.content_panels + [
         FieldPanel('body', classname="full"),
         FieldPanel('same_as'),
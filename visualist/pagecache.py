@@ -0,0 +1,126 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class PageCache(object):
+    """
+    Rendered Wagtail pages for anonymous visitors, keyed by site and full
+    path (query string included).
+
+    Each entry records the page it was rendered from and that page's
+    version stamp as of the start of the render, along with a site-wide
+    stamp; publishing or unpublishing a page replaces the stamps of the
+    pages that show it, which orphans their entries everywhere at once
+    without having to know which URLs they were cached under.  Changes
+    that could show anywhere, like a snippet's, replace the site-wide one.
+    """
+    response_key = 'pages:response:%s:%s'
+    version_key = 'pages:version:%s'
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'PAGE_CACHE_ALIAS', None) is not None
+
+    @property
+    def cache(self):
+        return caches[settings.PAGE_CACHE_ALIAS]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+
+    def key(self, request):
+        path = hashlib.md5(request.get_full_path().encode('utf-8')).hexdigest()
+        return self.response_key % (request.site.pk, path)
+
+    def version_keys(self, page_id):
+        return [self.version_key % page_id, self.version_key % 'all']
+
+    def versions(self, page_id):
+        """The page's stamp and the site-wide one."""
+        keys = self.version_keys(page_id)
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, uuid.uuid4().hex, None)
+                versions[key] = self.cache.get(key)
+        return tuple(versions[key] for key in keys)
+
+    def get(self, request):
+        entry = self.cache.get(self.key(request))
+        if entry is None:
+            return None
+        page_id, versions, response = entry
+        keys = self.version_keys(page_id)
+        current = self.cache.get_many(keys)
+        if tuple(current.get(key) for key in keys) != versions:
+            return None
+        return response
+
+    def set(self, request, page_id, versions, response):
+        self.cache.set(self.key(request), (page_id, versions, response), self.timeout)
+
+    def invalidate(self, page_ids):
+        if self.enabled:
+            self.cache.delete_many([self.version_key % pk for pk in page_ids])
+
+    def invalidate_all(self):
+        if self.enabled:
+            self.cache.delete(self.version_key % 'all')
+
+
+page_cache = PageCache()
+
+
+def cacheable_request(request):
+    return (page_cache.enabled
+        and request.method in ('GET', 'HEAD')
+        and getattr(request, 'site', None) is not None
+        and not request.user.is_authenticated
+        and not getattr(request, 'is_preview', False))
+
+
+def cacheable_response(request, response):
+    cache_control = response.get('Cache-Control', '')
+    return (response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # a CSRF token in the page means a per-visitor cookie goes with it
+        and not request.META.get('CSRF_COOKIE_USED')
+        and not any(directive in cache_control
+            for directive in ('private', 'no-cache', 'no-store')))
+
+
+class PageCacheMiddleware(object):
+    """
+    Serve anonymous GETs for Wagtail pages from ``page_cache``.  Needs
+    to come after the authentication and site middleware; the page is
+    picked up from the ``before_serve_page`` hook in wagtail_hooks.py.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not cacheable_request(request):
+            return self.get_response(request)
+
+        response = page_cache.get(request)
+        if response is not None:
+            return response
+
+        # checking for a logged-in user has already read the session, so
+        # only note whether the view itself reads it
+        session = request.session
+        accessed, session.accessed = session.accessed, False
+        response = self.get_response(request)
+        session_used = session.accessed
+        session.accessed = accessed or session_used
+
+        served = getattr(request, 'page_cache_version', None)
+        if (served is not None and not session_used and request.method == 'GET'
+                and cacheable_response(request, response)):
+            page_cache.set(request, served[0], served[1], response)
+        return response
@@ -0,0 +1,32 @@
+def prefetch_parental(instances, field_name, select=()):
+    """
+    Load a ParentalManyToManyField for every instance with one query.
+
+    Django's prefetch_related can't see through modelcluster's managers,
+    so this fills in the in-memory object list modelcluster's manager
+    already answers ``all()`` from, the same state an unsaved edit is
+    kept in.  ``select`` names relations of the related model to
+    select_related alongside (e.g. a category's icon).
+    """
+    instances = [instance for instance in instances if instance.pk]
+    if not instances:
+        return
+    field = type(instances[0])._meta.get_field(field_name)
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    ordering = [('-' if name.startswith('-') else '') + target + '__' + name.lstrip('-')
+        for name in field.related_model._meta.ordering] + ['pk']
+
+    related = {instance.pk: [] for instance in instances}
+    rows = field.remote_field.through.objects \
+        .filter(**{source + '_id__in': list(related)}) \
+        .select_related(target, *[target + '__' + name for name in select]) \
+        .order_by(*ordering)
+    for row in rows:
+        related[getattr(row, source + '_id')].append(getattr(row, target))
+
+    for instance in instances:
+        if not hasattr(instance, '_cluster_related_objects'):
+            instance._cluster_related_objects = {}
+        instance._cluster_related_objects.setdefault(
+            field_name, related[instance.pk])
@@ -0,0 +1,236 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+
+from wagtail.wagtailimages import get_image_model
+from wagtail.wagtailimages.models import Filter, SourceImageIOError
+from wagtail.wagtailimages.shortcuts import get_rendition_or_not_found
+
+
+logger = logging.getLogger(__name__)
+
+
+FORMAT_EXTENSIONS = {
+    'jpeg': '.jpg',
+    'png': '.png',
+    'gif': '.gif',
+}
+
+
+def rendition_filename(image, filter, cache_key, format_name):
+    # as Image.get_rendition names them
+    name, extension = os.path.splitext(os.path.basename(image.file.name))
+    extension = filter.spec.replace('|', '.') + FORMAT_EXTENSIONS[format_name]
+    if cache_key:
+        extension = cache_key + '.' + extension
+    return name[:59 - len(extension)] + '.' + extension
+
+
+def run_filter(image, filter):
+    """The resized image file, or None if the original can't be read."""
+    try:
+        return filter.run(image, BytesIO())
+    except SourceImageIOError:
+        return None
+
+
+def create_renditions(images, filter, keys):
+    """
+    Make renditions for ``images``: the resizing, which is where the time
+    goes and which Pillow does without holding the GIL, on a thread each;
+    the rows, written here, where the connection is.
+    """
+    images = list(images)
+    threads = min(len(images), getattr(settings, 'RENDITION_THREADS', 4))
+    if threads > 1:
+        with ThreadPoolExecutor(threads) as pool:
+            generated = list(pool.map(lambda image: run_filter(image, filter), images))
+    else:
+        generated = [run_filter(image, filter) for image in images]
+
+    renditions = {}
+    for image, output in zip(images, generated):
+        if output is None:
+            renditions[image.pk] = get_rendition_or_not_found(image, filter)
+            continue
+        rendition, created = image.renditions.get_or_create(
+            filter_spec=filter.spec,
+            focal_point_key=keys[image.pk],
+            defaults={'file': File(output.f, name=rendition_filename(
+                image, filter, keys[image.pk], output.format_name))})
+        rendition.image = image
+        renditions[image.pk] = rendition
+    return renditions
+
+
+def get_renditions(images, filter_spec):
+    """
+    Return a dict of image id -> rendition for ``images``, fetching the
+    renditions that already exist in a single query and generating the
+    rest in parallel.
+    """
+    filter = Filter(spec=filter_spec)
+    images = {image.pk: image for image in images if image is not None}
+    keys = {pk: filter.get_cache_key(image) for pk, image in images.items()}
+
+    Rendition = get_image_model().get_rendition_model()
+    existing = Rendition.objects.filter(
+        image_id__in=images.keys(),
+        filter_spec=filter.spec,
+        focal_point_key__in=set(keys.values()),
+    )
+
+    renditions = {}
+    for rendition in existing:
+        if keys[rendition.image_id] == rendition.focal_point_key:
+            # img_tag reads image.title for alt text; avoid refetching it
+            rendition.image = images[rendition.image_id]
+            renditions[rendition.image_id] = rendition
+
+    missing = [image for pk, image in images.items() if pk not in renditions]
+    if missing:
+        renditions.update(create_renditions(missing, filter, keys))
+
+    return renditions
+
+
+def pair_renditions(objects, filter_spec, field=None):
+    """
+    [(object, rendition or None)] for a list of images, or of objects
+    holding one in the foreign key ``field`` (gallery items, categories'
+    icons); the images themselves are loaded in one query if needed.
+    """
+    objects = list(objects)
+    if field is None:
+        images = objects
+    else:
+        ids = {getattr(obj, field + '_id') for obj in objects}
+        loaded = get_image_model().objects.in_bulk(ids - {None})
+        images = []
+        for obj in objects:
+            image = loaded.get(getattr(obj, field + '_id'))
+            if image is not None:
+                setattr(obj, field, image)
+            images.append(image)
+
+    renditions = get_renditions(images, filter_spec)
+    return [(obj, renditions[image.pk] if image is not None else None)
+        for obj, image in zip(objects, images)]
+
+
+def generate_renditions(jobs):
+    """
+    Make whichever renditions in ``jobs``, [(image id, filter spec)], don't
+    exist yet.  Runs in the warmer's worker processes; returns how many
+    it looked at.
+    """
+    images = get_image_model().objects.in_bulk({pk for pk, spec in jobs})
+    done = 0
+    for pk, spec in jobs:
+        image = images.get(pk)
+        if image is None:  # deleted since
+            continue
+        try:
+            image.get_rendition(spec)
+        except SourceImageIOError:
+            logger.warning("Can't warm %s for image %d: source file missing", spec, pk)
+            continue
+        done += 1
+    return done
+
+
+def log_failure(future):
+    if future.exception() is not None:
+        logger.error('Rendition warming failed', exc_info=future.exception())
+
+
+class RenditionWarmer(object):
+    """
+    Generates renditions ahead of the first visitor who'd ask for them.
+
+    ``enqueue`` collects (image, filter spec) pairs; once the transaction
+    they were queued in commits they're handed, in chunks, to a pool of
+    worker processes, so Pillow's resizing happens neither inside the
+    request nor under the GIL of the process serving it.  With
+    RENDITION_WARM_PROCESSES set to 0 the work is done in-process instead.
+    """
+    chunk_size = 25
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.pool = None
+
+    @property
+    def processes(self):
+        return getattr(settings, 'RENDITION_WARM_PROCESSES', 2)
+
+    def add(self, image_ids, filter_specs):
+        """Queue jobs for the next ``flush``; returns whether there were any."""
+        jobs = {(pk, spec) for pk in image_ids if pk is not None
+            for spec in filter_specs}
+        with self.lock:
+            self.pending.update(jobs)
+        return bool(jobs)
+
+    def enqueue(self, image_ids, filter_specs):
+        """Queue jobs and flush them once the current transaction commits."""
+        if self.add(image_ids, filter_specs):
+            # workers couldn't see uncommitted images
+            transaction.on_commit(self.flush)
+
+    def get_pool(self):
+        if self.pool is None:
+            # spawned, not forked: workers open their own connections
+            # rather than sharing this process's
+            self.pool = ProcessPoolExecutor(self.processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup)
+        return self.pool
+
+    def reset_pool(self):
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def flush(self, wait_for=False):
+        """
+        Hand the pending jobs over.  With ``wait_for`` block until they're
+        done and return how many renditions were checked or made.
+        """
+        with self.lock:
+            jobs = sorted(self.pending)
+            self.pending = set()
+        chunks = [jobs[i:i + self.chunk_size]
+            for i in range(0, len(jobs), self.chunk_size)]
+
+        if not self.processes:
+            return sum(generate_renditions(chunk) for chunk in chunks)
+
+        try:
+            futures = [self.get_pool().submit(generate_renditions, chunk)
+                for chunk in chunks]
+        except (RuntimeError, OSError):
+            # a broken or shut down pool, or no processes to be had; this
+            # runs after the save has committed, so it mustn't fail it.
+            # The renditions are made on demand instead
+            logger.exception("Couldn't hand %d renditions to the warming pool", len(jobs))
+            self.reset_pool()
+            return 0 if wait_for else None
+        for future in futures:
+            future.add_done_callback(log_failure)
+        if wait_for:
+            wait(futures)
+            return sum(future.result() for future in futures
+                if future.exception() is None)
+
+
+rendition_warmer = RenditionWarmer()
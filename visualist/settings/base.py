@@ -72,6 +72,7 @@ MIDDLEWARE = [
 
     'wagtail.wagtailcore.middleware.SiteMiddleware',
     'wagtail.wagtailredirects.middleware.RedirectMiddleware',
+    'visualist.pagecache.PageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'visualist.urls'
@@ -141,10 +142,84 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
 
+# Cache
+
+CACHES = {
+    # also holds the version stamps that tell each process its in-memory
+    # indexes are out of date, so it has to be shared between processes
+    # to do that (see production.py)
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # rendered pages for anonymous visitors; point this at a FileBasedCache
+    # (see production.py) so every process sees the same invalidations
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pages',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # {% fragment %} blocks and the revision stamps of what they show
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+PAGE_CACHE_ALIAS = 'pages'  # None turns page caching off
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+FRAGMENT_CACHE_ALIAS = 'fragments'  # None turns fragment caching off
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Seconds an in-memory index is used before being reloaded regardless of
+# its version stamp, for when the default cache isn't shared; None trusts
+# the stamps alone
+INDEX_MAX_AGE = 60 * 5
+
+
 # Wagtail settings
 
 WAGTAIL_SITE_NAME = "visualist"
 
+# Full-text search: an SQLite FTS5 index with BM25 ranking, kept in the
+# default database (see search.backend); on other databases it falls back
+# to Wagtail's database backend
+WAGTAILSEARCH_BACKENDS = {
+    'default': {
+        'BACKEND': 'search.backend',
+    },
+}
+
+# Search hits are counted in memory and written in batches by a background
+# thread every SEARCH_HITS_FLUSH_INTERVAL seconds, or sooner once
+# SEARCH_HITS_BATCH_SIZE distinct queries are waiting.  0 disables the
+# thread, and a search writes the batch itself once more than that wait.
+SEARCH_HITS_FLUSH_INTERVAL = 10
+SEARCH_HITS_BATCH_SIZE = 500
+
+# Ranked search result ids are cached per query for paging, in seconds
+SEARCH_RESULTS_CACHE_TIMEOUT = 300
+
+# Category facets in /search/facets/ cover this many best matches per type
+SEARCH_FACET_DEPTH = 200
+
+# Where the /search/suggest/ prefix table is kept between restarts
+SEARCH_SUGGEST_INDEX = os.path.join(BASE_DIR, 'var', 'suggest.pickle')
+
+# Seconds to wait for more changes before rewriting that file; 0 writes it
+# on every change
+SEARCH_SUGGEST_WRITE_DELAY = 5
+
+# Tests get a scratch SEARCH_SUGGEST_INDEX, not the one in var/
+TEST_RUNNER = 'visualist.testrunner.TestRunner'
+
+# Worker processes generating renditions ahead of time; 0 does it in-process
+RENDITION_WARM_PROCESSES = 2
+
+# Threads resizing the renditions a page is missing, in parallel
+RENDITION_THREADS = 4
+
 # Base URL to use when referring to full URLs within the Wagtail admin backend -
 # e.g. in notification emails. Don't include '/admin' or a trailing slash
 BASE_URL = 'http://example.com'
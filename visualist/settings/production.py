@@ -4,6 +4,24 @@ from .base import *
 
 DEBUG = False
 
+CACHES['default'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(BASE_DIR, 'var', 'cache'),
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+}
+
+CACHES['pages'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(BASE_DIR, 'var', 'pagecache'),
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+}
+
+CACHES['fragments'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(BASE_DIR, 'var', 'fragmentcache'),
+    'OPTIONS': {'MAX_ENTRIES': 50000},
+}
+
 try:
     from .local import *
 except ImportError:
@@ -0,0 +1,162 @@
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete)
+
+from wagtail.wagtailcore.models import Page, PageViewRestriction
+from wagtail.wagtailcore.signals import page_published, page_unpublished
+from wagtail.wagtailimages import get_image_model
+
+from events.models import (
+    Event, EventCategory, EventGalleryImage, EventTagIndex)
+from names.models import (
+    Email, Organization, OrganizationCategory, Person, PersonCategory, Phone,
+    SocialAccount)
+from places.models import Place, PlaceCategory
+
+from .fragments import fragment_cache
+from .graph import relation_graph
+from .models import ExtraName, Source, Website
+from .pagecache import page_cache
+
+
+NODE_MODELS = (Person, Organization, Event, Place)
+RELATIONS = (
+    Person.friends, Organization.employees, Organization.members,
+    Organization.locations, Event.organizers, Event.venues, Event.locations,
+)
+
+
+def invalidate_graph(sender, update_fields=None, **kwargs):
+    # revision saves don't change what's live or how pages are linked
+    if update_fields is not None and 'live' not in update_fields:
+        return
+    relation_graph.invalidate()
+
+
+def invalidate_graph_on_change(sender, action, **kwargs):
+    if action.startswith('post_'):
+        relation_graph.invalidate()
+
+
+for model in NODE_MODELS:
+    post_save.connect(invalidate_graph, sender=model)
+    post_delete.connect(invalidate_graph, sender=model)
+    # bulk unpublishing saves plain Page instances, so listen here as well
+    page_published.connect(invalidate_graph, sender=model)
+    page_unpublished.connect(invalidate_graph, sender=model)
+
+for relation in RELATIONS:
+    m2m_changed.connect(invalidate_graph_on_change, sender=relation.through)
+
+
+def related_pages(graph, pk):
+    # pages linking to it either way, and the connected-artists sidebars
+    # of people up to two friendships off
+    return set(graph.neighbourhood(pk, 1)) | \
+        set(graph.neighbourhood(pk, 2, labels={'friends'}))
+
+
+def pages_showing(page):
+    """The pages whose rendering a change to ``page`` can alter."""
+    pages = {page.pk}
+    parent = page.get_parent()
+    if parent is not None:
+        pages.add(parent.pk)
+    if issubclass(page.specific_class, Event):
+        # every tag page lists the tag counts over all live events
+        pages.update(EventTagIndex.objects.values_list('pk', flat=True))
+    if issubclass(page.specific_class, NODE_MODELS):
+        # the graph this process had loaded still has any links the change
+        # removed; the reloaded one has those it added
+        if relation_graph.version is not None:
+            pages.update(related_pages(relation_graph, page.pk))
+        pages.update(related_pages(relation_graph.current(), page.pk))
+    return pages
+
+
+def invalidate_pages(sender, instance, **kwargs):
+    page_cache.invalidate(pages_showing(instance))
+
+
+# deleting a live page unpublishes it first, so this covers deletion too
+page_published.connect(invalidate_pages)
+page_unpublished.connect(invalidate_pages)
+
+
+def invalidate_restricted(sender, instance, **kwargs):
+    # a restriction covers the whole subtree; cached copies of it from
+    # before it was added mustn't outlive it
+    page = Page.objects.filter(pk=instance.page_id).first()
+    if page is not None:
+        page_cache.invalidate(page.get_descendants(inclusive=True)
+            .values_list('pk', flat=True))
+
+
+post_save.connect(invalidate_restricted, sender=PageViewRestriction)
+post_delete.connect(invalidate_restricted, sender=PageViewRestriction)
+
+
+# shown on whichever pages link to them, which is too many to look up
+SNIPPET_MODELS = (
+    EventCategory, PersonCategory, OrganizationCategory, PlaceCategory,
+    Email, Phone, SocialAccount, ExtraName, Source, Website,
+)
+
+
+def invalidate_all_pages(sender, created=False, **kwargs):
+    # nothing links to a new one yet
+    if not created:
+        page_cache.invalidate_all()
+
+
+for model in SNIPPET_MODELS:
+    post_save.connect(invalidate_all_pages, sender=model)
+    post_delete.connect(invalidate_all_pages, sender=model)
+
+
+# fields a draft revision touches without changing what's shown
+REVISION_FIELDS = {'latest_revision_created_at', 'draft_title', 'has_unpublished_changes'}
+FRAGMENT_MODELS = NODE_MODELS + (EventCategory,)
+
+
+def touch_fragments(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= REVISION_FIELDS:
+        return
+    fragment_cache.touch(instance)
+
+
+for model in FRAGMENT_MODELS:
+    post_save.connect(touch_fragments, sender=model)
+    post_delete.connect(touch_fragments, sender=model)
+# bulk unpublishing saves plain Page instances
+page_unpublished.connect(touch_fragments)
+
+
+def touch_image_fragments(sender, instance, **kwargs):
+    # fragments show images through galleries and icons, and go on showing
+    # renditions of a replaced file or an old focal point until told
+    fragment_cache.touch(instance)
+    fragment_cache.touch_many('wagtailcore.page', EventGalleryImage.objects
+        .filter(image=instance).values_list('event_id', flat=True))
+    fragment_cache.touch_many('events.eventcategory', EventCategory.objects
+        .filter(icon=instance).values_list('pk', flat=True))
+
+
+post_save.connect(touch_image_fragments, sender=get_image_model())
+# before the gallery rows and icons pointing at it are gone
+pre_delete.connect(touch_image_fragments, sender=get_image_model())
+
+
+def invalidate_image_pages(sender, created=False, **kwargs):
+    # images show on pages through galleries and every kind of category
+    # icon, so like a snippet's, an edit could show anywhere; replacing
+    # the file also deletes the renditions cached pages point at
+    if not created:
+        page_cache.invalidate_all()
+
+
+post_save.connect(invalidate_image_pages, sender=get_image_model())
+post_delete.connect(invalidate_image_pages, sender=get_image_model())
+# the image edit view deletes renditions after saving the image, and a
+# page rendered in between would be cached with links to them
+post_delete.connect(invalidate_image_pages,
+    sender=get_image_model().get_rendition_model())
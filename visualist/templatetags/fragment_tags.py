@@ -0,0 +1,42 @@
+from django import template
+
+from ..fragments import fragment_cache
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, dependencies):
+        self.nodelist = nodelist
+        self.name = name
+        self.dependencies = dependencies
+
+    def render(self, context):
+        request = context.get('request')
+        if getattr(request, 'is_preview', False):
+            # previews show unsaved changes under the saved stamps
+            return self.nodelist.render(context)
+        return fragment_cache.render(
+            self.name.resolve(context),
+            [dependency.resolve(context) for dependency in self.dependencies],
+            lambda: self.nodelist.render(context))
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    Cache the enclosed template until one of the given objects changes:
+
+        {% fragment 'event-categories' categories %}...{% endfragment %}
+
+    Each dependency may be a model instance or a list or queryset of them.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            "'fragment' tag requires a name and the objects it depends on")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(nodelist, parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]])
@@ -0,0 +1,28 @@
+import os
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Keeps what the site writes as it runs out of var/ and the real
+    database while testing."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.scratch = tempfile.mkdtemp()
+        self.overrides = override_settings(
+            SEARCH_SUGGEST_INDEX=os.path.join(self.scratch, 'suggest.pickle'),
+            SEARCH_SUGGEST_WRITE_DELAY=0)
+        self.overrides.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        from search.hits import search_hits
+
+        # or the exit handler writes the tests' hits to the real database
+        search_hits.pending.clear()
+        self.overrides.disable()
+        shutil.rmtree(self.scratch, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,598 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache, caches
+from django.core.files.images import ImageFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+
+from wagtail.wagtailcore.models import Page, PageViewRestriction, Site
+from wagtail.wagtailimages.models import Image
+
+from events.models import (
+    Event, EventCategory, EventGalleryImage, EventIndex, EventOccurrence,
+    EventTagIndex)
+from names.models import (
+    Email, Organization, OrganizationIndex, Person, PersonIndex)
+from places.geo import encode_geohash
+from places.models import Place
+
+from .fragments import fragment_cache
+from .graph import relation_graph
+from .indexes import SharedIndex
+from .linkeddata import Exporter, ntriples
+from .pagecache import PageCacheMiddleware, page_cache
+
+
+class RelationGraphTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        root = Site.objects.get(is_default_site=True).root_page
+        self.x, self.y, self.z = [root.add_child(instance=Person(title=title))
+            for title in ('X', 'Y', 'Z')]
+        self.gallery = root.add_child(instance=Organization(title='Gallery'))
+        self.loop, self.pilsen = [root.add_child(instance=Place(
+            title=title, hours='By appointment',
+            latitude=Decimal(latitude), longitude=Decimal('-87.63')))
+            for title, latitude in (('Loop', '41.88'), ('Pilsen', '41.85'))]
+
+        start = timezone.make_aware(datetime.datetime(2017, 6, 1))
+        self.group_show = self.add_event(root, 'Group show', start,
+            organizers=[self.x, self.y], locations=[self.loop])
+        self.solo_show = self.add_event(root, 'Solo show',
+            start + datetime.timedelta(days=1),
+            organizers=[self.y], locations=[self.pilsen], venues=[self.gallery])
+        self.talk = self.add_event(self.solo_show, 'Artist talk',
+            start + datetime.timedelta(days=2), organizers=[self.z])
+        self.gallery.employees.add(self.z)
+        self.gallery.save()
+
+    def add_event(self, parent, title, start_date, **relations):
+        event = parent.add_child(instance=Event(title=title, start_date=start_date))
+        for name, pages in relations.items():
+            getattr(event, name).add(*pages)
+        event.save()
+        return event
+
+    def test_follow(self):
+        graph = relation_graph.current()
+        # places where people who organized something with X held events
+        self.assertEqual(graph.follow([self.x.pk], 'organizer_of', 'organizers',
+            'organizer_of', 'locations', node_type='place'),
+            {self.loop.pk, self.pilsen.pk})
+        self.assertEqual(graph.follow([self.talk.pk], 'parent', 'venues'),
+            {self.gallery.pk})
+        self.assertEqual(graph.follow([self.gallery.pk], {'employees', 'venue_of'}),
+            {self.z.pk, self.solo_show.pk})
+        with self.assertRaises(ValueError):
+            graph.follow([self.x.pk], 'enemies')
+
+    def test_neighbourhood(self):
+        graph = relation_graph.current()
+        self.assertEqual(graph.neighbourhood(self.z.pk, 1),
+            {self.talk.pk: 1, self.gallery.pk: 1})
+        self.assertEqual(graph.neighbourhood(self.z.pk, 2, labels={'employers'}),
+            {self.gallery.pk: 1})
+
+    def test_changes_rebuild(self):
+        relation_graph.current()
+        self.x.friends.add(self.z)
+        self.x.save()
+        self.assertEqual(relation_graph.current().follow([self.z.pk], 'friends'),
+            {self.x.pk})
+
+        self.pilsen.unpublish()
+        self.assertEqual(relation_graph.current().follow(
+            [self.y.pk], 'organizer_of', 'locations'), {self.loop.pk})
+
+    def test_export(self):
+        out = StringIO()
+        call_command('export_graph', stdout=out)
+        snapshot = json.loads(out.getvalue())
+        self.assertEqual(len(snapshot['nodes']), 9)
+        self.assertIn([self.talk.pk, 'parent', self.solo_show.pk],
+            snapshot['edges'])
+        self.assertIn([self.gallery.pk, 'employees', self.z.pk],
+            snapshot['edges'])
+        self.assertEqual(len(snapshot['edges']), 9)
+
+    def test_json_endpoint(self):
+        response = self.client.get(reverse('graph_follow'), {
+            'from': self.x.pk, 'step': ['organizer_of', 'organizers'],
+            'type': 'person'})
+        self.assertEqual(response.json(), {'ids': [self.y.pk]})
+
+        response = self.client.get(reverse('graph_follow'),
+            {'from': self.x.pk, 'step': 'enemies'})
+        self.assertEqual(response.status_code, 400)
+
+
+class LoadCounter(SharedIndex):
+    version_cache_key = 'tests:load-counter'
+
+    def __init__(self):
+        super().__init__()
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+
+
+class SharedIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # one per process
+        self.a, self.b = LoadCounter(), LoadCounter()
+
+    def test_stamps(self):
+        self.a.current(), self.b.current()
+        self.a.changed()
+        self.assertEqual((self.a.current().loads, self.b.current().loads), (1, 2))
+        self.a.invalidate()
+        self.assertEqual((self.a.current().loads, self.b.current().loads), (2, 3))
+
+    def test_patching_a_stale_copy_reloads_it(self):
+        self.a.current(), self.b.current()
+        self.b.changed()
+        # a patches in a change of its own without having seen b's
+        self.a.changed()
+        self.assertEqual((self.a.current().loads, self.b.current().loads), (2, 2))
+        # as when the cache has been emptied since a loaded
+        cache.clear()
+        self.a.changed()
+        self.assertEqual(self.a.current().loads, 3)
+
+    def test_max_age(self):
+        self.a.current()
+        with self.settings(INDEX_MAX_AGE=60):
+            self.assertEqual(self.a.current().loads, 1)
+            self.a.loaded_at -= 61
+            self.assertEqual(self.a.current().loads, 2)
+        with self.settings(INDEX_MAX_AGE=None):
+            self.a.loaded_at -= 61
+            self.assertEqual(self.a.current().loads, 2)
+
+
+class PageCacheTest(TestCase):
+
+    def setUp(self):
+        caches['pages'].clear()
+        root = Site.objects.get(is_default_site=True).root_page
+        self.people = root.add_child(
+            instance=PersonIndex(title='People', slug='people'))
+        self.x, self.y = [self.people.add_child(instance=Person(title=title))
+            for title in ('Gertrude Abercrombie', 'Charles Sebree')]
+        self.calendar = root.add_child(
+            instance=EventIndex(title='Calendar', slug='calendar'))
+        self.tags = root.add_child(
+            instance=EventTagIndex(title='Tags', slug='tags'))
+
+    def rename(self, page, title):
+        # behind Wagtail's back, so only a cache miss would show it
+        Person.objects.filter(pk=page.pk).update(title=title)
+
+    def test_anonymous_responses_cached(self):
+        self.assertContains(self.client.get(self.x.url), 'Gertrude Abercrombie')
+        self.rename(self.x, 'Renamed')
+        self.assertContains(self.client.get(self.x.url), 'Gertrude Abercrombie')
+        # a different query string is a different page
+        self.assertContains(self.client.get(self.x.url, {'a': 1}), 'Renamed')
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.get(self.x.url)
+        self.rename(self.x, 'Renamed')
+        User.objects.create_superuser('editor', 'editor@example.com', 'password')
+        self.client.login(username='editor', password='password')
+        self.assertContains(self.client.get(self.x.url), 'Renamed')
+
+    def test_publish_invalidates_page_and_parent(self):
+        for url in (self.x.url, self.y.url, self.people.url):
+            self.client.get(url)
+        self.rename(self.y, 'Renamed')
+
+        self.x.title = 'Gertrude A.'
+        self.x.save_revision().publish()
+        self.assertContains(self.client.get(self.x.url), 'Gertrude A.')
+        self.assertContains(self.client.get(self.people.url), 'Gertrude A.')
+        # the sibling is untouched
+        self.assertNotContains(self.client.get(self.y.url), 'Renamed')
+
+    def test_unpublish_invalidates_parent(self):
+        self.assertContains(self.client.get(self.people.url), 'Charles Sebree')
+        self.y.unpublish()
+        self.assertNotContains(self.client.get(self.people.url), 'Charles Sebree')
+        self.assertEqual(self.client.get(self.y.url).status_code, 404)
+
+    def test_event_publish_invalidates_tag_pages(self):
+        event = self.calendar.add_child(instance=Event(title='Opening night',
+            start_date=timezone.make_aware(datetime.datetime(2017, 6, 1))))
+        self.assertNotContains(
+            self.client.get(self.tags.url, {'tag': 'performance'}), 'Opening night')
+
+        event.tags.add('performance')
+        event.save_revision().publish()
+        self.assertContains(
+            self.client.get(self.tags.url, {'tag': 'performance'}), 'Opening night')
+        self.assertContains(self.client.get(event.url), 'Opening night')
+
+    def test_publish_invalidates_pages_showing_it(self):
+        center = self.people.add_child(instance=Organization(title='Art Center'))
+        center.employees.add(self.y)
+        center.save()
+        # x's sidebar shows y, and z two friendships off
+        z = self.people.add_child(instance=Person(title='Eldzier Cortor'))
+        self.x.friends.add(self.y)
+        self.x.save()
+        self.y.friends.add(z)
+        self.y.save()
+        for url in (center.url, self.x.url):
+            self.assertContains(self.client.get(url), 'Charles Sebree')
+        self.assertContains(self.client.get(self.x.url), 'Eldzier Cortor')
+
+        for person, title in ((self.y, 'Charles W. Sebree'), (z, 'E. Cortor')):
+            person.title = title
+            person.save_revision().publish()
+        self.assertContains(self.client.get(center.url), 'Charles W. Sebree')
+        self.assertContains(self.client.get(self.x.url), 'Charles W. Sebree')
+        self.assertContains(self.client.get(self.x.url), 'E. Cortor')
+
+        # a link taken away shows on the other end as well
+        self.assertContains(self.client.get(self.y.url), 'Gertrude Abercrombie')
+        self.x.friends.remove(self.y)
+        self.x.save_revision().publish()
+        self.assertNotContains(self.client.get(self.y.url), 'Gertrude Abercrombie')
+
+    def test_snippet_edits_invalidate_everything(self):
+        email = Email.objects.create(address='info@example.com')
+        center = self.people.add_child(instance=Organization(title='Art Center'))
+        center.emails.add(email)
+        self.assertContains(self.client.get(center.url), 'info@example.com')
+        email.address = 'office@example.com'
+        email.save()
+        self.assertContains(self.client.get(center.url), 'office@example.com')
+
+    def test_image_edits_invalidate_everything(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        def image_file(name):
+            f = BytesIO()
+            PILImage.new('RGB', (640, 480), 'white').save(f, 'PNG')
+            return ImageFile(f, name=name)
+
+        image = Image.objects.create(title='view', file=image_file('first.png'))
+        event = self.calendar.add_child(instance=Event(title='Opening night'))
+        EventGalleryImage.objects.create(event=event, image=image)
+        self.assertContains(self.client.get(event.url), 'images/first.')
+
+        # as the image edit view does on a new file
+        image.file = image_file('second.png')
+        image.save()
+        image.renditions.all().delete()
+        self.assertContains(self.client.get(event.url), 'images/second.')
+
+    def test_restricted_pages_not_cached(self):
+        self.client.get(self.x.url)
+        restriction = PageViewRestriction.objects.create(page=self.people,
+            restriction_type=PageViewRestriction.PASSWORD, password='secret')
+        # the copy cached before the restriction isn't served past it
+        self.assertNotContains(self.client.get(self.x.url), 'Gertrude Abercrombie')
+
+        unlocked = Client()
+        response = unlocked.post(reverse('wagtailcore_authenticate_with_password',
+            args=(restriction.pk, self.x.pk)), {'password': 'secret', 'return_url': self.x.url})
+        self.assertEqual(response.status_code, 302)
+        self.assertContains(unlocked.get(self.x.url), 'Gertrude Abercrombie')
+        self.assertNotContains(Client().get(self.x.url), 'Gertrude Abercrombie')
+
+    def test_session_reading_responses_not_cached(self):
+        request = RequestFactory().get(self.x.url)
+        request.site = Site.objects.get(is_default_site=True)
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+
+        def view(request):
+            request.page_cache_version = (self.x.pk, page_cache.versions(self.x.pk))
+            request.session.get('seen')
+            return HttpResponse('seen')
+
+        PageCacheMiddleware(view)(request)
+        self.assertIsNone(page_cache.get(request))
+
+
+class FragmentCacheTest(TestCase):
+
+    template = Template('{% load fragment_tags %}'
+        '{% fragment "categories" categories %}'
+        '{% for category in categories %}{{ category.name }} {% endfor %}'
+        '{% endfragment %}')
+
+    def setUp(self):
+        caches['fragments'].clear()
+        self.painting, self.sculpture = [EventCategory.objects.create(name=name)
+            for name in ('painting', 'sculpture')]
+        root = Site.objects.get(is_default_site=True).root_page
+        self.event = root.add_child(instance=Event(title='Opening night'))
+
+    def render(self, *categories, **context):
+        return self.template.render(Context(dict(context, categories=categories)))
+
+    def rename(self, category, name):
+        # behind the signals' back, so only a re-render would show it
+        EventCategory.objects.filter(pk=category.pk).update(name=name)
+        category.name = name
+
+    def test_cached_until_a_dependency_changes(self):
+        self.assertEqual(self.render(self.painting), 'painting ')
+        self.rename(self.painting, 'oil painting')
+        self.assertEqual(self.render(self.painting), 'painting ')
+
+        self.painting.save()
+        self.assertEqual(self.render(self.painting), 'oil painting ')
+
+    def test_only_dependent_fragments_invalidated(self):
+        self.render(self.painting)
+        self.render(self.sculpture)
+        self.render(self.painting, self.sculpture)
+        self.rename(self.painting, 'oil painting')
+        self.rename(self.sculpture, 'bronze')
+
+        self.painting.save()
+        self.assertEqual(self.render(self.painting), 'oil painting ')
+        self.assertEqual(self.render(self.sculpture), 'sculpture ')
+        self.assertEqual(self.render(self.painting, self.sculpture),
+            'oil painting bronze ')
+
+    def test_page_revisions(self):
+        template = Template('{% load fragment_tags %}'
+            '{% fragment "title" page %}{{ page.title }}{% endfragment %}')
+        self.assertEqual(template.render(Context({'page': self.event})),
+            'Opening night')
+
+        # a draft doesn't change what's shown; publishing it does
+        self.event.title = 'Closing night'
+        revision = self.event.save_revision()
+        self.assertEqual(template.render(Context({'page': self.event})),
+            'Opening night')
+        revision.publish()
+        self.assertEqual(template.render(Context({'page': self.event})),
+            'Closing night')
+
+    def test_previews_not_cached(self):
+        request = RequestFactory().get('/')
+        request.is_preview = True
+        self.render(self.painting)
+        self.rename(self.painting, 'oil painting')
+        self.assertEqual(self.render(self.painting, request=request),
+            'oil painting ')
+        self.assertEqual(self.render(self.painting), 'painting ')
+
+
+class ImportRecordsTest(TestCase):
+
+    records = [
+        {'type': 'person', 'title': 'Gertrude Abercrombie', 'gender': 'f',
+            'friends': ['charles-sebree']},
+        {'type': 'person', 'title': 'Charles Sebree', 'body': '<p>Painter</p>'},
+        {'type': 'place', 'title': 'Hyde Park', 'hours': 'Daily',
+            'latitude': '41.8022', 'longitude': '-87.5871'},
+        {'type': 'organization', 'title': 'Hyde Park Art Center',
+            'nonprofit': True, 'employees': ['charles-sebree'],
+            'locations': ['hyde-park']},
+        {'type': 'event', 'title': 'Opening night', 'slug': 'opening',
+            'start_date': '2017-06-01T18:00:00', 'duration': 120,
+            'organizers': ['gertrude-abercrombie', 'hyde-park-art-center'],
+            'venues': ['hyde-park-art-center'], 'locations': ['hyde-park', 'nowhere']},
+    ]
+
+    def setUp(self):
+        cache.clear()
+        root = Site.objects.get(is_default_site=True).root_page
+        self.people = root.add_child(instance=PersonIndex(title='People', slug='people'))
+        self.organizations = root.add_child(
+            instance=OrganizationIndex(title='Organizations', slug='organizations'))
+        self.calendar = root.add_child(instance=EventIndex(title='Calendar', slug='calendar'))
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def import_records(self, *paths, **options):
+        out = StringIO()
+        call_command('import_records', *paths, stdout=out, batch_size=2, **options)
+        return out.getvalue()
+
+    def test_import(self):
+        path = self.write('records.jsonl',
+            '\n'.join(json.dumps(record) for record in self.records))
+        out = self.import_records(path)
+        self.assertIn('person created: 2', out)
+        self.assertIn('links created: 8', out)
+        self.assertIn('links unresolved: 1', out)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+        gertrude = Person.objects.get(slug='gertrude-abercrombie')
+        charles = Person.objects.get(slug='charles-sebree')
+        self.assertEqual(gertrude.get_parent().pk, self.people.pk)
+        self.assertEqual(gertrude.url, '/people/gertrude-abercrombie/')
+        self.assertEqual(Page.objects.get(pk=self.people.pk).get_children().count(), 2)
+        self.assertEqual(list(charles.friends.all()), [gertrude])
+
+        place = Place.objects.get(slug='hyde-park')
+        self.assertEqual(place.geohash, encode_geohash(41.8022, -87.5871))
+        center = Organization.objects.get(slug='hyde-park-art-center')
+        self.assertEqual([p.pk for p in center.employees.all()], [charles.pk])
+        self.assertEqual([p.pk for p in center.locations.all()], [place.pk])
+
+        event = Event.objects.get(slug='opening')
+        self.assertEqual(event.get_parent().pk, self.calendar.pk)
+        self.assertEqual({a.pk for a in event.organizers.all()}, {gertrude.pk, center.pk})
+        self.assertEqual(EventOccurrence.objects.get(event=event).start, event.start_date)
+        self.assertEqual(self.client.get(event.url).status_code, 200)
+
+        # new pages are searchable and show up in the derived indexes
+        self.assertEqual([p.pk for p in Person.objects.search('sebree')], [charles.pk])
+        self.assertEqual(relation_graph.current().follow([gertrude.pk], 'friends'),
+            {charles.pk})
+
+    def test_rerun_finishes_without_duplicates(self):
+        path = self.write('records.jsonl',
+            '\n'.join(json.dumps(record) for record in self.records))
+        self.import_records(path)
+        out = self.import_records(path)
+        self.assertIn('person skipped: 2', out)
+        self.assertNotIn('created', out.replace('links created: 0', ''))
+        self.assertEqual(Page.objects.get(pk=self.people.pk).get_children().count(), 2)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+
+    def test_csv_and_appending_to_existing_children(self):
+        self.people.add_child(instance=Person(title='Existing'))
+        path = self.write('people.csv', 'title,gender,friends,notes\n'
+            'Gertrude Abercrombie,f,charles-sebree|existing,x\n'
+            'Charles Sebree,,,\n')
+        out = self.import_records(path, type='person')
+        self.assertIn('ignored columns: notes', out)
+        self.assertEqual(Page.find_problems(), ([], [], [], [], []))
+        gertrude = Person.objects.get(slug='gertrude-abercrombie')
+        self.assertEqual({p.title for p in gertrude.friends.all()},
+            {'Charles Sebree', 'Existing'})
+        self.assertEqual(Person.objects.get(slug='charles-sebree').gender, None)
+
+    def test_links_to_existing_pages_invalidate_them(self):
+        caches['pages'].clear()
+        existing = self.people.add_child(instance=Person(title='Existing'))
+        self.assertNotContains(self.client.get(existing.url), 'Gertrude Abercrombie')
+        stamp = fragment_cache.versions([existing])
+
+        path = self.write('people.csv', 'title,friends\n'
+            'Gertrude Abercrombie,existing\n')
+        self.import_records(path, type='person')
+        # the friendship shows from the other end as well
+        self.assertContains(self.client.get(existing.url), 'Gertrude Abercrombie')
+        self.assertNotEqual(fragment_cache.versions([existing]), stamp)
+
+    def test_bad_rows(self):
+        path = self.write('records.jsonl', json.dumps({'type': 'painting'}))
+        with self.assertRaisesMessage(CommandError, "Unknown record type"):
+            self.import_records(path)
+        path = self.write('records.jsonl', json.dumps(
+            {'type': 'event', 'title': 'Opening', 'duration': 'long'}))
+        with self.assertRaisesMessage(CommandError, 'records.jsonl:1'):
+            self.import_records(path)
+
+    def test_slug_taken_by_another_type(self):
+        # places go under the site root, next to the calendar
+        path = self.write('places.jsonl', json.dumps({'type': 'place',
+            'title': 'Calendar', 'latitude': '41.8', 'longitude': '-87.6'}))
+        with self.assertRaisesMessage(CommandError, "places.jsonl:1: slug 'calendar'"):
+            self.import_records(path)
+        self.assertFalse(Place.objects.exists())
+
+
+class LinkedDataExportTest(TestCase):
+
+    def setUp(self):
+        self.root = Site.objects.get(is_default_site=True).root_page
+        self.x = self.root.add_child(instance=Person(title='Gertrude Abercrombie',
+            gender='f', body='<p>Painter &amp; host</p>'))
+        self.y = self.root.add_child(instance=Person(title='Charles Sebree'))
+        self.x.friends.add(self.y)
+        self.x.save()
+        self.draft = self.root.add_child(instance=Person(title='Draft', live=False))
+
+        self.place = self.root.add_child(instance=Place(title='Hyde Park',
+            hours='Daily', latitude=Decimal('41.8022'), longitude=Decimal('-87.5871')))
+        self.center = self.root.add_child(instance=Organization(title='Art Center'))
+        self.center.employees.add(self.y)
+        self.center.locations.add(self.place)
+        self.center.emails.add(Email.objects.create(address='info@example.com'))
+        self.center.save()
+        self.event = self.root.add_child(instance=Event(title='Opening night',
+            start_date=timezone.make_aware(datetime.datetime(2017, 6, 1, 18))))
+        self.event.organizers.add(self.x, self.draft)
+        self.event.venues.add(self.center)
+        self.event.save()
+
+    def export(self, *args, **options):
+        out = StringIO()
+        call_command('export_linked_data', *args, stdout=out, **options)
+        return out.getvalue()
+
+    def test_ntriples(self):
+        lines = set(self.export(format='nt').splitlines())
+        x, y = (self.x.full_url, self.y.full_url)
+        for type_ in ('http://schema.org/Person',
+                'http://xmlns.com/foaf/spec/#term_Agent', 'http://schema.org/Thing'):
+            self.assertIn('<{}> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> '
+                '<{}> .'.format(x, type_), lines)
+        self.assertIn('<{}> <http://schema.org/knows> <{}> .'.format(x, y), lines)
+        self.assertIn('<{}> <http://schema.org/gender> "female" .'.format(x), lines)
+        self.assertIn('<{}> <http://schema.org/description> "Painter & host" .'
+            .format(x), lines)
+        self.assertIn('<{}> <http://schema.org/email> <mailto:info@example.com> .'
+            .format(self.center.full_url), lines)
+        self.assertIn('<{}> <http://schema.org/startDate> '
+            '"2017-06-01T18:00:00+00:00"^^<http://www.w3.org/2001/XMLSchema#dateTime> .'
+            .format(self.event.full_url), lines)
+        # nothing about, or linking to, unpublished pages
+        self.assertFalse([line for line in lines if self.draft.url_path in line])
+
+    def test_jsonld(self):
+        document = json.loads(self.export(format='jsonld'))
+        self.assertEqual(document['@context'], {'@vocab': 'http://schema.org/'})
+        nodes = {node['@id']: node for node in document['@graph']}
+        self.assertEqual(len(nodes), 5)
+        event = nodes[self.event.full_url]
+        self.assertEqual(event['@type'], ['http://schema.org/Event', 'http://schema.org/Thing'])
+        self.assertEqual(event['organizer'], [{'@id': self.x.full_url}])
+        self.assertEqual(event['location'], [{'@id': self.center.full_url}])
+        self.assertEqual(nodes[self.place.full_url]['latitude'], [{
+            '@value': '41.8022000', '@type': 'http://www.w3.org/2001/XMLSchema#decimal'}])
+
+    def test_queries_independent_of_size(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                for line in ntriples(Exporter(['person']).nodes()):
+                    pass
+            return len(queries)
+
+        few = count_queries()
+        for i in range(5):
+            person = self.root.add_child(instance=Person(title='Person {}'.format(i)))
+            person.friends.add(self.x)
+            person.save()
+        self.assertEqual(count_queries(), few)
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('export'), {'format': 'nt', 'type': 'place'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/n-triples; charset=utf-8')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('<http://schema.org/openingHours> "Daily" .', body)
+        self.assertNotIn('schema.org/Person', body)
+
+        response = self.client.get(reverse('export'), {'format': 'rdfxml'})
+        self.assertEqual(response.status_code, 400)
@@ -5,11 +5,15 @@ from django.conf.urls import include, url
 from django.contrib import admin
 
 from .api import api_router
+from . import views as visualist_views
 
 from wagtail.wagtailadmin import urls as wagtailadmin_urls
 from wagtail.wagtailcore import urls as wagtail_urls
 from wagtail.wagtaildocs import urls as wagtaildocs_urls
 
+from events import views as events_views
+from names import views as names_views
+from places import views as places_views
 from search import views as search_views
 
 urlpatterns = [
@@ -19,8 +23,24 @@ urlpatterns = [
     url(r'^documents/', include(wagtaildocs_urls)),
 
     url(r'^search/$', search_views.search, name='search'),
+    url(r'^search/facets/$', search_views.facets, name='search_facets'),
+    url(r'^search/suggest/$', search_views.suggest, name='search_suggest'),
 
     url(r'^api/v2/', api_router.urls),
+    url(r'^api/events/happening/$', events_views.happening,
+        name='events_happening'),
+    url(r'^api/events/upcoming/$', events_views.upcoming,
+        name='events_upcoming'),
+    url(r'^api/events/tagged/$', events_views.tagged, name='events_tagged'),
+    url(r'^api/export/$', visualist_views.export, name='export'),
+    url(r'^api/graph/follow/$', visualist_views.follow, name='graph_follow'),
+    url(r'^api/names/match/$', names_views.match, name='names_match'),
+    url(r'^api/names/friends/$', names_views.friends, name='names_friends'),
+    url(r'^api/places/near/$', places_views.near, name='places_near'),
+    url(r'^api/places/nearest/$', places_views.nearest, name='places_nearest'),
+    url(r'^api/places/within/$', places_views.within, name='places_within'),
+    url(r'^api/places/clusters/$', places_views.clusters,
+        name='places_clusters'),
 
     # For anything not caught by a more specific rule above, hand over to
     # Wagtail's page serving mechanism. This should be the last pattern in
@@ -0,0 +1,37 @@
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .graph import NODE_TYPES, relation_graph
+from .linkeddata import EXPORT_TYPES, FORMATS, Exporter
+
+
+def follow(request):
+    # ?from=<id>&from=...&step=organizer_of&step=organizers&type=place, a
+    # step being one edge label or several separated by commas
+    try:
+        ids = [int(pk) for pk in request.GET.getlist('from')]
+    except ValueError:
+        ids = []
+    steps = [set(step.split(',')) for step in request.GET.getlist('step')]
+    node_type = request.GET.get('type') or None
+    if not ids or node_type not in (None,) + tuple(NODE_TYPES.values()):
+        return JsonResponse({'error': 'from is required, and type must be '
+            'one of ' + ', '.join(NODE_TYPES.values())}, status=400)
+    try:
+        found = relation_graph.current().follow(
+            ids, *steps, node_type=node_type)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'ids': sorted(found)})
+
+
+def export(request):
+    # ?format=jsonld|nt&type=person&type=..., streamed as it's generated
+    output = request.GET.get('format', 'jsonld')
+    types = request.GET.getlist('type')
+    if output not in FORMATS or not set(types) <= set(EXPORT_TYPES):
+        return JsonResponse({'error': 'format must be one of {}, and type '
+            'one of {}'.format(', '.join(FORMATS), ', '.join(EXPORT_TYPES))},
+            status=400)
+    write, content_type = FORMATS[output]
+    return StreamingHttpResponse(write(Exporter(types).nodes()),
+        content_type=content_type + '; charset=utf-8')
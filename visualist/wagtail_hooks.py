@@ -0,0 +1,12 @@
+from wagtail.wagtailcore import hooks
+
+from .pagecache import cacheable_request, page_cache
+
+
+@hooks.register('before_serve_page')
+def note_served_page(page, request, serve_args, serve_kwargs):
+    # restricted pages (and their subpages) vary with the visitor's session
+    if cacheable_request(request) and not page.get_view_restrictions().exists():
+        # the stamp is read before rendering, so a publish landing mid-render
+        # leaves the response stale on arrival rather than cached as current
+        request.page_cache_version = (page.pk, page_cache.versions(page.pk))